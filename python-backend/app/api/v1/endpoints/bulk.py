@@ -1,19 +1,30 @@
 """
 Endpoints для массовых операций
 """
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from typing import Dict, List, Literal, Optional, Tuple
 from pydantic import BaseModel
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
-from app.db.session import SessionLocal
+from app.db.async_session import get_async_db
+from app.db.writer import get_db_writer
+from app.models.dead_letter import DeadLetter
 from app.models.file import File as FileModel
 from app.models.document import Document
 from app.services.document_service import DocumentService
+from app.services.bulk_import import get_bulk_importer
+from app.services.uploads import iter_upload
+from app.workers.queue_manager import get_queue_manager
+from app.workers.scheduling import LANE_BATCH, LANE_INTERACTIVE
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+_LANES = {"interactive": LANE_INTERACTIVE, "batch": LANE_BATCH}
+
 
 class BulkDeleteRequest(BaseModel):
     file_ids: List[int]
@@ -22,107 +33,192 @@ class BulkDeleteRequest(BaseModel):
 class BulkReprocessRequest(BaseModel):
     file_ids: List[int]
     force: bool = False
+    priority: Literal["interactive", "batch"] = "batch"
+
+
+class BulkImportRequest(BaseModel):
+    directory: str
+    import_id: Optional[str] = None
+
+
+def _delete_files(db: Session, file_ids: List[int]) -> Tuple[List[int], List[int]]:
+    files = {
+        f.id: f for f in
+        db.query(FileModel).filter(FileModel.id.in_(file_ids))
+    }
+    deleted = []
+    not_found = []
+    for file_id in file_ids:
+        file_obj = files.pop(file_id, None)
+        if file_obj:
+            db.delete(file_obj)
+            deleted.append(file_id)
+        else:
+            not_found.append(file_id)
+    return deleted, not_found
 
 
 @router.delete("/files")
 async def bulk_delete_files(request: BulkDeleteRequest):
     """Удалить несколько файлов"""
-    db = SessionLocal()
-    
     try:
-        deleted = []
-        not_found = []
-        
-        for file_id in request.file_ids:
-            file_obj = db.query(FileModel).filter(FileModel.id == file_id).first()
-            if file_obj:
-                db.delete(file_obj)
-                deleted.append(file_id)
-            else:
-                not_found.append(file_id)
-        
-        db.commit()
-        
-        return {
-            "status": "success",
-            "deleted": deleted,
-            "not_found": not_found,
-            "total_deleted": len(deleted)
-        }
-    
+        deleted, not_found = await get_db_writer().execute(_delete_files, request.file_ids)
     except Exception as e:
-        db.rollback()
         logger.exception(f"Bulk delete failed: {e}")
         raise HTTPException(500, f"Bulk delete failed: {str(e)}")
     
-    finally:
-        db.close()
+    return {
+        "status": "success",
+        "deleted": deleted,
+        "not_found": not_found,
+        "total_deleted": len(deleted)
+    }
 
 
-@router.post("/reprocess")
-async def bulk_reprocess_files(request: BulkReprocessRequest):
-    """Переобработать несколько файлов"""
-    db = SessionLocal()
+def _mark_for_reprocess(
+    db: Session, file_ids: List[int], force: bool
+) -> Tuple[List[Dict], List[Dict]]:
+    files = {
+        f.id: f for f in
+        db.query(FileModel).filter(FileModel.id.in_(file_ids))
+    }
     
-    try:
-        queued = []
-        skipped = []
-        
-        for file_id in request.file_ids:
-            file_obj = db.query(FileModel).filter(FileModel.id == file_id).first()
-            if not file_obj:
-                skipped.append({"file_id": file_id, "reason": "not_found"})
-                continue
-            
-            if file_obj.is_processed and not request.force:
-                skipped.append({"file_id": file_id, "reason": "already_processed"})
-                continue
-            
-            # Сбросить статус и добавить в очередь
-            file_obj.is_processed = False
-            queued.append(file_id)
-            # TODO: Добавить в очередь через queue_manager
+    items = []
+    skipped = []
+    for file_id in dict.fromkeys(file_ids):
+        file_obj = files.get(file_id)
+        if not file_obj:
+            skipped.append({"file_id": file_id, "reason": "not_found"})
+            continue
         
-        db.commit()
+        if file_obj.is_processed and not force:
+            skipped.append({"file_id": file_id, "reason": "already_processed"})
+            continue
         
-        return {
-            "status": "success",
-            "queued": queued,
-            "skipped": skipped,
-            "total_queued": len(queued)
-        }
+        file_obj.is_processed = False
+        items.append(
+            {"file_id": file_obj.id, "filepath": file_obj.filepath, "file_size": file_obj.file_size}
+        )
+    return items, skipped
+
+
+@router.post("/reprocess")
+async def bulk_reprocess_files(request: BulkReprocessRequest):
+    """
+    Переобработать несколько файлов
     
+    Файлы загружаются одним запросом, задачи ставятся в очередь одной
+    пачкой в выбранную полосу. Документы не удаляются заранее: каждый
+    заменяется на месте, когда его задача завершится. Суммарный прогресс
+    доступен по GET /ocr/groups/{group_id} и событиям job_group_progress.
+    """
+    queue_manager = get_queue_manager()
+    if queue_manager is None:
+        raise HTTPException(503, "Processing queue is not running")
+    
+    try:
+        items, skipped = await get_db_writer().execute(
+            _mark_for_reprocess, request.file_ids, request.force
+        )
     except Exception as e:
-        db.rollback()
         logger.exception(f"Bulk reprocess failed: {e}")
         raise HTTPException(500, str(e))
     
-    finally:
-        db.close()
+    group = queue_manager.create_group(len(items))
+    job_ids = await queue_manager.add_tasks(items, lane=_LANES[request.priority], group=group)
+    
+    return {
+        "status": "success",
+        "group_id": group.group_id,
+        "queued": [item["file_id"] for item in items],
+        "job_ids": job_ids,
+        "skipped": skipped,
+        "total_queued": len(items)
+    }
 
 
 @router.get("/pending")
-async def get_pending_files():
+async def get_pending_files(db: AsyncSession = Depends(get_async_db)):
     """Получить список файлов ожидающих обработки"""
-    db = SessionLocal()
+    # Файлы из dead-letter не ждут обработки, пока их не запустят повторно
+    dead_file_ids = select(DeadLetter.file_id).where(DeadLetter.replayed_at.is_(None))
+    rows = await db.execute(
+        select(FileModel.id, FileModel.filename, FileModel.created_at)
+        .where(FileModel.is_processed == False, FileModel.id.not_in(dead_file_ids))
+        .order_by(FileModel.id)
+    )
+    pending = rows.all()
+    dead_lettered = await db.scalar(
+        select(func.count()).select_from(DeadLetter).where(DeadLetter.replayed_at.is_(None))
+    )
     
+    return {
+        "pending": [
+            {
+                "id": file_id,
+                "filename": filename,
+                "created_at": created_at
+            }
+            for file_id, filename, created_at in pending
+        ],
+        "total": len(pending),
+        "dead_lettered": dead_lettered
+    }
+
+
+@router.post("/import", status_code=202)
+async def bulk_import_directory(request: BulkImportRequest):
+    """
+    Импортировать папку (рекурсивно, в фоне)
+
+    Прогресс приходит по WebSocket (import_progress) и доступен через
+    GET /bulk/import/{import_id}. Прерванный импорт продолжается
+    с чекпоинта, если передать его import_id.
+    """
     try:
-        pending = db.query(FileModel).filter(
-            FileModel.is_processed == False
-        ).all()
-        
-        return {
-            "pending": [
-                {
-                    "id": f.id,
-                    "filename": f.filename,
-                    "created_at": f.created_at
-                }
-                for f in pending
-            ],
-            "total": len(pending)
-        }
-    
-    finally:
-        db.close()
-        
\ No newline at end of file
+        job = get_bulk_importer().start_directory(request.directory, request.import_id)
+    except NotADirectoryError:
+        raise HTTPException(400, f"Directory not found: {request.directory}")
+    except KeyError:
+        raise HTTPException(404, f"Import {request.import_id} not found")
+    except ValueError as e:
+        raise HTTPException(409, str(e))
+
+    return job.to_dict()
+
+
+@router.post("/import/upload")
+async def bulk_import_upload(files: List[UploadFile] = File(...)):
+    """
+    Импортировать пачку файлов (multipart)
+
+    Файлы пишутся на диск потоково, отклоненные (дубликаты, формат,
+    размер) перечислены в errors, остальные ставятся в очередь.
+    """
+    job = await get_bulk_importer().import_uploads(
+        [(f.filename, iter_upload(f)) for f in files]
+    )
+    return job.to_dict()
+
+
+@router.get("/import")
+async def list_imports():
+    """Список импортов"""
+    return {"imports": [job.to_dict() for job in get_bulk_importer().list()]}
+
+
+@router.get("/import/{import_id}")
+async def get_import(import_id: str):
+    """Состояние импорта"""
+    job = get_bulk_importer().get(import_id)
+    if job is None:
+        raise HTTPException(404, f"Import {import_id} not found")
+    return job.to_dict()
+
+
+@router.delete("/import/{import_id}")
+async def cancel_import(import_id: str):
+    """Остановить импорт папки (продолжается повторным POST /bulk/import)"""
+    if not get_bulk_importer().cancel(import_id):
+        raise HTTPException(404, f"Import {import_id} is not running")
+    return {"status": "cancelling", "import_id": import_id}
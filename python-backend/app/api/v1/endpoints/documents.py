@@ -1,13 +1,12 @@
 """
 Endpoints для работы с документами
 """
-from fastapi import APIRouter, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from app.db.session import SessionLocal
-from app.models.document import Document
-from app.services.document_service import DocumentService
+from app.db.async_session import get_async_db
+from app.services.document_service import AsyncDocumentService
 
 router = APIRouter()
 
@@ -16,7 +15,8 @@ router = APIRouter()
 async def list_documents(
     skip: int = 0,
     limit: int = 50,
-    synced: Optional[bool] = None
+    synced: Optional[bool] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Список документов
@@ -25,80 +25,73 @@ async def list_documents(
     - **limit**: Максимум записей
     - **synced**: Фильтр по статусу синхронизации
     """
-    db: Session = SessionLocal()
+    docs = await AsyncDocumentService(db).get_all(skip=skip, limit=limit, synced=synced)
     
-    try:
-        query = db.query(Document)
-        
-        if synced is not None:
-            query = query.filter(Document.is_synced == synced)
-        
-        docs = query.order_by(Document.id.desc()).offset(skip).limit(limit).all()
-        
-        return [
-            {
-                "id": d.id,
-                "file_id": d.file_id,
-                "page_count": d.page_count,
-                "confidence_score": d.confidence_score,
-                "processed_at": d.processed_at,
-                "processing_time_seconds": d.processing_time_seconds,
-                "is_synced": d.is_synced,
-                "text_preview": d.text_content[:200] + "..." if len(d.text_content) > 200 else d.text_content
-            }
-            for d in docs
-        ]
-    
-    finally:
-        db.close()
+    return [
+        {
+            "id": d.id,
+            "file_id": d.file_id,
+            "page_count": d.page_count,
+            "confidence_score": d.confidence_score,
+            "processed_at": d.processed_at,
+            "processing_time_seconds": d.processing_time_seconds,
+            "is_synced": d.is_synced,
+            "text_preview": d.text_content[:200] + "..." if len(d.text_content) > 200 else d.text_content
+        }
+        for d in docs
+    ]
 
 
 @router.get("/{document_id}")
-async def get_document(document_id: int):
+async def get_document(document_id: int, db: AsyncSession = Depends(get_async_db)):
     """Получить полный документ"""
-    db: Session = SessionLocal()
-    
-    try:
-        doc = db.query(Document).filter(Document.id == document_id).first()
-        if not doc:
-            raise HTTPException(status_code=404, detail="Document not found")
-        
-        return {
-            "id": doc.id,
-            "file_id": doc.file_id,
-            "text_content": doc.text_content,
-            "page_count": doc.page_count,
-            "confidence_score": doc.confidence_score,
-            "processed_at": doc.processed_at,
-            "processing_time_seconds": doc.processing_time_seconds,
-            "is_synced": doc.is_synced,
-            "needs_sync": doc.needs_sync,
-        }
+    doc = await AsyncDocumentService(db).get_by_id(document_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
     
-    finally:
-        db.close()
+    return {
+        "id": doc.id,
+        "file_id": doc.file_id,
+        "text_content": doc.text_content,
+        "page_count": doc.page_count,
+        "confidence_score": doc.confidence_score,
+        "processed_at": doc.processed_at,
+        "processing_time_seconds": doc.processing_time_seconds,
+        "is_synced": doc.is_synced,
+        "needs_sync": doc.needs_sync,
+    }
 
 
 @router.get("/{document_id}/pages")
-async def get_document_pages(document_id: int):
+async def get_document_pages(document_id: int, db: AsyncSession = Depends(get_async_db)):
     """Получить страницы документа"""
-    db: Session = SessionLocal()
+    doc_service = AsyncDocumentService(db)
+    if not await doc_service.get_by_id(document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
     
-    try:
-        doc = db.query(Document).filter(Document.id == document_id).first()
-        if not doc:
-            raise HTTPException(status_code=404, detail="Document not found")
-        
-        return [
-            {
-                "page_number": p.page_number,
-                "text_content": p.text_content,
-                "confidence_score": p.confidence_score,
-                "has_boxes": p.bounding_boxes is not None
-            }
-            for p in doc.pages
-        ]
+    return [
+        {
+            "page_number": p.page_number,
+            "text_content": p.text_content,
+            "confidence_score": p.confidence_score,
+            "has_boxes": p.geometry is not None
+        }
+        for p in await doc_service.get_pages(document_id)
+    ]
+
+
+@router.get("/{document_id}/pages/{page_number}/geometry")
+async def get_page_geometry(
+    document_id: int,
+    page_number: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Рамки, уверенность и текст строк страницы"""
+    page = await AsyncDocumentService(db).get_page(document_id, page_number)
+    if not page:
+        raise HTTPException(status_code=404, detail="Page not found")
     
-    finally:
-        db.close()
-        
\ No newline at end of file
+    return {
+        "page_number": page.page_number,
+        "lines": page.geometry.lines(page.text_content or "") if page.geometry is not None else []
+    }
@@ -1,21 +1,40 @@
 """
 Endpoints для управления файлами
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List
 
-from app.db.session import SessionLocal
+from app.db.async_session import get_async_db
+from app.db.writer import get_db_writer
 from app.models.file import File as FileModel
+from app.models.file_alias import FileAlias
+from app.models.document import Document
 
 router = APIRouter()
 
 
+async def _aliases(db: AsyncSession, file_ids: List[int]) -> Dict[int, List[str]]:
+    """Дополнительные пути файлов (одним запросом на страницу)"""
+    aliases: Dict[int, List[str]] = {file_id: [] for file_id in file_ids}
+    rows = await db.execute(
+        select(FileAlias.file_id, FileAlias.path)
+        .where(FileAlias.file_id.in_(file_ids))
+        .order_by(FileAlias.id)
+    )
+    for file_id, path in rows:
+        aliases[file_id].append(path)
+    return aliases
+
+
 @router.get("")
 async def list_files(
     skip: int = 0,
     limit: int = 50,
-    processed: bool = None
+    processed: bool = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить список файлов
@@ -24,78 +43,96 @@ async def list_files(
     - **limit**: максимум записей
     - **processed**: фильтр по статусу обработки
     """
-    db: Session = SessionLocal()
+    query = select(FileModel)
+    
+    # Фильтр по обработке
+    if processed is not None:
+        query = query.where(FileModel.is_processed == processed)
     
-    try:
-        query = db.query(FileModel)
-        
-        # Фильтр по обработке
-        if processed is not None:
-            query = query.filter(FileModel.is_processed == processed)
-        
-        files = query.order_by(FileModel.id.desc()).offset(skip).limit(limit).all()
-        
-        return [
-            {
-                "id": f.id,
-                "filename": f.filename,
-                "filepath": f.filepath,
-                "file_hash": f.file_hash,
-                "file_size": f.file_size,
-                "mime_type": f.mime_type,
-                "is_processed": f.is_processed,
-                "ocr_mode": f.ocr_mode,
-                "created_at": f.created_at,
-            }
-            for f in files
-        ]
+    files = list(await db.scalars(query.order_by(FileModel.id.desc()).offset(skip).limit(limit)))
+    aliases = await _aliases(db, [f.id for f in files])
     
-    finally:
-        db.close()
+    return [
+        {
+            "id": f.id,
+            "filename": f.filename,
+            "filepath": f.filepath,
+            "file_hash": f.file_hash,
+            "file_size": f.file_size,
+            "mime_type": f.mime_type,
+            "is_processed": f.is_processed,
+            "ocr_mode": f.ocr_mode,
+            "aliases": aliases[f.id],
+            "created_at": f.created_at,
+        }
+        for f in files
+    ]
 
 
-@router.get("/{file_id}")
-async def get_file(file_id: int):
-    """Получить информацию о файле"""
-    db: Session = SessionLocal()
-    
-    try:
-        file_obj = db.query(FileModel).filter(FileModel.id == file_id).first()
+@router.get("/by-path")
+async def get_file_by_path(path: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Найти файл по пути (исходному или пути в хранилище)
+
+    Дубликат, найденный под новым путем, указывает на уже распознанный
+    документ - повторно загружать или переобрабатывать его не нужно.
+    """
+    file_obj = await db.scalar(select(FileModel).where(FileModel.filepath == path))
+    if not file_obj:
+        file_obj = await db.scalar(
+            select(FileModel).join(FileAlias, FileAlias.file_id == FileModel.id)
+            .where(FileAlias.path == path)
+        )
         if not file_obj:
             raise HTTPException(status_code=404, detail="File not found")
-        
-        return {
-            "id": file_obj.id,
-            "filename": file_obj.filename,
-            "filepath": file_obj.filepath,
-            "file_hash": file_obj.file_hash,
-            "file_size": file_obj.file_size,
-            "mime_type": file_obj.mime_type,
-            "is_processed": file_obj.is_processed,
-            "ocr_mode": file_obj.ocr_mode,
-            "created_at": file_obj.created_at,
-            "updated_at": file_obj.updated_at,
-        }
     
-    finally:
-        db.close()
+    document_id = await db.scalar(select(Document.id).where(Document.file_id == file_obj.id))
+    
+    return {
+        "id": file_obj.id,
+        "filename": file_obj.filename,
+        "filepath": file_obj.filepath,
+        "file_hash": file_obj.file_hash,
+        "is_processed": file_obj.is_processed,
+        "document_id": document_id,
+    }
+
+
+@router.get("/{file_id}")
+async def get_file(file_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Получить информацию о файле"""
+    file_obj = await db.get(FileModel, file_id)
+    if not file_obj:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    return {
+        "id": file_obj.id,
+        "filename": file_obj.filename,
+        "filepath": file_obj.filepath,
+        "file_hash": file_obj.file_hash,
+        "file_size": file_obj.file_size,
+        "mime_type": file_obj.mime_type,
+        "is_processed": file_obj.is_processed,
+        "ocr_mode": file_obj.ocr_mode,
+        "aliases": (await _aliases(db, [file_obj.id]))[file_obj.id],
+        "created_at": file_obj.created_at,
+        "updated_at": file_obj.updated_at,
+    }
+
+
+def _delete_file(db: Session, file_id: int) -> bool:
+    file_obj = db.get(FileModel, file_id)
+    if not file_obj:
+        return False
+    db.delete(file_obj)
+    return True
 
 
 @router.delete("/{file_id}")
 async def delete_file(file_id: int):
     """Удалить файл из БД"""
-    db: Session = SessionLocal()
-    
-    try:
-        file_obj = db.query(FileModel).filter(FileModel.id == file_id).first()
-        if not file_obj:
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        db.delete(file_obj)
-        db.commit()
-        
-        return {"status": "deleted", "file_id": file_id}
+    if not await get_db_writer().execute(_delete_file, file_id):
+        raise HTTPException(status_code=404, detail="File not found")
     
-    finally:
-        db.close()
+    return {"status": "deleted", "file_id": file_id}
         
\ No newline at end of file
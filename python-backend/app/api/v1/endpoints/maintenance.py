@@ -1,8 +1,12 @@
 
-from fastapi import APIRouter
+import asyncio
+
+from fastapi import APIRouter, HTTPException
+from app.db.tuning import get_wal_checkpointer
 from app.utils.cleanup import (
     cleanup_old_files, vacuum_database,
-    cleanup_orphaned_files, get_storage_stats
+    cleanup_orphaned_files, get_storage_stats,
+    train_text_dictionary, recompress_text
 )
 
 router = APIRouter()
@@ -20,6 +24,12 @@ async def vacuum():
     return vacuum_database()
 
 
+@router.post("/checkpoint")
+async def checkpoint():
+    """Перенести WAL в файл БД и обрезать его"""
+    return await asyncio.to_thread(get_wal_checkpointer().checkpoint)
+
+
 @router.post("/cleanup-orphaned")
 async def cleanup_orphans():
     """Удалить файлы без записей в БД"""
@@ -28,5 +38,20 @@ async def cleanup_orphans():
 
 @router.get("/storage")
 async def storage_stats():
-    """Статистика хранилища"""
-    return get_storage_stats()
+    """Статистика хранилища, в том числе экономия от сжатия текста"""
+    return await asyncio.to_thread(get_storage_stats)
+
+
+@router.post("/storage/train-dictionary")
+async def train_dictionary(samples: int = 2000):
+    """Обучить словарь zstd на текстах страниц"""
+    try:
+        return await asyncio.to_thread(train_text_dictionary, samples)
+    except (RuntimeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/storage/recompress")
+async def recompress():
+    """Пересжать текст страниц текущим кодеком и словарем"""
+    return await asyncio.to_thread(recompress_text)
@@ -1,15 +1,21 @@
 import time
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Dict, List, Optional
 
 from app.db.session import SessionLocal
+from app.db.writer import get_db_writer
 from app.models.file import File as FileModel
 from app.services.file_processor import FileProcessor
+from app.services.ocr import normalize_mode
 from app.services.document_service import DocumentService
-from app.services.search_service import index_document
-from app.services.ocr import get_ocr_manager  # ИЗМЕНЕНО
+from app.services.dead_letter_service import DeadLetterService
 from app.core.config import settings
+from app.workers.queue_manager import QueueManager, get_queue_manager
+from app.workers.jobs import JobState
+from app.workers.ocr_worker import recognize_document, store_extracted_text
+from app.api.v1.endpoints.ws import notify_processing_cancelled
 import logging
 
 router = APIRouter()
@@ -31,6 +37,8 @@ async def process_file(
     - **engine**: OCR движок для использования
     - **force_ocr**: использовать OCR даже если есть текст
     """
+    # "auto" распознается как печатный текст - и сохраняется так же
+    mode = normalize_mode(mode)
     db: Session = SessionLocal()
     
     try:
@@ -53,47 +61,30 @@ async def process_file(
         use_ocr = force_ocr or not has_text
         
         if use_ocr:
-            ocr_manager = get_ocr_manager()
             selected_engine = settings.DEFAULT_OCR_ENGINE if engine == "auto" else engine
             
             logger.info(f"Processing file {file_id} with OCR engine: {selected_engine}")
             
-            ocr_result = processor.process_pdf_with_ocr(
-                file_obj.filepath,
-                ocr_manager,
-                engine=selected_engine,
-                dpi=300,
-                mode=mode
+            # Повторно распознаются только измененные страницы
+            document = await recognize_document(
+                db, file_obj, engine=selected_engine, dpi=settings.PDF_DPI, mode=mode,
+                ocr_mode=f"{selected_engine}:{mode}"
             )
-            
-            text = ocr_result["text"]
-            confidence = ocr_result["confidence"]
-            pages = ocr_result["pages"]
             used_engine = selected_engine
             
         else:
             logger.info(f"Extracting embedded text from file {file_id}")
             text = processor.extract_pdf_text(file_obj.filepath)
-            confidence = 1.0
-            pages = None
             used_engine = "text_extraction"
+            
+            document = await get_db_writer().execute(
+                store_extracted_text, file_id, text,
+                processing_time=time.time() - start_time,
+                ocr_mode=f"{used_engine}:{mode}"
+            )
         
         processing_time = time.time() - start_time
         
-        doc_service = DocumentService(db)
-        document = doc_service.create_document(
-            file_id=file_id,
-            text_content=text,
-            pages=pages,
-            confidence_score=confidence,
-            processing_time=processing_time
-        )
-        
-        index_document(document.id, file_obj.filename, text)
-        
-        file_obj.ocr_mode = f"{used_engine}:{mode}"
-        db.commit()
-        
         logger.info(f"Processed file {file_id} -> document {document.id}")
         
         return {
@@ -102,9 +93,9 @@ async def process_file(
             "page_count": document.page_count,
             "used_ocr": use_ocr,
             "engine": used_engine,
-            "confidence": confidence,
+            "confidence": document.confidence_score,
             "processing_time": processing_time,
-            "text_length": len(text),
+            "text_length": len(document.text_content),
         }
     
     except Exception as e:
@@ -139,4 +130,195 @@ async def get_ocr_status(file_id: int):
         }
     finally:
         db.close()
-        
\ No newline at end of file
+        
+
+
+class CancelJobsRequest(BaseModel):
+    """Массовая отмена OCR задач"""
+    job_ids: List[str] = []
+    file_ids: List[int] = []
+    all_queued: bool = False
+    force: bool = False
+
+
+def _require_queue_manager() -> QueueManager:
+    queue_manager = get_queue_manager()
+    if queue_manager is None:
+        raise HTTPException(status_code=503, detail="Queue manager is not running")
+    return queue_manager
+
+
+@router.get("/jobs")
+async def list_jobs(
+    state: Optional[List[str]] = Query(None, description="Фильтр по состояниям задач")
+):
+    """Список OCR задач в очереди, в работе и недавно завершенных"""
+    queue_manager = _require_queue_manager()
+    jobs = queue_manager.list_jobs(state)
+    return {
+        "total": len(jobs),
+        "jobs": [job.to_dict() for job in jobs],
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Состояние OCR задачи"""
+    job = _require_queue_manager().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, force: bool = False):
+    """
+    Отменить OCR задачу
+    
+    - **force**: прервать распознавание немедленно, не дожидаясь конца страницы
+    """
+    queue_manager = _require_queue_manager()
+    job = queue_manager.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    was_queued = job.state in (JobState.QUEUED, JobState.RETRY_WAIT)
+    if not queue_manager.cancel(job_id, force=force):
+        raise HTTPException(status_code=409, detail=f"Job already {job.state}")
+    
+    # Выполняющаяся задача сообщит об отмене сама
+    if was_queued:
+        await notify_processing_cancelled(job.file_id, job.job_id)
+    
+    return job.to_dict()
+
+
+@router.post("/jobs/cancel")
+async def cancel_jobs(request: CancelJobsRequest):
+    """Отменить несколько OCR задач по ID задач, ID файлов или всю очередь"""
+    queue_manager = _require_queue_manager()
+    queued = {
+        job.job_id
+        for job in queue_manager.list_jobs([JobState.QUEUED, JobState.RETRY_WAIT])
+    }
+    
+    cancelled = queue_manager.cancel_many(
+        job_ids=request.job_ids,
+        file_ids=request.file_ids,
+        all_queued=request.all_queued,
+        force=request.force,
+    )
+    
+    for job in cancelled:
+        if job.job_id in queued:
+            await notify_processing_cancelled(job.file_id, job.job_id)
+    
+    return {
+        "cancelled": len(cancelled),
+        "jobs": [job.to_dict() for job in cancelled],
+    }
+
+
+class ReplayDeadLettersRequest(BaseModel):
+    """Повторный запуск задач из dead-letter"""
+    ids: Optional[List[int]] = None  # None - все неразобранные
+
+
+@router.get("/groups/{group_id}")
+async def get_job_group(group_id: str, include_jobs: bool = False):
+    """Суммарный прогресс группы задач (например, bulk reprocess)"""
+    queue_manager = _require_queue_manager()
+    group = queue_manager.get_group(group_id)
+    if group is None:
+        raise HTTPException(status_code=404, detail="Job group not found")
+    
+    result = group.to_dict()
+    if include_jobs:
+        jobs = (queue_manager.get_job(job_id) for job_id in group.job_ids)
+        result["jobs"] = [job.to_dict() for job in jobs if job is not None]
+    return result
+
+
+@router.delete("/groups/{group_id}")
+async def cancel_job_group(group_id: str, force: bool = False):
+    """Отменить все незавершенные задачи группы"""
+    queue_manager = _require_queue_manager()
+    group = queue_manager.get_group(group_id)
+    if group is None:
+        raise HTTPException(status_code=404, detail="Job group not found")
+    
+    cancelled = queue_manager.cancel_many(job_ids=group.job_ids, force=force)
+    return {"group_id": group_id, "cancelled": [job.job_id for job in cancelled]}
+
+
+@router.get("/dead-letters")
+async def list_dead_letters(
+    include_replayed: bool = False,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Задачи, которые не удалось обработать после всех попыток"""
+    db: Session = SessionLocal()
+    try:
+        service = DeadLetterService(db)
+        entries = service.list(include_replayed=include_replayed, skip=skip, limit=limit)
+        return {
+            "total": service.count(include_replayed=include_replayed),
+            "items": [DeadLetterService.to_dict(e) for e in entries],
+        }
+    finally:
+        db.close()
+
+
+async def _replay(entries) -> List[str]:
+    queue_manager = _require_queue_manager()
+    job_ids = []
+    queued_files: Dict[int, str] = {}
+    for entry in entries:
+        # У файла может быть несколько записей - ставим его в очередь один раз
+        if entry.file_id not in queued_files:
+            file_obj = entry.file
+            queued_files[entry.file_id] = await queue_manager.add_task(
+                {"file_id": file_obj.id, "filepath": file_obj.filepath, "file_size": file_obj.file_size}
+            )
+        job_ids.append(queued_files[entry.file_id])
+    entry_ids = [entry.id for entry in entries]
+    await get_db_writer().execute(
+        lambda db: DeadLetterService(db, autocommit=False).mark_replayed(entry_ids)
+    )
+    return job_ids
+
+
+@router.post("/dead-letters/{entry_id}/replay")
+async def replay_dead_letter(entry_id: int):
+    """Повторно поставить проваленную задачу в очередь"""
+    db: Session = SessionLocal()
+    try:
+        entry = DeadLetterService(db).get(entry_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Dead letter not found")
+        if entry.replayed_at is not None:
+            raise HTTPException(status_code=409, detail="Dead letter already replayed")
+        
+        job_ids = await _replay([entry])
+        return {"id": entry_id, "file_id": entry.file_id, "job_id": job_ids[0]}
+    finally:
+        db.close()
+
+
+@router.post("/dead-letters/replay")
+async def replay_dead_letters(request: ReplayDeadLettersRequest):
+    """Повторно поставить в очередь несколько (или все) проваленные задачи"""
+    db: Session = SessionLocal()
+    try:
+        entries = DeadLetterService(db).pending_replay(request.ids)
+        job_ids = await _replay(entries)
+        return {
+            "replayed": len(entries),
+            "items": [
+                {"id": e.id, "file_id": e.file_id, "job_id": job_id}
+                for e, job_id in zip(entries, job_ids)
+            ],
+        }
+    finally:
+        db.close()
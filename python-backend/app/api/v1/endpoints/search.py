@@ -1,11 +1,10 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Optional
-from datetime import datetime
 
-from app.services.search_service import search as fts_search
-from app.db.session import SessionLocal
-from app.models.document import Document
-from sqlalchemy import and_
+from app.db.async_session import get_async_db
+from app.services.document_service import AsyncDocumentService
+from app.services.search_service import search_async
 
 router = APIRouter()
 
@@ -14,7 +13,8 @@ router = APIRouter()
 async def search_documents(
     q: str = Query(..., min_length=2, description="Поисковый запрос"),
     limit: int = Query(10, ge=1, le=100),
-    min_confidence: Optional[float] = Query(None, ge=0.0, le=1.0)
+    min_confidence: Optional[float] = Query(None, ge=0.0, le=1.0),
+    db: AsyncSession = Depends(get_async_db)
 ) -> List[Dict]:
     """
     Полнотекстовый поиск
@@ -23,20 +23,19 @@ async def search_documents(
     - **limit**: Максимум результатов
     - **min_confidence**: Минимальная уверенность OCR
     """
-    results = fts_search(q, limit)
+    results = await search_async(db, q, limit)
     
-    # Если фильтр по confidence - дополнительная фильтрация
+    # Если фильтр по confidence - дополнительная фильтрация (одним запросом)
     if min_confidence is not None:
-        db = SessionLocal()
-        try:
-            filtered = []
-            for r in results:
-                doc = db.query(Document).get(r["document_id"])
-                if doc and (doc.confidence_score or 0) >= min_confidence:
-                    r["confidence"] = doc.confidence_score
-                    filtered.append(r)
-            return filtered
-        finally:
-            db.close()
+        confidences = await AsyncDocumentService(db).confidences(
+            [r["document_id"] for r in results]
+        )
+        filtered = []
+        for r in results:
+            confidence = confidences.get(r["document_id"])
+            if r["document_id"] in confidences and (confidence or 0) >= min_confidence:
+                r["confidence"] = confidence
+                filtered.append(r)
+        return filtered
     
     return results
@@ -7,6 +7,7 @@ from typing import Optional, List
 from pydantic import BaseModel
 
 from app.core.config import settings
+from app.workers.queue_manager import get_queue_manager
 
 router = APIRouter()
 
@@ -17,6 +18,9 @@ class SettingsUpdate(BaseModel):
     default_ocr_engine: Optional[str] = None
     ocr_gpu: Optional[bool] = None
     max_concurrent_ocr: Optional[int] = None
+    ocr_autoscale_enabled: Optional[bool] = None
+    ocr_autoscale_min_workers: Optional[int] = None
+    ocr_autoscale_max_workers: Optional[int] = None
     pdf_dpi: Optional[int] = None
 
 
@@ -33,6 +37,11 @@ async def get_settings():
             "max_concurrent": settings.MAX_CONCURRENT_OCR,
             "confidence_threshold": settings.OCR_CONFIDENCE_THRESHOLD,
             "allowed_engines": settings.ALLOWED_OCR_ENGINES,
+            "autoscale": {
+                "enabled": settings.OCR_AUTOSCALE_ENABLED,
+                "min_workers": settings.OCR_AUTOSCALE_MIN_WORKERS,
+                "max_workers": settings.OCR_AUTOSCALE_MAX_WORKERS,
+            },
         },
         "files": {
             "supported_formats": settings.SUPPORTED_FORMATS,
@@ -83,10 +92,38 @@ async def update_settings(update: SettingsUpdate):
         if 1 <= update.max_concurrent_ocr <= 8:
             settings.MAX_CONCURRENT_OCR = update.max_concurrent_ocr
             updated.append("max_concurrent_ocr")
-            requires_restart.append("max_concurrent_ocr")
+            # Пул меняет размер на лету; при автомасштабировании
+            # значение применится как стартовое и будет скорректировано
+            queue_manager = get_queue_manager()
+            if queue_manager:
+                queue_manager.resize(update.max_concurrent_ocr)
         else:
             raise HTTPException(400, "max_concurrent_ocr must be 1-8")
     
+    # Явный 0 - недопустимое значение, а не "не задано"
+    min_workers = (
+        update.ocr_autoscale_min_workers if update.ocr_autoscale_min_workers is not None
+        else settings.OCR_AUTOSCALE_MIN_WORKERS
+    )
+    max_workers = (
+        update.ocr_autoscale_max_workers if update.ocr_autoscale_max_workers is not None
+        else settings.OCR_AUTOSCALE_MAX_WORKERS
+    )
+    if not (1 <= min_workers <= max_workers <= 8):
+        raise HTTPException(400, "Autoscale bounds must satisfy 1 <= min <= max <= 8")
+    
+    if update.ocr_autoscale_min_workers is not None:
+        settings.OCR_AUTOSCALE_MIN_WORKERS = min_workers
+        updated.append("ocr_autoscale_min_workers")
+    
+    if update.ocr_autoscale_max_workers is not None:
+        settings.OCR_AUTOSCALE_MAX_WORKERS = max_workers
+        updated.append("ocr_autoscale_max_workers")
+    
+    if update.ocr_autoscale_enabled is not None:
+        settings.OCR_AUTOSCALE_ENABLED = update.ocr_autoscale_enabled
+        updated.append("ocr_autoscale_enabled")
+    
     if update.pdf_dpi is not None:
         settings.PDF_DPI = update.pdf_dpi
         updated.append("pdf_dpi")
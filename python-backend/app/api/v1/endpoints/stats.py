@@ -9,6 +9,8 @@ from app.db.session import SessionLocal
 from app.models.file import File as FileModel
 from app.models.document import Document
 from app.core.config import settings
+from app.workers.admission import get_admission_controller
+from app.workers.queue_manager import get_queue_manager
 
 router = APIRouter()
 
@@ -89,4 +91,14 @@ async def get_recent_activity(hours: int = 24):
     
     finally:
         db.close()
-        
\ No newline at end of file
+        
+
+@router.get("/queue")
+async def get_queue_metrics():
+    """Состояние очереди OCR и бюджета памяти"""
+    queue_manager = get_queue_manager()
+    
+    return {
+        "queue": queue_manager.stats() if queue_manager else None,
+        "memory": get_admission_controller().metrics(),
+    }
@@ -1,64 +1,98 @@
 """
 Endpoints для загрузки файлов напрямую через API
 """
-import shutil
-import hashlib
-from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Header, Query
 
 from app.core.config import settings
+from app.core.exceptions import (
+    AppException,
+    DuplicateFileError,
+    FileFormatError,
+    FileHashError,
+    FileSizeError,
+)
+from app.services.ingestion import ingest_probes
+from app.services.uploads import iter_upload, store_upload
+from app.workers.scheduling import LANE_INTERACTIVE
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+_ERROR_STATUS = {
+    DuplicateFileError: 409,
+    FileFormatError: 415,
+    FileSizeError: 413,
+    FileHashError: 400,
+}
 
-def _hash_file(filepath: str) -> str:
-    """Вычислить SHA256 хэш файла"""
-    h = hashlib.sha256()
-    with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-    return h.hexdigest()
+
+async def _accept(chunks: AsyncIterator[bytes], filename: str, expected_hash: Optional[str]) -> dict:
+    """Сохранить поток, зарегистрировать файл в БД и поставить в очередь"""
+    try:
+        probe = await store_upload(chunks, filename, expected_hash)
+    except AppException as e:
+        status = _ERROR_STATUS.get(type(e), 500)
+        raise HTTPException(status, e.to_dict())
+    except Exception as e:
+        logger.exception(f"Failed to upload file: {e}")
+        raise HTTPException(500, f"Upload failed: {str(e)}")
+
+    file_ids = await ingest_probes([probe], lane=LANE_INTERACTIVE)
+    if not file_ids:
+        # Тот же файл успели зарегистрировать параллельно (объект
+        # хранилища общий, удалять его нельзя)
+        raise HTTPException(409, "File already registered")
+
+    return {
+        "status": "success",
+        "filename": probe["filename"],
+        "path": probe["filepath"],
+        "file_id": file_ids[0],
+        "file_hash": probe["file_hash"],
+        "size": probe["file_size"],
+        "message": "File uploaded and queued for processing"
+    }
 
 
 @router.post("")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(
+    file: UploadFile = File(...),
+    x_content_sha256: Optional[str] = Header(None)
+):
     """
-    Загрузить файл для обработки
-    
-    Файл будет сохранен в watch folder и автоматически обработан
+    Загрузить файл для обработки (multipart)
+
+    Файл сохраняется в хранилище оригиналов, регистрируется в БД и ставится
+    в интерактивную полосу очереди OCR (раньше пакетных задач).
+
+    - **X-Content-SHA256**: хэш файла от клиента; дубликат отклоняется сразу
     """
-    # Проверка формата
-    file_ext = Path(file.filename).suffix.lower().lstrip(".")
-    if file_ext not in settings.SUPPORTED_FORMATS:
-        raise HTTPException(
-            400,
-            f"Unsupported format: {file_ext}. Supported: {settings.SUPPORTED_FORMATS}"
-        )
-    
-    # Сохранить во временную директорию, затем переместить в watch
-    try:
-        temp_path = settings.WATCH_FOLDER / f"_uploading_{file.filename}"
-        final_path = settings.WATCH_FOLDER / file.filename
-        
-        # Записать файл
-        with temp_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Переместить (это вызовет событие file monitor)
-        temp_path.rename(final_path)
-        
-        logger.info(f"File uploaded: {final_path}")
-        
-        return {
-            "status": "success",
-            "filename": file.filename,
-            "path": str(final_path),
-            "message": "File uploaded and will be processed automatically"
-        }
+    return await _accept(iter_upload(file), file.filename, x_content_sha256)
+
+
+@router.post("/stream")
+async def upload_stream(
+    request: Request,
+    filename: str = Query(..., description="Имя файла с расширением"),
+    x_content_sha256: Optional[str] = Header(None)
+):
+    """
+    Загрузить файл сырым телом запроса (application/octet-stream)
+
+    Тело не буферизуется целиком: блоки пишутся на диск и хэшируются
+    по мере получения, превышение MAX_FILE_SIZE_MB обрывает загрузку.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length:
+        try:
+            size = int(content_length)
+        except ValueError:
+            raise HTTPException(400, "Invalid Content-Length header")
+        if size > settings.MAX_FILE_SIZE_MB * 1024 * 1024:
+            raise HTTPException(413, FileSizeError(
+                filename, round(size / 1024 / 1024, 1), settings.MAX_FILE_SIZE_MB
+            ).to_dict())
     
-    except Exception as e:
-        logger.exception(f"Failed to upload file: {e}")
-        raise HTTPException(500, f"Upload failed: {str(e)}")
-    
\ No newline at end of file
+    return await _accept(request.stream(), filename, x_content_sha256)
@@ -2,7 +2,7 @@
 WebSocket endpoint для real-time уведомлений
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import List
+from typing import List, Optional
 import asyncio
 import logging
 
@@ -45,8 +45,13 @@ async def websocket_endpoint(websocket: WebSocket):
     События:
     - file_added: новый файл добавлен
     - processing_started: начата обработка
+    - page_completed: страница распознана и уже доступна в поиске
     - processing_completed: обработка завершена
     - processing_failed: ошибка обработки
+    - processing_retry: временная ошибка, обработка будет повторена
+    - processing_cancelled: обработка отменена
+    - import_progress: прогресс массового импорта
+    - job_group_progress: суммарный прогресс группы задач (bulk reprocess)
     """
     await manager.connect(websocket)
     try:
@@ -77,6 +82,26 @@ async def notify_processing_started(file_id: int):
     })
 
 
+async def notify_page_completed(
+    file_id: int,
+    document_id: int,
+    page_number: int,
+    pages_done: int,
+    page_count: int,
+    eta_seconds: Optional[float] = None
+):
+    """Уведомить о распознанной странице (eta_seconds - оценка до конца документа)"""
+    await manager.broadcast({
+        "type": "page_completed",
+        "file_id": file_id,
+        "document_id": document_id,
+        "page_number": page_number,
+        "pages_done": pages_done,
+        "page_count": page_count,
+        "eta_seconds": eta_seconds
+    })
+
+
 async def notify_processing_completed(file_id: int, document_id: int):
     """Уведомить о завершении обработки"""
     await manager.broadcast({
@@ -93,4 +118,39 @@ async def notify_processing_failed(file_id: int, error: str):
         "file_id": file_id,
         "error": error
     })
-    
\ No newline at end of file
+
+
+async def notify_processing_cancelled(file_id: int, job_id: Optional[str] = None):
+    """Уведомить об отмене обработки"""
+    await manager.broadcast({
+        "type": "processing_cancelled",
+        "file_id": file_id,
+        "job_id": job_id
+    })
+
+
+async def notify_processing_retry(file_id: int, attempt: int, delay: float, error: str):
+    """Уведомить о повторной попытке после временной ошибки"""
+    await manager.broadcast({
+        "type": "processing_retry",
+        "file_id": file_id,
+        "attempt": attempt,
+        "retry_in": round(delay, 1),
+        "error": error
+    })
+
+
+async def notify_import_progress(progress: dict):
+    """Уведомить о прогрессе массового импорта"""
+    await manager.broadcast({
+        "type": "import_progress",
+        **progress
+    })
+
+
+async def notify_job_group_progress(progress: dict):
+    """Уведомить о прогрессе группы задач"""
+    await manager.broadcast({
+        "type": "job_group_progress",
+        **progress
+    })
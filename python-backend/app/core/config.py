@@ -2,7 +2,7 @@
 Конфигурация для десктопного OCR приложения
 """
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field, validator
 
@@ -31,11 +31,26 @@ class Settings(BaseSettings):
         """Папка для обработанных файлов"""
         return self.APP_DATA_DIR / "processed"
     
+    @property
+    def STORE_FOLDER(self) -> Path:
+        """Хранилище оригиналов, адресуемое по SHA-256 содержимого"""
+        return self.APP_DATA_DIR / "store"
+    
+    @property
+    def IMPORTS_FOLDER(self) -> Path:
+        """Чекпоинты массового импорта"""
+        return self.APP_DATA_DIR / "imports"
+    
     @property
     def DATABASE_PATH(self) -> Path:
         """Путь к SQLite базе данных"""
         return self.APP_DATA_DIR / "database" / "local.db"
     
+    @property
+    def TEXT_DICTIONARIES_FOLDER(self) -> Path:
+        """Словари zstd для сжатых текстовых колонок (нужны, пока есть данные)"""
+        return self.DATABASE_PATH.parent / "dictionaries"
+    
     @property
     def CACHE_DIR(self) -> Path:
         """Папка для кэша OCR моделей"""
@@ -71,7 +86,90 @@ class Settings(BaseSettings):
         default=0.5,
         description="Минимальный порог уверенности OCR"
     )
-    
+
+    OCR_PROCESS_ISOLATION: bool = Field(
+        default=True,
+        description="Распознавать страницы в отдельных процессах (позволяет убить зависший движок)"
+    )
+    OCR_PAGE_TIMEOUT_SECONDS: float = Field(
+        default=300.0,
+        description="Максимальное время распознавания одной страницы"
+    )
+    OCR_TASK_TIMEOUT_SECONDS: float = Field(
+        default=3600.0,
+        description="Максимальное время обработки одного файла"
+    )
+    OCR_RETRY_MAX_ATTEMPTS: int = Field(
+        default=4,
+        description="Сколько раз пытаться обработать файл при временных ошибках"
+    )
+    OCR_RETRY_BASE_DELAY_SECONDS: float = Field(
+        default=5.0,
+        description="Задержка перед первым повтором (далее удваивается)"
+    )
+    OCR_RETRY_MAX_DELAY_SECONDS: float = Field(
+        default=300.0,
+        description="Максимальная задержка между повторами"
+    )
+    OCR_FILE_SETTLE_SECONDS: float = Field(
+        default=2.0,
+        description="Файл, измененный позже этого срока, считается недописанным"
+    )
+    OCR_MEMORY_BUDGET_MB: Optional[int] = Field(
+        default=None,
+        description="Бюджет памяти для одновременно обрабатываемых страниц (по умолчанию половина RAM)"
+    )
+
+    # ==================== Автомасштабирование воркеров ====================
+    OCR_AUTOSCALE_ENABLED: bool = Field(
+        default=False,
+        description="Автоматически менять число воркеров по нагрузке"
+    )
+    OCR_AUTOSCALE_MIN_WORKERS: int = Field(
+        default=1,
+        description="Минимальное число воркеров при автомасштабировании"
+    )
+    OCR_AUTOSCALE_MAX_WORKERS: int = Field(
+        default=4,
+        description="Максимальное число воркеров при автомасштабировании"
+    )
+    OCR_AUTOSCALE_INTERVAL_SECONDS: float = Field(
+        default=10.0,
+        description="Интервал пересчета размера пула"
+    )
+    OCR_AUTOSCALE_MAX_FOREIGN_CPU_PERCENT: float = Field(
+        default=50.0,
+        description="Загрузка CPU другими программами, выше которой пул сокращается"
+    )
+    OCR_AUTOSCALE_MIN_FREE_MEMORY_MB: int = Field(
+        default=2048,
+        description="Минимум свободной памяти для добавления воркера"
+    )
+
+    # ==================== Планирование очереди OCR ====================
+    OCR_SCHEDULER_POLICY: str = Field(
+        default="sjf",
+        description="Политика планирования очереди (sjf или fifo)"
+    )
+    OCR_SCHEDULER_AGING_SECONDS_PER_PAGE: float = Field(
+        default=20.0,
+        description="Сколько секунд ожидания компенсирует одну страницу оценочной стоимости"
+    )
+    OCR_SCHEDULER_MAX_DELAY_SECONDS: float = Field(
+        default=1800.0,
+        description="Максимальная задержка длинной задачи относительно новых коротких"
+    )
+    OCR_SCHEDULER_MB_PER_PAGE: float = Field(
+        default=4.0,
+        description="Сколько МБ файла считается эквивалентом одной страницы"
+    )
+    OCR_FIRST_PAGES: int = Field(
+        default=1,
+        ge=0,
+        description="Сколько первых страниц нового документа распознавать отдельной "
+                    "короткой задачей (остаток ставится в очередь следом; 0 - отключить)"
+    )
+
     # ==================== Настройки обработки файлов ====================
     SUPPORTED_FORMATS: List[str] = Field(
         default=["pdf", "png", "jpg", "jpeg", "tiff", "bmp"],
@@ -81,11 +179,53 @@ class Settings(BaseSettings):
         default=50,
         description="Максимальный размер файла в МБ"
     )
+    UPLOAD_CHUNK_SIZE: int = Field(
+        default=1024 * 1024,
+        description="Размер блока при потоковой загрузке файла"
+    )
+    STORE_MODE: str = Field(
+        default="copy",
+        description="Как оригиналы из папки наблюдения попадают в хранилище: "
+                    "copy (копия или reflink, файл остается на месте), move или "
+                    "link (жесткая ссылка без копии; перезапись исходника на месте "
+                    "меняет и объект хранилища)"
+    )
     PDF_DPI: int = Field(
         default=300,
         description="DPI для конвертации PDF в изображения"
     )
     
+    # ==================== Мониторинг папки ====================
+    WATCH_STABILITY_INITIAL_DELAY_SECONDS: float = Field(
+        default=0.5,
+        description="Первая проверка размера/mtime нового файла"
+    )
+    WATCH_STABILITY_MAX_DELAY_SECONDS: float = Field(
+        default=30.0,
+        description="Максимальный интервал проверки файла, который еще записывается"
+    )
+    WATCH_STABILITY_TICK_SECONDS: float = Field(
+        default=0.25,
+        description="Шаг колеса таймеров для проверок стабильности"
+    )
+    WATCH_RECONCILE_INTERVAL_SECONDS: float = Field(
+        default=900.0,
+        description="Интервал сверки папки с БД (0 - только при старте)"
+    )
+    INGEST_DEBOUNCE_SECONDS: float = Field(
+        default=1.0,
+        description="Пауза без событий по файлу, после которой он регистрируется"
+    )
+    INGEST_BATCH_SIZE: int = Field(
+        default=100,
+        description="Максимум файлов, регистрируемых одной транзакцией"
+    )
+    
+    HASH_WORKERS: Optional[int] = Field(
+        default=None,
+        description="Потоков для хэширования файлов (по умолчанию min(4, CPU))"
+    )
+    
     # ==================== Серверная синхронизация ====================
     SERVER_ENABLED: bool = Field(
         default=False,
@@ -140,10 +280,102 @@ class Settings(BaseSettings):
         """URL для подключения к SQLite"""
         return f"sqlite:///{self.DATABASE_PATH}"
     
+    @property
+    def DATABASE_READ_URL(self) -> str:
+        """URL read-only подключения к SQLite (движок чтения)"""
+        return f"sqlite:///file:{self.DATABASE_PATH}?mode=ro&uri=true"
+    
+    @property
+    def DATABASE_ASYNC_READ_URL(self) -> str:
+        """URL read-only подключения через aiosqlite (асинхронные endpoints)"""
+        return f"sqlite+aiosqlite:///file:{self.DATABASE_PATH}?mode=ro&uri=true"
+    
+    DB_READ_POOL_SIZE: int = Field(
+        default=8,
+        ge=1,
+        description="Соединений в пуле чтения (читатели WAL не блокируют друг друга)"
+    )
+    DB_WRITE_POOL_SIZE: int = Field(
+        default=2,
+        ge=1,
+        description="Соединений в пуле записи (SQLite все равно пишет по одному)"
+    )
     DB_ECHO: bool = Field(
         default=False,
         description="Выводить SQL запросы в лог"
     )
+    DB_PROFILES: Dict[str, Dict[str, Any]] = Field(
+        default={
+            # WAL: читатели не блокируют писателя; после сбоя питания
+            # теряется не больше последних транзакций, БД не портится
+            "balanced": {
+                "journal_mode": "WAL",
+                "synchronous": "NORMAL",
+                "cache_size": -64000,
+                "mmap_size": 256 * 1024 * 1024,
+                "temp_store": "MEMORY",
+                "busy_timeout": 10000,
+            },
+            # fsync на каждой фиксации
+            "durable": {
+                "journal_mode": "WAL",
+                "synchronous": "FULL",
+                "cache_size": -16000,
+                "mmap_size": 0,
+                "temp_store": "DEFAULT",
+                "busy_timeout": 10000,
+            },
+            # Массовый импорт на временной БД: без fsync
+            "fast": {
+                "journal_mode": "WAL",
+                "synchronous": "OFF",
+                "cache_size": -256000,
+                "mmap_size": 1024 * 1024 * 1024,
+                "temp_store": "MEMORY",
+                "busy_timeout": 30000,
+            },
+            # Сетевые диски, где WAL (разделяемая память) не работает
+            "compat": {
+                "journal_mode": "DELETE",
+                "synchronous": "FULL",
+                "cache_size": -16000,
+                "mmap_size": 0,
+                "temp_store": "DEFAULT",
+                "busy_timeout": 30000,
+            },
+        },
+        description="Именованные наборы PRAGMA для соединений SQLite"
+    )
+    DB_PROFILE: str = Field(
+        default="balanced",
+        description="Профиль соединений SQLite из DB_PROFILES"
+    )
+    DB_WAL_CHECKPOINT_INTERVAL_SECONDS: float = Field(
+        default=30.0,
+        ge=0,
+        description="Как часто проверять, нужен ли checkpoint WAL (0 - отключить)"
+    )
+    DB_WAL_CHECKPOINT_IDLE_SECONDS: float = Field(
+        default=5.0,
+        ge=0,
+        description="Сколько секунд без записей считается простоем для checkpoint"
+    )
+    DB_WAL_MAX_SIZE_MB: int = Field(
+        default=64,
+        ge=1,
+        description="Размер WAL, после которого checkpoint выполняется и без простоя"
+    )
+    DB_WRITER_FLUSH_INTERVAL_MS: float = Field(
+        default=0.0,
+        ge=0,
+        description="Сколько писатель БД ждет попутные записи перед фиксацией группы "
+                    "(0 - группа из того, что накопилось за предыдущую фиксацию)"
+    )
+    DB_WRITER_BATCH_SIZE: int = Field(
+        default=256,
+        ge=1,
+        description="Максимум записей в одной транзакции писателя БД"
+    )
     
     # ==================== Логирование ====================
     LOG_LEVEL: str = Field(
@@ -182,6 +414,34 @@ class Settings(BaseSettings):
         default=128,
         description="Максимальный размер кэша"
     )
+    FTS_INDEX_BATCH_SIZE: int = Field(
+        default=2000,
+        ge=1,
+        description="Страниц в одной транзакции при индексации FTS"
+    )
+    FTS_INDEX_INTERVAL_SECONDS: float = Field(
+        default=30.0,
+        ge=0,
+        description="Интервал проверки изменений страниц, записанных мимо приложения (0 - не проверять)"
+    )
+    TEXT_COMPRESSION: str = Field(
+        default="zlib",
+        description="Сжатие больших текстовых колонок: none, zlib или zstd (пакет zstandard)"
+    )
+    TEXT_COMPRESSION_MIN_BYTES: int = Field(
+        default=1024,
+        ge=0,
+        description="Тексты короче (в байтах UTF-8) хранятся без сжатия"
+    )
+    TEXT_COMPRESSION_LEVEL: Optional[int] = Field(
+        default=None,
+        description="Уровень сжатия (по умолчанию 6 для zlib, 3 для zstd)"
+    )
+    TEXT_DICTIONARY_SIZE_KB: int = Field(
+        default=112,
+        ge=1,
+        description="Размер словаря zstd, обучаемого на текстах страниц"
+    )
     
     # ==================== Валидаторы ====================
     @validator("DEFAULT_OCR_ENGINE")
@@ -201,12 +461,51 @@ class Settings(BaseSettings):
             raise ValueError(f"Log level must be one of {allowed}")
         return v
     
+    @validator("OCR_SCHEDULER_POLICY")
+    def validate_scheduler_policy(cls, v):
+        """Проверка политики планирования"""
+        allowed = ["sjf", "fifo"]
+        if v not in allowed:
+            raise ValueError(f"Scheduler policy must be one of {allowed}")
+        return v
+
+    @validator("STORE_MODE")
+    def validate_store_mode(cls, v):
+        """Проверка режима хранилища"""
+        allowed = ["copy", "link", "move"]
+        if v not in allowed:
+            raise ValueError(f"Store mode must be one of {allowed}")
+        return v
+
+    @validator("TEXT_COMPRESSION")
+    def validate_text_compression(cls, v):
+        """Проверка кодека сжатия текста"""
+        allowed = ["none", "zlib", "zstd"]
+        if v not in allowed:
+            raise ValueError(f"Text compression must be one of {allowed}")
+        return v
+
+    @validator("DB_PROFILE")
+    def validate_db_profile(cls, v, values):
+        """Проверка профиля соединений SQLite"""
+        allowed = list(values.get("DB_PROFILES") or {})
+        if v not in allowed:
+            raise ValueError(f"DB profile must be one of {allowed}")
+        return v
+
     @validator("MAX_CONCURRENT_OCR")
     def validate_max_concurrent(cls, v):
         """Проверка количества одновременных задач"""
         if v < 1 or v > 8:
             raise ValueError("MAX_CONCURRENT_OCR must be between 1 and 8")
         return v
+
+    @validator("OCR_AUTOSCALE_MIN_WORKERS", "OCR_AUTOSCALE_MAX_WORKERS")
+    def validate_autoscale_bounds(cls, v):
+        """Проверка границ автомасштабирования"""
+        if v < 1 or v > 8:
+            raise ValueError("Autoscale worker bounds must be between 1 and 8")
+        return v
     
     # ==================== Конфигурация Pydantic ====================
     model_config = SettingsConfigDict(
@@ -222,6 +521,8 @@ class Settings(BaseSettings):
             self.APP_DATA_DIR,
             self.WATCH_FOLDER,
             self.PROCESSED_FOLDER,
+            self.STORE_FOLDER,
+            self.IMPORTS_FOLDER,
             self.DATABASE_PATH.parent,
             self.CACHE_DIR,
             self.LOGS_DIR,
@@ -7,6 +7,9 @@ from typing import Optional, Dict, Any
 class AppException(Exception):
     """Базовый класс для всех исключений приложения"""
     
+    # Временная ошибка: задачу имеет смысл повторить позже
+    retryable: bool = False
+    
     def __init__(
         self,
         message: str,
@@ -24,6 +27,7 @@ class AppException(Exception):
             "error": self.__class__.__name__,
             "message": self.message,
             "error_code": self.error_code,
+            "retryable": self.retryable,
             "details": self.details
         }
 
@@ -83,6 +87,34 @@ class FileHashError(FileException):
         )
 
 
+class DuplicateFileError(FileException):
+    """Файл с таким содержимым уже зарегистрирован"""
+    
+    def __init__(self, filepath: str, file_hash: str, existing_file_id: int):
+        super().__init__(
+            message=f"Duplicate of file {existing_file_id}",
+            error_code="DUPLICATE_FILE",
+            details={
+                "filepath": filepath,
+                "file_hash": file_hash,
+                "existing_file_id": existing_file_id
+            }
+        )
+
+
+class FileNotReadyError(FileException):
+    """Файл еще записывается или заблокирован другим процессом"""
+    
+    retryable = True
+    
+    def __init__(self, filepath: str, reason: str):
+        super().__init__(
+            message=f"File is not ready: {reason}",
+            error_code="FILE_NOT_READY",
+            details={"filepath": filepath, "reason": reason}
+        )
+
+
 # ==================== OCR исключения ====================
 
 class OCRException(AppException):
@@ -123,6 +155,30 @@ class OCRTimeoutError(OCRException):
         )
 
 
+class OCRResourceError(OCRException):
+    """Движку OCR не хватило ресурсов (память, процесс упал)"""
+    
+    retryable = True
+    
+    def __init__(self, reason: str):
+        super().__init__(
+            message=f"OCR engine ran out of resources: {reason}",
+            error_code="OCR_RESOURCE_ERROR",
+            details={"reason": reason}
+        )
+
+
+class OCRCancelledError(OCRException):
+    """OCR задача отменена пользователем"""
+
+    def __init__(self, job_id: str):
+        super().__init__(
+            message=f"OCR job {job_id} was cancelled",
+            error_code="OCR_CANCELLED",
+            details={"job_id": job_id}
+        )
+
+
 # ==================== Исключения базы данных ====================
 
 class DatabaseException(AppException):
@@ -152,6 +208,19 @@ class DatabaseConnectionError(DatabaseException):
         )
 
 
+class DatabaseLockedError(DatabaseException):
+    """База данных временно заблокирована другой транзакцией"""
+    
+    retryable = True
+    
+    def __init__(self, reason: str):
+        super().__init__(
+            message=f"Database is locked: {reason}",
+            error_code="DB_LOCKED",
+            details={"reason": reason}
+        )
+
+
 # ==================== Исключения синхронизации ====================
 
 class SyncException(AppException):
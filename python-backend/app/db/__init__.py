@@ -1,8 +1,9 @@
-from app.db.session import engine, SessionLocal, get_db
+from app.db.session import engine, read_engine, SessionLocal, get_db
 from app.db.init_db import init_db
 
 __all__ = [
     "engine",
+    "read_engine",
     "SessionLocal",
     "get_db",
     "init_db",
@@ -0,0 +1,43 @@
+"""
+Асинхронный доступ к БД для endpoints
+
+Чтение идет через SQLAlchemy asyncio поверх aiosqlite по read-only
+соединениям (mode=ro, query_only): запросы выполняются в потоках
+aiosqlite, event loop не блокируется. Записи из асинхронного кода идут
+через писателя БД (app.db.writer) и остаются последовательными.
+"""
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+from app.db.tuning import apply_sqlite_profile
+from app.db.types import register_sqlite_functions
+
+async_read_engine = create_async_engine(
+    settings.DATABASE_ASYNC_READ_URL,
+    echo=settings.DB_ECHO,
+    pool_pre_ping=True,
+    # По умолчанию aiosqlite открывает соединение (и поток) на каждую сессию
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=settings.DB_READ_POOL_SIZE,
+)
+
+apply_sqlite_profile(
+    async_read_engine.sync_engine,
+    settings.DB_PROFILES[settings.DB_PROFILE],
+    read_only=True,
+)
+register_sqlite_functions(async_read_engine.sync_engine)
+
+# Фабрика асинхронных сессий (только чтение)
+AsyncSessionLocal = async_sessionmaker(
+    async_read_engine, expire_on_commit=False, autoflush=False
+)
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Dependency для получения асинхронной сессии чтения"""
+    async with AsyncSessionLocal() as db:
+        yield db
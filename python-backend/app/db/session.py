@@ -1,17 +1,103 @@
+"""
+Движки и сессии БД
+
+Два пула: небольшой пул записи и read-only пул чтения (mode=ro,
+query_only). В режиме WAL читатели не ждут писателя, поэтому запросы UI
+(/files, /documents, /search) масштабируются числом соединений чтения,
+а записи идут по одной. Сессии SessionLocal выбирают движок сами
+(RoutingSession), вызывающему коду ничего менять не нужно.
+"""
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
 from app.core.config import settings
+from app.db.tuning import apply_sqlite_profile
+from app.db.types import register_sqlite_functions
+
+_connect_args = {"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
 
-# Создание движка базы данных
+# Движок записи (он же для миграций, init_db и писателя БД)
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
+    connect_args=_connect_args,
+    echo=settings.DB_ECHO,
+    pool_pre_ping=True,
+    pool_size=settings.DB_WRITE_POOL_SIZE,
+)
+
+# Движок чтения
+read_engine = create_engine(
+    settings.DATABASE_READ_URL,
+    connect_args=_connect_args,
     echo=settings.DB_ECHO,
     pool_pre_ping=True,
+    pool_size=settings.DB_READ_POOL_SIZE,
 )
 
+if "sqlite" in settings.DATABASE_URL:
+    # WAL, synchronous, кэш и mmap из профиля DB_PROFILE
+    profile = settings.DB_PROFILES[settings.DB_PROFILE]
+    apply_sqlite_profile(engine, profile)
+    apply_sqlite_profile(read_engine, profile, read_only=True)
+    register_sqlite_functions(engine)
+    register_sqlite_functions(read_engine)
+
+# Текстовые запросы, которые меняют БД
+_WRITE_STATEMENTS = {
+    "INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER",
+    "VACUUM", "REINDEX", "ANALYZE", "BEGIN",
+}
+
+
+def _is_write(clause) -> bool:
+    if isinstance(clause, UpdateBase):
+        return True
+    if isinstance(clause, TextClause):
+        words = clause.text.split(None, 1)
+        return bool(words) and words[0].upper() in _WRITE_STATEMENTS
+    return False
+
+
+class RoutingSession(Session):
+    """
+    Сессия, выбирающая движок по операции
+
+    SELECT идут в пул чтения, flush и DML - в пул записи. После первой
+    записи вся транзакция остается на соединении записи, чтобы видеть
+    свои незафиксированные изменения; после commit/rollback чтение снова
+    идет через пул чтения.
+    """
+
+    _writing = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._writing or self._flushing or _is_write(clause):
+            self._writing = True
+            return engine
+        return read_engine
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            self._writing = False
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self._writing = False
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._writing = False
+
+
 # Фабрика сессий
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
 
 
 def get_db():
@@ -21,4 +107,3 @@ def get_db():
         yield db
     finally:
         db.close()
-        
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+Настройка соединений SQLite и обслуживание WAL
+
+PRAGMA из профиля (Settings.DB_PROFILES[DB_PROFILE]) выставляются на
+каждом новом соединении пула через событие connect. В режиме WAL
+читатели (поиск) не ждут фиксации писателя, а WalCheckpointer в фоне
+переносит WAL в основной файл в периоды простоя, чтобы он не рос без
+ограничений, пока читатели мешают автоматическому checkpoint.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Порядок важен: режим журнала меняется до первой транзакции
+_PRAGMAS = ("busy_timeout", "journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store")
+
+
+def apply_sqlite_profile(engine: Engine, profile: Dict[str, Any], read_only: bool = False):
+    """
+    Выставлять PRAGMA профиля на каждом соединении движка
+
+    Args:
+        profile: Значения PRAGMA по именам (неизвестные имена игнорируются)
+        read_only: Движок чтения: режим журнала задает движок записи,
+            дополнительно включается query_only
+    """
+    pragmas = [
+        (name, profile[name]) for name in _PRAGMAS
+        if name in profile and not (read_only and name == "journal_mode")
+    ]
+    if read_only:
+        pragmas.append(("query_only", 1))
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+
+# ==================== Checkpoint WAL ====================
+
+class WalCheckpointer:
+    """
+    Фоновый checkpoint WAL
+
+    Раз в interval секунд проверяется файл -wal: если в него не писали
+    idle_seconds (простой) или он больше max_size_mb, выполняется
+    wal_checkpoint(TRUNCATE) - WAL переносится в БД и обрезается до нуля.
+    Под нагрузкой достаточно встроенного автоматического checkpoint.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        interval: Optional[float] = None,
+        idle_seconds: Optional[float] = None,
+        max_size_mb: Optional[int] = None,
+    ):
+        self.engine = engine
+        self.interval = settings.DB_WAL_CHECKPOINT_INTERVAL_SECONDS if interval is None else interval
+        self.idle_seconds = settings.DB_WAL_CHECKPOINT_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self.max_size = (max_size_mb or settings.DB_WAL_MAX_SIZE_MB) * 1024 * 1024
+        self.wal_path = f"{engine.url.database}-wal"
+        self.last_result: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def wal_size(self) -> int:
+        try:
+            return os.stat(self.wal_path).st_size
+        except OSError:
+            return 0
+
+    def checkpoint(self, mode: str = "TRUNCATE") -> Dict:
+        """
+        Выполнить checkpoint (блокирующий вызов)
+
+        Returns:
+            busy (1 - не все кадры перенесены из-за активных соединений),
+            число кадров в WAL и перенесенных кадров
+        """
+        size_before = self.wal_size()
+        started = time.monotonic()
+        with self.engine.connect() as connection:
+            busy, log_frames, checkpointed = connection.exec_driver_sql(
+                f"PRAGMA wal_checkpoint({mode})"
+            ).one()
+        self.last_result = {
+            "mode": mode,
+            "busy": bool(busy),
+            "log_frames": log_frames,
+            "checkpointed_frames": checkpointed,
+            "wal_size_before": size_before,
+            "wal_size_after": self.wal_size(),
+            "duration_seconds": round(time.monotonic() - started, 3),
+            "finished_at": time.time(),
+        }
+        logger.info(f"WAL checkpoint: {self.last_result}")
+        return self.last_result
+
+    def _due(self) -> bool:
+        try:
+            stat = os.stat(self.wal_path)
+        except OSError:
+            return False
+        if stat.st_size == 0:
+            return False
+        idle = time.time() - stat.st_mtime >= self.idle_seconds
+        return idle or stat.st_size > self.max_size
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if self._due():
+                    await asyncio.to_thread(self.checkpoint)
+            except Exception as e:
+                logger.warning(f"WAL checkpoint failed: {e}")
+
+    def start(self):
+        if self.interval and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановить фоновую проверку и перенести WAL перед выходом"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.wal_size():
+            try:
+                await asyncio.to_thread(self.checkpoint)
+            except Exception as e:
+                logger.warning(f"Final WAL checkpoint failed: {e}")
+
+
+# Глобальный экземпляр
+_wal_checkpointer: Optional[WalCheckpointer] = None
+
+
+def get_wal_checkpointer() -> WalCheckpointer:
+    """Получить менеджер checkpoint WAL (singleton)"""
+    global _wal_checkpointer
+    if _wal_checkpointer is None:
+        from app.db.session import engine
+        _wal_checkpointer = WalCheckpointer(engine)
+    return _wal_checkpointer
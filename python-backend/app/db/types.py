@@ -0,0 +1,78 @@
+"""
+Типы колонок с собственным кодированием значений
+"""
+from sqlalchemy import LargeBinary, Text, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.types import TypeDecorator
+
+from app.services.geometry import PageGeometry
+from app.services.text_compression import get_text_compressor
+
+
+class GeometryType(TypeDecorator):
+    """
+    Геометрия страницы (PageGeometry) в BLOB
+
+    Принимает PageGeometry, уже закодированные байты или прежний список
+    рамок; читается PageGeometry, который разбирается только при
+    обращении к массивам.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, PageGeometry):
+            return value.raw
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        return PageGeometry.from_boxes(value).raw
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return PageGeometry(value)
+
+    def compare_values(self, x, y):
+        return x == y
+
+
+class CompressedText(TypeDecorator):
+    """
+    Текст, который сжимается при записи, если он достаточно длинный
+
+    Сжатые значения хранятся BLOB, остальные - TEXT, как и раньше
+    (см. app.services.text_compression). Читается всегда str.
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return get_text_compressor().compress(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return get_text_compressor().decompress(value)
+
+
+def decompress_text(value):
+    """SQL-функция decompress_text(): текст значения CompressedText"""
+    if value is None:
+        return None
+    return get_text_compressor().decompress(value)
+
+
+def register_sqlite_functions(engine: Engine):
+    """
+    Регистрировать SQL-функции на каждом соединении движка
+
+    decompress_text() нужна FTS5 с внешним содержимым для чтения текста
+    страниц (snippet, highlight, rebuild): вид распаковывает document_pages.
+    """
+    @event.listens_for(engine, "connect")
+    def _register(dbapi_connection, connection_record):
+        dbapi_connection.create_function("decompress_text", 1, decompress_text, deterministic=True)
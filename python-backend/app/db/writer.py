@@ -0,0 +1,211 @@
+"""
+Единственный писатель БД с групповой фиксацией
+
+SQLite допускает одного писателя: отдельные commit из воркеров, API и
+ингеста стоят по fsync каждый и конкурируют за блокировку записи
+("database is locked"). Писатель принимает намерения записи - функции
+от сессии - через очередь и выполняет их в своем потоке на одном
+соединении. Все намерения, накопившиеся в очереди, пока шла предыдущая
+фиксация (не больше DB_WRITER_BATCH_SIZE), фиксируются одной
+транзакцией. DB_WRITER_FLUSH_INTERVAL_MS > 0 дополнительно ждет
+попутные записи: группы крупнее, но одиночная запись ждет дольше.
+
+Каждое намерение выполняется в SAVEPOINT: ошибка откатывает только
+его, остальные записи группы фиксируются. Результат (или исключение)
+возвращается вызывающему после фиксации. Функции before_commit
+выполняются в конце каждой группы в той же транзакции (например,
+индексация изменений, которые записали намерения группы).
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class DatabaseWriter:
+    """Поток-писатель: очередь намерений и групповые транзакции"""
+
+    def __init__(self, flush_interval: Optional[float] = None, batch_size: Optional[int] = None):
+        """
+        Args:
+            flush_interval: Сколько секунд ждать попутные записи
+            batch_size: Максимум намерений в одной транзакции
+        """
+        self.flush_interval = (
+            settings.DB_WRITER_FLUSH_INTERVAL_MS / 1000 if flush_interval is None else flush_interval
+        )
+        self.batch_size = batch_size or settings.DB_WRITER_BATCH_SIZE
+        self.commits = 0
+        self.writes = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._before_commit: List[Callable[[Session], Any]] = []
+
+    def before_commit(self, hook: Callable[[Session], Any]):
+        """
+        Выполнять hook(session) перед каждой групповой фиксацией
+
+        Ошибка функции откатывает только ее SAVEPOINT и записывается в
+        лог: намерения группы все равно фиксируются.
+        """
+        if hook not in self._before_commit:
+            self._before_commit.append(hook)
+
+    # ==================== Постановка ====================
+
+    def submit(self, intent: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Поставить намерение записи (из любого потока)
+
+        Args:
+            intent: Функция intent(session, *args, **kwargs); не должна
+                вызывать commit/rollback
+
+        Returns:
+            Future с результатом функции, завершается после фиксации
+        """
+        self.start()
+        future: Future = Future()
+        self._queue.put((intent, args, kwargs, future))
+        return future
+
+    async def execute(self, intent: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполнить намерение записи и дождаться фиксации (из event loop)"""
+        return await asyncio.wrap_future(self.submit(intent, *args, **kwargs))
+
+    def execute_sync(self, intent: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполнить намерение записи и дождаться фиксации (из потока)"""
+        return self.submit(intent, *args, **kwargs).result()
+
+    # ==================== Поток писателя ====================
+
+    def _next_batch(self) -> Tuple[List[Tuple], bool]:
+        """Первое намерение - ожидание без ограничения, попутные - до flush_interval"""
+        batch = []
+        item = self._queue.get()
+        if item is _STOP:
+            return batch, True
+        batch.append(item)
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _apply(self, connection, batch: List[Tuple]):
+        session = Session(bind=connection, autoflush=False, expire_on_commit=False)
+        results = []
+        try:
+            session.execute(text("BEGIN IMMEDIATE"))
+            for intent, args, kwargs, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                savepoint = session.begin_nested()
+                try:
+                    result = intent(session, *args, **kwargs)
+                    session.flush()
+                    savepoint.commit()
+                    results.append((future, result, None))
+                except Exception as e:
+                    savepoint.rollback()
+                    results.append((future, None, e))
+            for hook in self._before_commit:
+                savepoint = session.begin_nested()
+                try:
+                    hook(session)
+                    session.flush()
+                    savepoint.commit()
+                except Exception as e:
+                    savepoint.rollback()
+                    logger.exception(f"Before-commit hook {hook.__name__} failed: {e}")
+            session.commit()
+        except Exception as e:
+            # Не удались BEGIN, откат savepoint или фиксация - не записано
+            # ничего; ответ получает каждое намерение пачки
+            logger.exception(f"Group commit of {len(batch)} write(s) failed: {e}")
+            try:
+                session.rollback()
+            except Exception:
+                logger.exception("Rollback of the failed group commit failed")
+            results = [(future, None, e) for _, _, _, future in batch if not future.done()]
+        finally:
+            session.close()
+
+        self.commits += 1
+        self.writes += len(results)
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _run(self):
+        logger.info(
+            f"Database writer started (flush {self.flush_interval * 1000:.1f}ms, "
+            f"batch {self.batch_size})"
+        )
+        with engine.connect() as connection:
+            # pysqlite открывает транзакцию сам только перед DML, и RELEASE
+            # первого SAVEPOINT зафиксировал бы запись отдельно. Транзакцию
+            # группы писатель открывает явно (BEGIN IMMEDIATE сразу берет
+            # блокировку записи).
+            dbapi_connection = connection.connection.driver_connection
+            isolation_level = dbapi_connection.isolation_level
+            dbapi_connection.isolation_level = None
+            try:
+                stopping = False
+                while not stopping:
+                    batch, stopping = self._next_batch()
+                    if batch:
+                        self._apply(connection, batch)
+            finally:
+                dbapi_connection.isolation_level = isolation_level
+        logger.info(f"Database writer stopped: {self.writes} write(s) in {self.commits} commit(s)")
+
+    def start(self):
+        """Запустить поток (вызывается и лениво при первой записи)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Зафиксировать поставленные записи и остановить поток"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+
+# Глобальный экземпляр
+_db_writer: Optional[DatabaseWriter] = None
+
+
+def get_db_writer() -> DatabaseWriter:
+    """Получить писателя БД (singleton)"""
+    global _db_writer
+    if _db_writer is None:
+        _db_writer = DatabaseWriter()
+    return _db_writer
@@ -1,8 +1,5 @@
 from contextlib import asynccontextmanager
-from pathlib import Path
-import hashlib
-import mimetypes
-import os
+import asyncio
 import signal
 
 from fastapi import FastAPI
@@ -12,60 +9,34 @@ from app.api.v1.router import api_router
 from app.core.config import settings
 from app.core.logging import get_logger, setup_logging
 from app.db.init_db import init_db
-from app.db.session import SessionLocal
-from app.models.file import File as FileModel
+from app.db.writer import get_db_writer
+from app.db.tuning import get_wal_checkpointer
+from app.db.async_session import async_read_engine
 from app.services.file_monitor import FileMonitor
-from app.services.search_service import ensure_fts_table
-from app.workers.queue_manager import QueueManager
-from app.workers.ocr_worker import process_ocr_task
+from app.services.search_service import ensure_fts_table, get_fts_indexer
+from app.services.ingestion import IngestionBridge, requeue_pending
+from app.services.reconciler import WatchFolderReconciler
+from app.services.bulk_import import get_bulk_importer
+from app.services.hashing import get_hashing_service
+from app.workers.queue_manager import QueueManager, set_queue_manager
+from app.workers.autoscaler import PoolAutoscaler
+from app.workers.ocr_worker import (
+    process_ocr_task, on_task_retry, on_task_dead_letter, on_job_group_progress
+)
+from app.workers.ocr_executor import get_ocr_process_pool
 from app.api.v1.endpoints import ws
-from app.utils.hash_utils import hash_file
 
 logger = get_logger(__name__)
 file_monitor: FileMonitor | None = None
 queue_manager: QueueManager | None = None
-
-
-async def _on_new_file(filepath: str):
-    global queue_manager
-    try:
-        db = SessionLocal()
-        stat = os.stat(filepath)
-        mime = mimetypes.guess_type(filepath)[0] or "application/octet-stream"
-        file_hash = hash_file(filepath)
-
-        exists = db.query(FileModel).filter(FileModel.file_hash == file_hash).first()
-        if exists:
-            logger.info(f"Skip duplicate: {filepath}")
-            db.close()
-            return
-
-        rec = FileModel(
-            filename=Path(filepath).name,
-            filepath=filepath,
-            file_hash=file_hash,
-            file_size=stat.st_size,
-            mime_type=mime,
-            is_processed=False,
-        )
-        db.add(rec)
-        db.commit()
-        db.refresh(rec)
-        file_id = rec.id
-        
-        logger.info(f"Indexed new file: {filepath} (id={file_id})")
-        db.close()
-        
-        if queue_manager:
-            await queue_manager.add_task({"file_id": file_id})
-        
-    except Exception as e:
-        logger.exception(f"Failed to index new file {filepath}: {e}")
+autoscaler: PoolAutoscaler | None = None
+ingestion_bridge: IngestionBridge | None = None
+reconciler: WatchFolderReconciler | None = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global file_monitor, queue_manager
+    global file_monitor, queue_manager, autoscaler, ingestion_bridge, reconciler
     
     logger.info("=" * 60)
     logger.info("Starting OCR Desktop Manager...")
@@ -74,20 +45,44 @@ async def lifespan(app: FastAPI):
     setup_logging()
     init_db()
     ensure_fts_table()
+    get_db_writer().start()
+    get_wal_checkpointer().start()
+    # Очередь индексации FTS разбирается в фоне
+    get_fts_indexer().start()
     
     # Запуск очереди обработки
     queue_manager = QueueManager(
         worker_func=process_ocr_task,
-        num_workers=settings.MAX_CONCURRENT_OCR
+        num_workers=settings.MAX_CONCURRENT_OCR,
+        task_timeout=settings.OCR_TASK_TIMEOUT_SECONDS,
+        on_retry=on_task_retry,
+        on_dead_letter=on_task_dead_letter,
+        on_group_progress=on_job_group_progress
     )
     await queue_manager.start()
-    logger.info(f"Queue manager started with {settings.MAX_CONCURRENT_OCR} workers")
+    set_queue_manager(queue_manager)
+    logger.info(
+        f"Queue manager started with {settings.MAX_CONCURRENT_OCR} workers "
+        f"(policy: {settings.OCR_SCHEDULER_POLICY})"
+    )
     
-    # Запуск мониторинга файлов
-    file_monitor = FileMonitor(settings.WATCH_FOLDER, _on_new_file)
+    # Задачи, прерванные остановкой, продолжаются с последней сохраненной страницы
+    await requeue_pending()
+    
+    autoscaler = PoolAutoscaler(queue_manager)
+    autoscaler.start()
+    
+    # Запуск мониторинга файлов: события из потока watchdog идут в loop через мост
+    ingestion_bridge = IngestionBridge()
+    ingestion_bridge.start()
+    file_monitor = FileMonitor(settings.WATCH_FOLDER, ingestion_bridge.submit)
     file_monitor.start()
     logger.info(f"File monitor started: {settings.WATCH_FOLDER}")
     
+    # Файлы, добавленные пока приложение не работало, событий не порождают
+    reconciler = WatchFolderReconciler()
+    reconciler.start()
+    
     def signal_handler(signum, frame):
         """Обработчик сигналов завершения"""
         sig_name = signal.Signals(signum).name
@@ -110,16 +105,39 @@ async def lifespan(app: FastAPI):
         logger.info("Shutting down OCR Desktop Manager...")
         logger.info("=" * 60)
         
+        if reconciler:
+            await reconciler.stop()
+        
+        # Чекпоинты сохраняются, импорт продолжается после перезапуска
+        await get_bulk_importer().stop()
+        
         if file_monitor:
             logger.info("Stopping file monitor...")
             file_monitor.stop()
             logger.info("File monitor stopped")
         
+        if ingestion_bridge:
+            await ingestion_bridge.stop()
+        
+        if autoscaler:
+            await autoscaler.stop()
+        
         if queue_manager:
             logger.info("Stopping queue manager...")
             await queue_manager.stop()
+            set_queue_manager(None)
             logger.info("Queue manager stopped")
         
+        await get_fts_indexer().stop()
+        
+        # Поставленные записи фиксируются до выхода
+        await asyncio.to_thread(get_db_writer().stop)
+        await get_wal_checkpointer().stop()
+        await async_read_engine.dispose()
+        
+        get_ocr_process_pool().shutdown()
+        get_hashing_service().shutdown()
+        
         logger.info("=" * 60)
         logger.info("Shutdown complete. Goodbye!")
         logger.info("=" * 60)
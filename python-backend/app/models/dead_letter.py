@@ -0,0 +1,26 @@
+"""
+Модель задач OCR, которые не удалось обработать
+"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, JSON, ForeignKey
+from sqlalchemy.orm import relationship
+from app.models.base import Base
+
+
+class DeadLetter(Base):
+    """Задача, исчерпавшая попытки или упавшая с неисправимой ошибкой"""
+    __tablename__ = "dead_letters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), nullable=False, index=True)
+    job_id = Column(String(32), nullable=False)
+    error_type = Column(String(100), nullable=False)
+    error_code = Column(String(50))
+    error_message = Column(Text)
+    retryable = Column(Boolean, default=False)
+    attempts = Column(Integer, default=1)
+    payload = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    replayed_at = Column(DateTime, nullable=True)
+
+    file = relationship("File")
@@ -0,0 +1,32 @@
+"""
+Модель страницы распознанного документа
+"""
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from app.models.base import Base
+from app.db.types import CompressedText, GeometryType
+
+
+class DocumentPage(Base):
+    """Результат распознавания одной страницы"""
+    __tablename__ = "document_pages"
+    __table_args__ = (
+        Index("ix_document_pages_document_id_page_number", "document_id", "page_number"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    page_number = Column(Integer, nullable=False)
+    text_content = Column(CompressedText)
+    confidence_score = Column(Float)
+    # Рамки, уверенность и смещения строк (app.services.geometry)
+    geometry = Column(GeometryType)
+
+    # Отпечаток содержимого страницы и параметры распознавания: страница
+    # распознается повторно, только если изменилось что-то из этого
+    fingerprint = Column(String(64))
+    engine = Column(String(50))
+    dpi = Column(Integer)
+    mode = Column(String(20))
+
+    document = relationship("Document", back_populates="pages")
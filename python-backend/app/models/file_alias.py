@@ -0,0 +1,21 @@
+"""
+Модель дополнительных путей к уже известному содержимому
+"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from app.models.base import Base
+
+
+class FileAlias(Base):
+    """Путь, по которому встречен файл с тем же хэшем (документ общий, OCR не повторяется)"""
+    __tablename__ = "file_aliases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), nullable=False, index=True)
+    path = Column(String(1024), nullable=False, unique=True)
+    filename = Column(String(255), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    file = relationship("File")
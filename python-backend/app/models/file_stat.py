@@ -0,0 +1,19 @@
+"""
+Индекс stat-сигнатур файлов в папке наблюдения
+"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, BigInteger, DateTime
+from app.models.base import Base
+
+
+class FileStat(Base):
+    """Последняя увиденная сигнатура файла на диске (для сверки без перехэширования)"""
+    __tablename__ = "file_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String(1024), nullable=False, unique=True)
+    size = Column(BigInteger, nullable=False)
+    mtime_ns = Column(BigInteger, nullable=False)
+    inode = Column(BigInteger, nullable=False)
+    file_hash = Column(String(64), nullable=False, index=True)
+    seen_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
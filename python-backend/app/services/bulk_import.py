@@ -0,0 +1,304 @@
+"""
+Массовый импорт файлов из папки или пачки загрузок
+
+Папка обходится лениво (walk_files) пачками по INGEST_BATCH_SIZE:
+пачка хэшируется в пуле HashingService, строки files вставляются одним
+executemany, задачи ставятся в очередь одним вызовом. После каждой
+пачки прогресс сохраняется в чекпоинт IMPORTS_FOLDER/<import_id>.json
+и рассылается по WebSocket (import_progress). Прерванный импорт папки
+продолжается после последнего пройденного пути из чекпоинта: обход идет
+в порядке имен, и файлы, добавленные или удаленные с тех пор, не
+сдвигают точку продолжения.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.exceptions import AppException
+from app.db.session import SessionLocal
+from app.models.file_stat import FileStat
+from app.services.ingestion import ingest_probes, probe_files
+from app.services.reconciler import walk_files
+from app.services.uploads import store_upload
+from app.api.v1.endpoints.ws import notify_import_progress
+from app.workers.scheduling import LANE_BATCH
+
+logger = logging.getLogger(__name__)
+
+# Сколько ошибок отдельных файлов хранить в состоянии импорта
+_ERRORS_LIMIT = 100
+
+
+class ImportState:
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+@dataclass
+class ImportJob:
+    """Состояние импорта (оно же содержимое чекпоинта)"""
+    source: str
+    directory: Optional[str] = None
+    import_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    state: str = ImportState.RUNNING
+    # Сколько файлов пройдено
+    position: int = 0
+    # Последний пройденный путь в порядке обхода (точка продолжения)
+    last_path: Optional[str] = None
+    imported: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    failed: int = 0
+    errors: List[Dict] = field(default_factory=list)
+    started_at: float = field(default_factory=time.time)
+    updated_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    def add_error(self, filename: str, error: Dict):
+        self.failed += 1
+        if len(self.errors) < _ERRORS_LIMIT:
+            self.errors.append({"filename": filename, **error})
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _known_signatures(paths: List[str]) -> Dict[str, Tuple[int, int, int]]:
+    """stat-сигнатуры путей из индекса file_stats"""
+    db = SessionLocal()
+    try:
+        return {
+            path: (size, mtime_ns, inode)
+            for path, size, mtime_ns, inode in db.query(
+                FileStat.path, FileStat.size, FileStat.mtime_ns, FileStat.inode
+            ).filter(FileStat.path.in_(paths))
+        }
+    finally:
+        db.close()
+
+
+class BulkImporter:
+    """Запуск, отслеживание и продолжение массовых импортов"""
+
+    def __init__(self, batch_size: Optional[int] = None, lane: int = LANE_BATCH):
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.lane = lane
+        self.jobs: Dict[str, ImportJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    # ==================== Чекпоинты ====================
+
+    @staticmethod
+    def _checkpoint_path(import_id: str) -> Path:
+        return settings.IMPORTS_FOLDER / f"{Path(import_id).name}.json"
+
+    def _save(self, job: ImportJob):
+        job.updated_at = time.time()
+        path = self._checkpoint_path(job.import_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(job.to_dict()), encoding="utf-8")
+        os.replace(temp_path, path)
+
+    def get(self, import_id: str) -> Optional[ImportJob]:
+        """Импорт по ID (из памяти или из чекпоинта)"""
+        job = self.jobs.get(import_id)
+        if job is not None:
+            return job
+        try:
+            data = json.loads(self._checkpoint_path(import_id).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        job = ImportJob(**data)
+        if job.state == ImportState.RUNNING:
+            # Процесс завершился посреди импорта
+            job.state = ImportState.CANCELLED
+        return job
+
+    def list(self) -> List[ImportJob]:
+        """Все известные импорты, новые первыми"""
+        ids = {path.stem for path in settings.IMPORTS_FOLDER.glob("*.json")}
+        jobs = [self.get(import_id) for import_id in ids | set(self.jobs)]
+        return sorted((j for j in jobs if j), key=lambda j: j.started_at, reverse=True)
+
+    async def _progress(self, job: ImportJob):
+        await asyncio.to_thread(self._save, job)
+        await notify_import_progress(job.to_dict())
+
+    # ==================== Импорт папки ====================
+
+    def start_directory(self, directory: str, import_id: Optional[str] = None) -> ImportJob:
+        """
+        Запустить импорт папки в фоне
+
+        Args:
+            directory: Папка для рекурсивного обхода
+            import_id: ID прерванного импорта для продолжения с чекпоинта
+
+        Raises:
+            NotADirectoryError: Папка не существует
+            KeyError: Чекпоинт не найден
+            ValueError: Чекпоинт относится к другой папке или импорт завершен
+        """
+        directory = str(Path(directory).expanduser().resolve())
+        if not os.path.isdir(directory):
+            raise NotADirectoryError(directory)
+
+        if import_id is None:
+            job = ImportJob(source="directory", directory=directory)
+        else:
+            if import_id in self._tasks:
+                return self.jobs[import_id]
+            job = self.get(import_id)
+            if job is None:
+                raise KeyError(import_id)
+            if job.directory != directory:
+                raise ValueError(f"Import {import_id} belongs to {job.directory}")
+            if job.state == ImportState.COMPLETED:
+                raise ValueError(f"Import {import_id} is already completed")
+            job.state = ImportState.RUNNING
+            job.finished_at = None
+            job.error = None
+            logger.info(f"Resuming import {import_id} after {job.last_path}")
+
+        self.jobs[job.import_id] = job
+        task = asyncio.create_task(self._run_directory(job))
+        self._tasks[job.import_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.import_id, None))
+        return job
+
+    async def _run_directory(self, job: ImportJob):
+        # Уже пройденное по чекпоинту пропускается без хэширования
+        files = walk_files(job.directory, ordered=True, after=job.last_path)
+
+        def _next_batch():
+            return list(itertools.islice(files, self.batch_size))
+
+        try:
+            await self._progress(job)
+
+            while True:
+                batch = await asyncio.to_thread(_next_batch)
+                if not batch:
+                    break
+
+                known = await asyncio.to_thread(_known_signatures, [path for path, _ in batch])
+                changed = [
+                    (path, stat) for path, stat in batch
+                    if known.get(path) != (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+                ]
+                probes = await probe_files(changed)
+                file_ids = await ingest_probes(probes, lane=self.lane, notify=False)
+
+                job.position += len(batch)
+                job.last_path = batch[-1][0]
+                job.unchanged += len(batch) - len(changed)
+                job.imported += len(file_ids)
+                job.skipped += len(changed) - len(file_ids)
+                await self._progress(job)
+
+            job.state = ImportState.COMPLETED
+
+        except asyncio.CancelledError:
+            job.state = ImportState.CANCELLED
+            raise
+
+        except Exception as e:
+            logger.exception(f"Import {job.import_id} failed: {e}")
+            job.state = ImportState.FAILED
+            job.error = str(e)
+
+        finally:
+            job.finished_at = time.time()
+            await asyncio.shield(self._progress(job))
+            logger.info(
+                f"Import {job.import_id} {job.state}: {job.imported} imported, "
+                f"{job.unchanged} unchanged, {job.skipped} skipped"
+            )
+
+    # ==================== Импорт загрузок ====================
+
+    async def import_uploads(self, uploads: List[Tuple[str, AsyncIterator[bytes]]]) -> ImportJob:
+        """
+        Импортировать пачку загруженных файлов (в рамках запроса)
+
+        Каждый файл пишется на диск потоково (store_upload), регистрация
+        и постановка в очередь идут пачками. Отклоненные файлы (дубликаты,
+        неверный формат, размер) попадают в errors, остальные импортируются.
+        """
+        job = ImportJob(source="upload")
+        self.jobs[job.import_id] = job
+        probes = []
+
+        async def _flush():
+            file_ids = await ingest_probes(probes, lane=self.lane, notify=False)
+            job.imported += len(file_ids)
+            job.skipped += len(probes) - len(file_ids)
+            probes.clear()
+            await self._progress(job)
+
+        try:
+            for filename, chunks in uploads:
+                job.position += 1
+                try:
+                    probes.append(await store_upload(chunks, filename))
+                except AppException as e:
+                    job.add_error(filename, e.to_dict())
+                except Exception as e:
+                    logger.exception(f"Failed to upload {filename}: {e}")
+                    job.add_error(filename, {"error": "UPLOAD_FAILED", "message": str(e)})
+
+                if len(probes) >= self.batch_size:
+                    await _flush()
+
+            await _flush()
+            job.state = ImportState.COMPLETED
+
+        except Exception as e:
+            logger.exception(f"Import {job.import_id} failed: {e}")
+            job.state = ImportState.FAILED
+            job.error = str(e)
+
+        job.finished_at = time.time()
+        await self._progress(job)
+        return job
+
+    # ==================== Управление ====================
+
+    def cancel(self, import_id: str) -> bool:
+        """Остановить импорт папки (его можно продолжить по import_id)"""
+        task = self._tasks.get(import_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    async def stop(self):
+        """Остановить все импорты, сохранив чекпоинты"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Глобальный экземпляр
+_bulk_importer: Optional[BulkImporter] = None
+
+
+def get_bulk_importer() -> BulkImporter:
+    """Получить сервис массового импорта (singleton)"""
+    global _bulk_importer
+    if _bulk_importer is None:
+        _bulk_importer = BulkImporter()
+    return _bulk_importer
@@ -0,0 +1,213 @@
+"""
+Контентно-адресуемое хранилище оригиналов
+
+Файл хранится один раз под именем своего SHA-256:
+STORE_FOLDER/ab/cd/abcd...<ext>. Два уровня по префиксу хэша держат
+каталоги небольшими. files.filepath указывает в хранилище, поэтому
+дубликаты не занимают место, а поиск сирот - разность множеств хэшей
+на диске и в БД.
+
+Оригиналы из папки наблюдения копируются в хранилище (STORE_MODE=copy,
+по умолчанию; на ФС с reflink копия не занимает места, пока исходник не
+изменится) или переносятся (STORE_MODE=move). STORE_MODE=link ставит
+жесткую ссылку: место не тратится и без reflink, но объект и файл
+пользователя - один inode, и перезапись исходника на месте (O_TRUNC)
+меняет содержимое объекта, которое больше не совпадает с его хэшем.
+Если жесткая ссылка невозможна (другой диск), файл копируется.
+"""
+import errno
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Set, Tuple
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # reflink есть только на Linux
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ioctl FICLONE: копия, разделяющая блоки с исходником до первой записи (btrfs, XFS)
+_FICLONE = 0x40049409
+
+# Временные файлы (загрузки, копии) лежат рядом с объектами, чтобы
+# os.replace оставался атомарным переименованием
+_INCOMING = ".incoming"
+
+
+def _clone(source: str, target: Path):
+    """Скопировать файл: reflink, если ФС умеет, иначе обычной копией"""
+    if fcntl is not None:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+                cloned = True
+            except OSError:
+                cloned = False
+        if cloned:
+            shutil.copystat(source, target)
+            return
+    shutil.copy2(source, target)
+
+
+class ContentStore:
+    """Размещение файлов в хранилище и поиск сирот"""
+
+    def __init__(self, root: Optional[Path] = None, mode: Optional[str] = None):
+        self.root = Path(root or settings.STORE_FOLDER).resolve()
+        self.mode = mode or settings.STORE_MODE
+
+    @property
+    def incoming(self) -> Path:
+        return self.root / _INCOMING
+
+    def temp_path(self) -> Path:
+        """Путь для временного файла на том же диске, что и хранилище"""
+        self.incoming.mkdir(parents=True, exist_ok=True)
+        return self.incoming / f"{uuid.uuid4().hex}.part"
+
+    def object_path(self, file_hash: str, suffix: str = "") -> Path:
+        """Путь объекта по хэшу (расширение сохраняется для обработчиков формата)"""
+        return self.root / file_hash[:2] / file_hash[2:4] / f"{file_hash}{suffix.lower()}"
+
+    def contains(self, filepath: str) -> bool:
+        """Лежит ли путь внутри хранилища"""
+        return Path(filepath).resolve().is_relative_to(self.root)
+
+    # ==================== Размещение ====================
+
+    def put(self, filepath: str, file_hash: str) -> str:
+        """
+        Поместить файл в хранилище, не трогая исходный путь
+
+        Исходник убирается отдельно (release) - после фиксации записи в БД,
+        чтобы при ошибке транзакции файл не потерялся.
+
+        Returns:
+            Путь объекта в хранилище
+        """
+        if self.contains(filepath):
+            return filepath
+
+        target = self.object_path(file_hash, Path(filepath).suffix)
+        if target.exists():
+            return str(target)
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # В режиме move исходник после фиксации удаляется, и ссылка
+        # безопасна; в режиме copy объект не делит inode с файлом,
+        # который пользователь может перезаписать
+        if self.mode != "copy":
+            try:
+                os.link(filepath, target)
+                return str(target)
+            except FileExistsError:
+                return str(target)
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                    raise
+        temp = self.temp_path()
+        try:
+            _clone(filepath, temp)
+            os.replace(temp, target)
+        except BaseException:
+            temp.unlink(missing_ok=True)
+            raise
+        return str(target)
+
+    def release(self, filepath: str, object_path: str):
+        """
+        Освободить исходный файл, содержимое которого уже есть в хранилище
+
+        move - исходник удаляется; link - заменяется жесткой ссылкой на
+        объект (для дубликатов это освобождает место); copy - остается
+        как есть. Ошибки не критичны: содержимое уже сохранено.
+        """
+        if filepath == object_path or self.contains(filepath) or self.mode == "copy":
+            return
+        try:
+            if os.path.samefile(filepath, object_path):
+                if self.mode == "move":
+                    os.remove(filepath)
+                return
+
+            if self.mode == "move":
+                os.remove(filepath)
+            else:
+                temp = f"{os.path.dirname(filepath)}/.{uuid.uuid4().hex}.link"
+                os.link(object_path, temp)
+                os.replace(temp, filepath)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.debug(f"Keep {filepath} as is: {e}")
+
+    # ==================== Сироты ====================
+
+    def iter_objects(self) -> Iterator[Tuple[str, Path]]:
+        """Все объекты хранилища: (хэш, путь)"""
+        if not self.root.exists():
+            return
+        for shard in os.scandir(self.root):
+            if shard.name.startswith(".") or not shard.is_dir():
+                continue
+            for subshard in os.scandir(shard.path):
+                if not subshard.is_dir():
+                    continue
+                for entry in os.scandir(subshard.path):
+                    if entry.is_file():
+                        yield entry.name.split(".", 1)[0], Path(entry.path)
+
+    def orphans(self, known_hashes: Set[str], grace_seconds: float = 3600) -> Iterator[Path]:
+        """
+        Объекты, хэшей которых нет среди известных
+
+        Недавно размещенные объекты пропускаются: запись о них может быть
+        еще не зафиксирована. ctime меняется и при создании жесткой ссылки.
+        """
+        cutoff = time.time() - grace_seconds
+        for file_hash, path in self.iter_objects():
+            if file_hash in known_hashes:
+                continue
+            try:
+                if path.stat().st_ctime < cutoff:
+                    yield path
+            except FileNotFoundError:
+                pass
+
+    def remove(self, paths: Iterable[Path]) -> int:
+        removed = 0
+        for path in paths:
+            try:
+                path.unlink()
+                removed += 1
+            except OSError as e:
+                logger.error(f"Failed to delete {path}: {e}")
+        return removed
+
+    def stale_incoming(self, max_age_seconds: float = 24 * 3600) -> Iterator[Path]:
+        """Недописанные временные файлы (прерванные загрузки)"""
+        if not self.incoming.exists():
+            return
+        cutoff = time.time() - max_age_seconds
+        for entry in os.scandir(self.incoming):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                yield Path(entry.path)
+
+
+# Глобальный экземпляр
+_content_store: Optional[ContentStore] = None
+
+
+def get_content_store() -> ContentStore:
+    """Получить хранилище оригиналов (singleton)"""
+    global _content_store
+    if _content_store is None:
+        _content_store = ContentStore()
+    return _content_store
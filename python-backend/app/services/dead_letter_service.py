@@ -0,0 +1,125 @@
+"""
+Сервис для работы с задачами, не прошедшими обработку (dead-letter)
+"""
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy.orm import Session
+
+from app.core.exceptions import AppException
+from app.models.dead_letter import DeadLetter
+from app.models.file import File as FileModel
+
+
+class DeadLetterService:
+    """Учет и повторный запуск проваленных OCR задач"""
+    
+    def __init__(self, db: Session, autocommit: bool = True):
+        """
+        Args:
+            db: Сессия БД
+            autocommit: Фиксировать изменения в каждом методе; False -
+                внутри намерения писателя БД (фиксирует писатель)
+        """
+        self.db = db
+        self.autocommit = autocommit
+    
+    def _commit(self, instance=None):
+        if not self.autocommit:
+            self.db.flush()
+            return
+        self.db.commit()
+        if instance is not None:
+            self.db.refresh(instance)
+    
+    def record(
+        self,
+        file_id: int,
+        job_id: str,
+        error: AppException,
+        attempts: int,
+        payload: Optional[dict] = None
+    ) -> DeadLetter:
+        """
+        Записать проваленную задачу
+        
+        Args:
+            file_id: ID файла
+            job_id: ID задачи в очереди
+            error: Классифицированная ошибка последней попытки
+            attempts: Сколько попыток было сделано
+            payload: Данные задачи для повторного запуска
+        
+        Returns:
+            Созданная запись
+        """
+        entry = DeadLetter(
+            file_id=file_id,
+            job_id=job_id,
+            error_type=error.__class__.__name__,
+            error_code=error.error_code,
+            error_message=error.message,
+            retryable=error.retryable,
+            attempts=attempts,
+            payload=payload,
+        )
+        self.db.add(entry)
+        self._commit(entry)
+        return entry
+    
+    def get(self, entry_id: int) -> Optional[DeadLetter]:
+        """Получить запись по ID"""
+        return self.db.query(DeadLetter).filter(DeadLetter.id == entry_id).first()
+    
+    def list(
+        self,
+        include_replayed: bool = False,
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[DeadLetter]:
+        """Список записей, новые первыми"""
+        query = self.db.query(DeadLetter)
+        if not include_replayed:
+            query = query.filter(DeadLetter.replayed_at.is_(None))
+        return query.order_by(DeadLetter.created_at.desc()).offset(skip).limit(limit).all()
+    
+    def count(self, include_replayed: bool = False) -> int:
+        """Количество записей"""
+        query = self.db.query(DeadLetter)
+        if not include_replayed:
+            query = query.filter(DeadLetter.replayed_at.is_(None))
+        return query.count()
+    
+    def pending_replay(self, entry_ids: Optional[List[int]] = None) -> List[DeadLetter]:
+        """Записи, которые еще не запускались повторно (все или из списка)"""
+        query = self.db.query(DeadLetter).filter(DeadLetter.replayed_at.is_(None))
+        if entry_ids is not None:
+            query = query.filter(DeadLetter.id.in_(entry_ids))
+        return query.all()
+    
+    def mark_replayed(self, entry_ids: List[int]) -> None:
+        """Отметить записи как повторно запущенные"""
+        self.db.query(DeadLetter).filter(
+            DeadLetter.id.in_(entry_ids), DeadLetter.replayed_at.is_(None)
+        ).update({DeadLetter.replayed_at: datetime.utcnow()}, synchronize_session=False)
+        self._commit()
+    
+    def dead_file_ids(self):
+        """Подзапрос ID файлов с неразобранными записями"""
+        return self.db.query(DeadLetter.file_id).filter(DeadLetter.replayed_at.is_(None))
+    
+    @staticmethod
+    def to_dict(entry: DeadLetter, file: Optional[FileModel] = None) -> dict:
+        file = file or entry.file
+        return {
+            "id": entry.id,
+            "file_id": entry.file_id,
+            "filename": file.filename if file else None,
+            "job_id": entry.job_id,
+            "error_type": entry.error_type,
+            "error_code": entry.error_code,
+            "error_message": entry.error_message,
+            "retryable": entry.retryable,
+            "attempts": entry.attempts,
+            "created_at": entry.created_at,
+            "replayed_at": entry.replayed_at,
+        }
@@ -2,19 +2,43 @@
 Сервис для работы с документами
 """
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.db.writer import get_db_writer
 from app.models.document import Document
 from app.models.document_page import DocumentPage
 from app.models.file import File as FileModel
 
 
+def _geometry(page_data: Dict):
+    """Геометрия страницы: PageGeometry из OCR или прежний список рамок"""
+    geometry = page_data.get("geometry")
+    return geometry if geometry is not None else page_data.get("boxes")
+
+
 class DocumentService:
     """Управление документами и их страницами"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, autocommit: bool = True):
+        """
+        Args:
+            db: Сессия БД
+            autocommit: Фиксировать изменения в каждом методе; False -
+                внутри намерения писателя БД (фиксирует писатель)
+        """
         self.db = db
+        self.autocommit = autocommit
+    
+    def _commit(self, instance=None):
+        if not self.autocommit:
+            self.db.flush()
+            return
+        self.db.commit()
+        if instance is not None:
+            self.db.refresh(instance)
     
     def create_document(
         self,
@@ -27,6 +51,10 @@ class DocumentService:
         """
         Создать документ с результатами OCR
         
+        Если у файла уже есть документ (переобработка), он заменяется
+        на месте: ID сохраняется, поля и страницы обновляются в одной
+        транзакции, до фиксации остаются видны прежние результаты.
+        
         Args:
             file_id: ID файла
             text_content: Распознанный текст
@@ -35,46 +63,152 @@ class DocumentService:
             processing_time: Время обработки в секундах
         
         Returns:
-            Созданный документ
+            Созданный или обновленный документ
         """
-        # Подсчет страниц
-        page_count = len(pages) if pages else max(1, text_content.count("\f") + 1)
+        # Без результатов OCR страницы - части текста между \f
+        if not pages:
+            pages = [
+                {"page_number": number, "text": page_text, "confidence": confidence_score}
+                for number, page_text in enumerate((text_content or "").split("\f"), start=1)
+            ]
+        page_count = len(pages)
         
-        # Создание документа
-        doc = Document(
-            file_id=file_id,
-            text_content=text_content or "",
-            confidence_score=confidence_score,
-            page_count=page_count,
-            processed_at=datetime.utcnow(),
-            processing_time_seconds=processing_time,
-            is_synced=False,
-            needs_sync=True,
-        )
+        doc = self.get_by_file_id(file_id)
+        if doc is None:
+            doc = Document(file_id=file_id)
+            self.db.add(doc)
+        else:
+            self.db.query(DocumentPage).filter(
+                DocumentPage.document_id == doc.id
+            ).delete(synchronize_session=False)
+        
+        doc.text_content = text_content or ""
+        doc.confidence_score = confidence_score
+        doc.page_count = page_count
+        doc.processed_at = datetime.utcnow()
+        doc.processing_time_seconds = processing_time
+        doc.is_synced = False
+        doc.needs_sync = True
         
-        self.db.add(doc)
         self.db.flush()  # Получить ID документа
         
-        # Создание страниц
-        if pages:
-            for page_data in pages:
-                page = DocumentPage(
-                    document_id=doc.id,
-                    page_number=page_data.get("page_number", 0),
-                    text_content=page_data.get("text", ""),
-                    confidence_score=page_data.get("confidence"),
-                    bounding_boxes=page_data.get("boxes"),
-                )
-                self.db.add(page)
+        # Страницы - одним executemany без объектов ORM: у документов
+        # в сотни страниц с координатами unit of work дороже самой вставки.
+        # Триггеры document_pages ставят страницы в очередь индексации FTS
+        self.db.execute(insert(DocumentPage.__table__), [
+                {
+                    "document_id": doc.id,
+                    "page_number": page_data.get("page_number", 0),
+                    "text_content": page_data.get("text", ""),
+                    "confidence_score": page_data.get("confidence"),
+                    "geometry": _geometry(page_data),
+                }
+                for page_data in pages
+            ])
         
-        # Обновить статус файла
-        file_obj = self.db.query(FileModel).get(file_id)
-        if file_obj:
-            file_obj.is_processed = True
-            file_obj.updated_at = datetime.utcnow()
+        self._mark_processed(file_id)
+        self._commit()
         
-        self.db.commit()
-        self.db.refresh(doc)
+        return doc
+    
+    def _mark_processed(self, file_id: int):
+        """Отметить файл обработанным одним UPDATE, не загружая его"""
+        self.db.execute(
+            update(FileModel)
+            .where(FileModel.id == file_id)
+            .values(is_processed=True, updated_at=datetime.utcnow())
+        )
+    
+    def page_signatures(
+        self, file_id: int
+    ) -> Dict[int, Tuple[Optional[str], Optional[str], Optional[int], Optional[str]]]:
+        """Отпечаток, движок, DPI и режим сохраненных страниц документа файла"""
+        rows = (
+            self.db.query(
+                DocumentPage.page_number, DocumentPage.fingerprint,
+                DocumentPage.engine, DocumentPage.dpi, DocumentPage.mode
+            )
+            .join(Document, Document.id == DocumentPage.document_id)
+            .filter(Document.file_id == file_id)
+        )
+        return {number: tuple(signature) for number, *signature in rows}
+    
+    def _get_or_create(self, file_id: int) -> Document:
+        doc = self.get_by_file_id(file_id)
+        if doc is None:
+            # Черновик: текст документа собирается в finalize_pages
+            doc = Document(file_id=file_id, text_content="")
+            self.db.add(doc)
+            self.db.flush()  # Получить ID документа
+        return doc
+    
+    def _upsert_page(self, doc: Document, page_data: Dict) -> DocumentPage:
+        page = self.db.query(DocumentPage).filter(
+            DocumentPage.document_id == doc.id,
+            DocumentPage.page_number == page_data["page_number"]
+        ).first()
+        if page is None:
+            page = DocumentPage(document_id=doc.id, page_number=page_data["page_number"])
+            self.db.add(page)
+        page.text_content = page_data.get("text", "")
+        page.confidence_score = page_data.get("confidence")
+        page.geometry = _geometry(page_data)
+        page.fingerprint = page_data.get("fingerprint")
+        page.engine = page_data.get("engine")
+        page.dpi = page_data.get("dpi")
+        page.mode = page_data.get("mode")
+        return page
+    
+    def save_page(self, file_id: int, page_data: Dict) -> DocumentPage:
+        """
+        Сохранить одну распознанную страницу сразу (чекпоинт)
+        
+        Страница фиксируется отдельной транзакцией, поэтому прерванная
+        обработка теряет не больше одной страницы: при повторе страница
+        с тем же отпечатком, движком, DPI и режимом не распознается заново.
+        """
+        doc = self._get_or_create(file_id)
+        page = self._upsert_page(doc, page_data)
+        self._commit()
+        return page
+    
+    def finalize_pages(
+        self,
+        file_id: int,
+        page_count: int,
+        processing_time: Optional[float] = None
+    ) -> Document:
+        """
+        Собрать документ из сохраненных страниц
+        
+        Страницы с номером больше page_count удаляются, текст и
+        уверенность документа собираются из всех страниц, файл
+        отмечается обработанным.
+        """
+        doc = self._get_or_create(file_id)
+        self.db.query(DocumentPage).filter(
+            DocumentPage.document_id == doc.id,
+            DocumentPage.page_number > page_count
+        ).delete(synchronize_session=False)
+        
+        stored = (
+            self.db.query(DocumentPage.text_content, DocumentPage.confidence_score)
+            .filter(DocumentPage.document_id == doc.id)
+            .order_by(DocumentPage.page_number)
+            .all()
+        )
+        confidences = [c for _, c in stored if c is not None]
+        
+        doc.text_content = "\f".join(text or "" for text, _ in stored)
+        doc.confidence_score = sum(confidences) / len(confidences) if confidences else None
+        doc.page_count = page_count
+        doc.processed_at = datetime.utcnow()
+        doc.processing_time_seconds = processing_time
+        doc.is_synced = False
+        doc.needs_sync = True
+        
+        self._mark_processed(file_id)
+        self._commit(doc)
         
         return doc
     
@@ -101,6 +235,82 @@ class DocumentService:
         doc = self.get_by_id(document_id)
         if doc:
             self.db.delete(doc)
-            self.db.commit()
+            self._commit()
             return True
         return False
+
+
+class AsyncDocumentService:
+    """
+    Документы для асинхронных endpoints
+
+    Чтение - через AsyncSession пула чтения (event loop не блокируется),
+    запись - намерением писателя БД поверх синхронного DocumentService.
+    """
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_by_id(self, document_id: int) -> Optional[Document]:
+        """Получить документ по ID"""
+        return await self.db.get(Document, document_id)
+    
+    async def get_by_file_id(self, file_id: int) -> Optional[Document]:
+        """Получить документ по ID файла"""
+        return await self.db.scalar(select(Document).where(Document.file_id == file_id))
+    
+    async def get_all(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        synced: Optional[bool] = None
+    ) -> List[Document]:
+        """Получить список документов"""
+        query = select(Document)
+        if synced is not None:
+            query = query.where(Document.is_synced == synced)
+        result = await self.db.scalars(
+            query.order_by(Document.id.desc()).offset(skip).limit(limit)
+        )
+        return list(result)
+    
+    async def get_pages(self, document_id: int) -> List[DocumentPage]:
+        """Страницы документа по порядку"""
+        result = await self.db.scalars(
+            select(DocumentPage)
+            .where(DocumentPage.document_id == document_id)
+            .order_by(DocumentPage.page_number)
+        )
+        return list(result)
+    
+    async def get_page(self, document_id: int, page_number: int) -> Optional[DocumentPage]:
+        """Страница документа по номеру"""
+        return await self.db.scalar(
+            select(DocumentPage).where(
+                DocumentPage.document_id == document_id,
+                DocumentPage.page_number == page_number
+            )
+        )
+    
+    async def confidences(self, document_ids: List[int]) -> Dict[int, Optional[float]]:
+        """Уверенность распознавания документов (одним запросом)"""
+        if not document_ids:
+            return {}
+        rows = await self.db.execute(
+            select(Document.id, Document.confidence_score).where(Document.id.in_(document_ids))
+        )
+        return dict(rows.all())
+    
+    async def create_document(self, file_id: int, text_content: str, **kwargs) -> Document:
+        """Создать или заменить документ (см. DocumentService.create_document)"""
+        return await get_db_writer().execute(
+            lambda db: DocumentService(db, autocommit=False).create_document(
+                file_id, text_content, **kwargs
+            )
+        )
+    
+    async def delete(self, document_id: int) -> bool:
+        """Удалить документ"""
+        return await get_db_writer().execute(
+            lambda db: DocumentService(db, autocommit=False).delete(document_id)
+        )
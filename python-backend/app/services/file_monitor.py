@@ -1,29 +1,227 @@
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import logging
+import os
 import threading
 import time
 
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+WATCHED_EXTENSIONS = {".pdf", ".png", ".jpg", ".jpeg", ".tiff", ".bmp"}
+
+
 class NewFileHandler(FileSystemEventHandler):
-    def __init__(self, callback, exts=None):
+    def __init__(self, callback, exts=None, on_close=None):
         super().__init__()
         self.callback = callback
-        self.exts = exts or {".pdf", ".png", ".jpg", ".jpeg", ".tiff", ".bmp"}
+        self.on_close = on_close
+        self.exts = exts or WATCHED_EXTENSIONS
+
+    def _matches(self, path):
+        return Path(path).suffix.lower() in self.exts
 
+    def _dispatch(self, path):
+        if self._matches(path):
+            self.callback(path)
+
+    # Вызываются в потоке наблюдателя: callback должен быть потокобезопасным
     def on_created(self, event):
-        if not event.is_directory and Path(event.src_path).suffix.lower() in self.exts:
-            self.callback(event.src_path)
+        if not event.is_directory:
+            self._dispatch(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._dispatch(event.src_path)
+
+    def on_moved(self, event):
+        # Переименование временного файла в итоговый (копирование, загрузка)
+        if not event.is_directory:
+            self._dispatch(event.dest_path)
+
+    def on_closed(self, event):
+        # Закрытие после записи (inotify IN_CLOSE_WRITE, есть не на всех платформах)
+        if not event.is_directory and self.on_close and self._matches(event.src_path):
+            self.on_close(event.src_path)
+
+
+@dataclass
+class _Candidate:
+    """Файл, ожидающий окончания записи"""
+    signature: Optional[Tuple[int, int]] = None
+    delay: float = 0.0
+    generation: int = 0
+    closed: bool = False
+    first_seen: float = 0.0
+
+
+class FileStabilityTracker:
+    """
+    Отслеживание окончания записи файлов
+
+    Файл считается дописанным, когда его размер и mtime не изменились
+    между двумя проверками os.stat. Пока файл меняется, интервал проверки
+    растет экспоненциально (длинное копирование по сети не опрашивается
+    каждую долю секунды). Событие закрытия после записи ускоряет проверку.
+
+    Все проверки идут из одного потока по колесу таймеров: тысячи
+    ожидающих файлов не создают тысячи таймеров или потоков.
+    """
+
+    def __init__(
+        self,
+        on_stable: Callable[[str], None],
+        initial_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        tick: Optional[float] = None,
+        wheel_size: int = 512,
+    ):
+        self.on_stable = on_stable
+        self.initial_delay = initial_delay or settings.WATCH_STABILITY_INITIAL_DELAY_SECONDS
+        self.max_delay = max_delay or settings.WATCH_STABILITY_MAX_DELAY_SECONDS
+        self.tick = tick or settings.WATCH_STABILITY_TICK_SECONDS
+        self.wheel_size = wheel_size
+
+        self._wheel: List[Set[Tuple[str, int, int]]] = [set() for _ in range(wheel_size)]
+        self._candidates: Dict[str, _Candidate] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._origin = time.monotonic()
+        self._current_tick = 0
+        self.released_total = 0
+
+    # ---------- Колесо таймеров ----------
+
+    def _tick_of(self, at: float) -> int:
+        return int((at - self._origin) / self.tick)
+
+    def _schedule(self, path: str, candidate: _Candidate, delay: float):
+        """Поставить проверку пути через delay секунд (под self._lock)"""
+        candidate.generation += 1
+        due = max(self._tick_of(time.monotonic() + delay), self._current_tick + 1)
+        self._wheel[due % self.wheel_size].add((path, candidate.generation, due))
+
+    def _collect_due(self, upto_tick: int) -> List[str]:
+        """Снять с колеса пути, срок проверки которых наступил (под self._lock)"""
+        due_paths = []
+        while self._current_tick < upto_tick:
+            self._current_tick += 1
+            slot = self._wheel[self._current_tick % self.wheel_size]
+            # В слоте лежат и записи следующих оборотов колеса
+            expired = {item for item in slot if item[2] <= self._current_tick}
+            slot -= expired
+            for path, generation, _ in expired:
+                candidate = self._candidates.get(path)
+                if candidate is not None and candidate.generation == generation:
+                    due_paths.append(path)
+        return due_paths
+
+    # ---------- События ----------
+
+    def touch(self, path: str):
+        """Файл создан или изменен (потокобезопасно)"""
+        with self._lock:
+            candidate = self._candidates.get(path)
+            if candidate is None:
+                candidate = _Candidate(first_seen=time.time())
+                self._candidates[path] = candidate
+            candidate.closed = False
+            candidate.delay = self.initial_delay
+            self._schedule(path, candidate, candidate.delay)
+
+    def closed(self, path: str):
+        """Файл закрыт после записи: проверить на ближайшем тике"""
+        with self._lock:
+            candidate = self._candidates.get(path)
+            if candidate is None:
+                candidate = _Candidate(first_seen=time.time())
+                self._candidates[path] = candidate
+            candidate.closed = True
+            self._schedule(path, candidate, 0)
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._candidates)
+
+    # ---------- Проверка ----------
+
+    def _check(self, path: str):
+        try:
+            stat = os.stat(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            # Файл удален или переименован - новый путь придет своим событием
+            with self._lock:
+                self._candidates.pop(path, None)
+            return
+
+        with self._lock:
+            candidate = self._candidates.get(path)
+            if candidate is None:
+                return
+
+            unchanged = signature == candidate.signature
+            # После close-write достаточно одной проверки, без close - двух одинаковых
+            if unchanged or (candidate.closed and signature[0] > 0):
+                del self._candidates[path]
+                release = True
+            else:
+                candidate.signature = signature
+                candidate.closed = False
+                candidate.delay = min(candidate.delay * 2, self.max_delay)
+                self._schedule(path, candidate, candidate.delay)
+                release = False
+
+        if release:
+            self.released_total += 1
+            try:
+                self.on_stable(path)
+            except Exception as e:
+                logger.exception(f"Failed to hand over stable file {path}: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            with self._lock:
+                due_paths = self._collect_due(self._tick_of(time.monotonic()))
+            for path in due_paths:
+                self._check(path)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="FileStabilityTracker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
 
 class FileMonitor:
+    """
+    Наблюдение за папкой
+
+    callback получает только дописанные файлы (см. FileStabilityTracker)
+    и вызывается из служебного потока.
+    """
+
     def __init__(self, folder: Path, callback):
         self.folder = folder
         self.callback = callback
         self.observer = Observer()
+        self.tracker = FileStabilityTracker(callback)
         self._thread = None
 
     def start(self):
-        handler = NewFileHandler(self.callback)
-        self.observer.schedule(handler, str(self.folder), recursive=False)
+        handler = NewFileHandler(self.tracker.touch, on_close=self.tracker.closed)
+        self.tracker.start()
+        self.observer.schedule(handler, str(self.folder), recursive=True)
         self.observer.start()
         self._thread = threading.Thread(target=self._join, daemon=True)
         self._thread.start()
@@ -38,3 +236,4 @@ class FileMonitor:
 
     def stop(self):
         self.observer.stop()
+        self.tracker.stop()
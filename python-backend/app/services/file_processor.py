@@ -1,13 +1,16 @@
 """
 Обработка файлов (PDF, изображения)
 """
+import hashlib
 from pathlib import Path
-from typing import List, Dict, Optional, Generator
+from typing import List, Dict, Optional, Generator, Tuple
 import numpy as np
 import fitz  # PyMuPDF
 from PIL import Image
 
 from app.core.exceptions import FileFormatError, FileProcessError
+from app.services.geometry import PageGeometry
+from app.utils.hash_utils import hash_file
 
 
 class FileProcessor:
@@ -107,6 +110,25 @@ class FileProcessor:
         except Exception as e:
             raise FileProcessError(pdf_path, f"Failed to get PDF info: {e}")
     
+    @staticmethod
+    def get_page_count(file_path: str) -> int:
+        """
+        Быстро получить количество страниц без извлечения текста
+
+        Для изображений всегда 1 страница
+        """
+        if Path(file_path).suffix.lower() != ".pdf":
+            return 1
+
+        try:
+            doc = fitz.open(file_path)
+            page_count = len(doc)
+            doc.close()
+            return page_count
+
+        except Exception as e:
+            raise FileProcessError(file_path, f"Failed to count pages: {e}")
+
     @staticmethod
     def validate_pdf(pdf_path: str) -> bool:
         """Проверить валидность PDF"""
@@ -138,43 +160,148 @@ class FileProcessor:
         except Exception as e:
             raise FileProcessError(image_path, f"Failed to load image: {e}")
 
-@staticmethod
-def process_pdf_with_ocr(
-    pdf_path: str,
-    ocr_manager,
-    engine: str,
-    dpi: int = 300,
-    mode: str = "printed"
-) -> Dict:
-    """Обработать PDF через OCR"""
+    @staticmethod
+    def get_page_sizes(file_path: str) -> List[Tuple[float, float]]:
+        """
+        Получить размеры страниц в пунктах (1/72 дюйма) без рендеринга
+
+        Нужны для оценки памяти до растеризации страницы
+        """
+        try:
+            doc = fitz.open(file_path)
+            sizes = [(page.rect.width, page.rect.height) for page in doc]
+            doc.close()
+            return sizes
+
+        except Exception as e:
+            raise FileProcessError(file_path, f"Failed to read page sizes: {e}")
+
+    @staticmethod
+    def get_page_fingerprints(file_path: str) -> List[str]:
+        """
+        Отпечатки содержимого страниц без рендеринга
+
+        Для PDF хэшируются размеры и поворот страницы, потоки содержимого,
+        а также изображения, формы и шрифты, на которые она ссылается:
+        страница с тем же отпечатком распознается так же. Для изображений
+        отпечаток всех страниц - хэш файла.
+        """
+        try:
+            doc = fitz.open(file_path)
+            try:
+                if not doc.is_pdf:
+                    file_hash = hash_file(file_path)
+                    return [
+                        hashlib.sha256(f"{file_hash}:{i}".encode()).hexdigest()
+                        for i in range(doc.page_count)
+                    ]
+
+                fingerprints = []
+                for page in doc:
+                    h = hashlib.sha256(f"{tuple(page.rect)}:{page.rotation}".encode())
+                    for xref in page.get_contents():
+                        h.update(doc.xref_stream_raw(xref) or b"")
+                    xrefs = sorted({
+                        *(img[0] for img in page.get_images(full=True)),
+                        *(xobj[0] for xobj in page.get_xobjects()),
+                        *(font[0] for font in page.get_fonts(full=True)),
+                    })
+                    for xref in xrefs:
+                        if xref > 0 and doc.xref_is_stream(xref):
+                            h.update(doc.xref_stream_raw(xref) or b"")
+                    fingerprints.append(h.hexdigest())
+                return fingerprints
+            finally:
+                doc.close()
+
+        except Exception as e:
+            raise FileProcessError(file_path, f"Failed to fingerprint pages: {e}")
+
+    @staticmethod
+    def render_page(file_path: str, page_index: int, dpi: int = 300) -> np.ndarray:
+        """
+        Растеризовать одну страницу
+
+        Args:
+            file_path: Путь к PDF или изображению
+            page_index: Индекс страницы (с нуля)
+            dpi: Разрешение для рендеринга
+
+        Returns:
+            Изображение страницы как numpy array (RGB)
+        """
+        try:
+            doc = fitz.open(file_path)
+            try:
+                mat = fitz.Matrix(dpi / 72, dpi / 72)
+                pix = doc[page_index].get_pixmap(matrix=mat, alpha=False)
+
+                img_array = np.frombuffer(pix.samples, dtype=np.uint8)
+                return img_array.reshape(pix.height, pix.width, pix.n)
+            finally:
+                doc.close()
+
+        except Exception as e:
+            raise FileProcessError(file_path, f"Failed to render page {page_index + 1}: {e}")
+
+    @staticmethod
+    def ocr_page(
+        file_path: str,
+        page_index: int,
+        ocr_manager,
+        engine: str,
+        dpi: int = 300,
+        mode: str = "printed"
+    ) -> Dict:
+        """Растеризовать и распознать одну страницу"""
+        page_image = FileProcessor.render_page(file_path, page_index, dpi)
+        result = ocr_manager.recognize(image=page_image, engine_name=engine, mode=mode)
+
+        return {
+            "page_number": page_index + 1,
+            "text": result["text"],
+            "confidence": result["confidence"],
+            # Кодируется здесь: из процесса OCR передаются только байты
+            "geometry": PageGeometry.from_lines(result.get("lines", []), result["text"])
+        }
+
+    @staticmethod
+    def process_pdf_with_ocr(
+        pdf_path: str,
+        ocr_manager,
+        engine: str,
+        dpi: int = 300,
+        mode: str = "printed"
+    ) -> Dict:
+        """Обработать PDF через OCR"""
     
-    all_text = []
-    pages_info = []
-    total_confidence = 0.0
-    page_count = 0
+        all_text = []
+        pages_info = []
+        total_confidence = 0.0
+        page_count = 0
     
-    for idx, page_image in enumerate(FileProcessor.pdf_to_images(pdf_path, dpi), start=1):
-        # ИСПОЛЬЗУЕМ МЕНЕДЖЕР
-        result = ocr_manager.recognize(
-            image=page_image,
-            engine_name=engine,
-            mode=mode
-        )
+        for idx, page_image in enumerate(FileProcessor.pdf_to_images(pdf_path, dpi), start=1):
+            # ИСПОЛЬЗУЕМ МЕНЕДЖЕР
+            result = ocr_manager.recognize(
+                image=page_image,
+                engine_name=engine,
+                mode=mode
+            )
         
-        all_text.append(result["text"])
-        total_confidence += result["confidence"]
-        page_count += 1
+            all_text.append(result["text"])
+            total_confidence += result["confidence"]
+            page_count += 1
         
-        pages_info.append({
-            "page_number": idx,
-            "text": result["text"],
-            "confidence": result["confidence"],
-            "boxes": result.get("boxes", [])
-        })
+            pages_info.append({
+                "page_number": idx,
+                "text": result["text"],
+                "confidence": result["confidence"],
+                "boxes": result.get("boxes", [])
+            })
     
-    return {
-        "text": "\f".join(all_text),
-        "pages": pages_info,
-        "confidence": total_confidence / page_count if page_count > 0 else 0.0,
-        "page_count": page_count
-    }
+        return {
+            "text": "\f".join(all_text),
+            "pages": pages_info,
+            "confidence": total_confidence / page_count if page_count > 0 else 0.0,
+            "page_count": page_count
+        }
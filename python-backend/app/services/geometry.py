@@ -0,0 +1,200 @@
+"""
+Компактное хранение геометрии строк страницы
+
+Вместо JSON со списками точек (в разы больше самих данных, а EasyOCR
+отдает еще и типы NumPy, которые json не сериализует) геометрия
+страницы хранится колонками в одном бинарном значении:
+
+    заголовок   "<2sBBI": b"PG", версия, флаги, число строк N
+    quads       N x 4 x 2: int16, если все координаты целые и влезают,
+                иначе float32
+    confidences N x float32 (NaN - неизвестна)
+    offsets     N x 2 x int32: начало и конец строки в тексте страницы
+                (-1 - неизвестны)
+
+Колонки после заголовка сжимаются zlib, если это заметно уменьшает
+размер. Декодирование ленивое: PageGeometry разбирает значение при
+первом обращении к массивам и отдает представления NumPy без копий.
+"""
+import math
+import struct
+import zlib
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+_MAGIC = b"PG"
+_VERSION = 1
+_HEADER = struct.Struct("<2sBBI")
+
+# Флаги заголовка
+_COMPRESSED = 0x01
+_INT16 = 0x02
+
+# Меньшие колонки не сжимаются: выигрыш не окупает распаковку
+_COMPRESS_MIN_BYTES = 256
+_COMPRESS_MIN_RATIO = 0.9
+
+_INT16_MIN, _INT16_MAX = np.iinfo(np.int16).min, np.iinfo(np.int16).max
+
+
+def _as_quad(box) -> np.ndarray:
+    """Привести рамку к четырем точкам (x, y)"""
+    points = np.asarray(box, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 4:
+        return points
+    # Прямоугольник [x1, y1, x2, y2] или произвольный многоугольник
+    (x1, y1), (x2, y2) = points.min(axis=0), points.max(axis=0)
+    return np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]])
+
+
+class PageGeometry:
+    """
+    Геометрия строк одной страницы
+
+    Хранит закодированное значение; quads, confidences и offsets
+    разбираются при первом обращении. Массивы только для чтения.
+    """
+
+    def __init__(self, raw: bytes):
+        self.raw = bytes(raw)
+        magic, version, self.flags, self.count = _HEADER.unpack_from(self.raw)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Unsupported geometry encoding: {magic!r} v{version}")
+
+    # ==================== Кодирование ====================
+
+    @classmethod
+    def encode(
+        cls,
+        quads: Sequence,
+        confidences: Optional[Sequence[Optional[float]]] = None,
+        offsets: Optional[Sequence[Sequence[int]]] = None,
+        compress: bool = True,
+    ) -> "PageGeometry":
+        """
+        Закодировать геометрию
+
+        Args:
+            quads: Рамки строк: четыре точки, прямоугольник [x1, y1, x2, y2]
+                или многоугольник (заменяется описанным прямоугольником)
+            confidences: Уверенность по строкам
+            offsets: (начало, конец) строк в тексте страницы
+            compress: Сжимать колонки zlib, если это выгодно
+        """
+        count = len(quads)
+        points = np.stack([_as_quad(q) for q in quads]) if count else np.zeros((0, 4, 2))
+
+        flags = 0
+        if (
+            np.array_equal(points, np.round(points))
+            and points.min(initial=0) >= _INT16_MIN
+            and points.max(initial=0) <= _INT16_MAX
+        ):
+            flags |= _INT16
+            points = points.astype("<i2")
+        else:
+            points = points.astype("<f4")
+
+        if confidences is None:
+            confidences = [None] * count
+        scores = np.array([np.nan if c is None else c for c in confidences], dtype="<f4")
+        if offsets is None:
+            offsets = [(-1, -1)] * count
+        spans = np.asarray(offsets, dtype="<i4").reshape(count, 2)
+
+        body = points.tobytes() + scores.tobytes() + spans.tobytes()
+        if compress and len(body) >= _COMPRESS_MIN_BYTES:
+            packed = zlib.compress(body)
+            if len(packed) < len(body) * _COMPRESS_MIN_RATIO:
+                flags |= _COMPRESSED
+                body = packed
+
+        return cls(_HEADER.pack(_MAGIC, _VERSION, flags, count) + body)
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[Dict], text: str = "", compress: bool = True) -> "PageGeometry":
+        """
+        Геометрия из строк результата OCR ({"text", "confidence", "bbox"})
+
+        Смещения ищутся по порядку строк в тексте страницы: движки
+        собирают текст из тех же строк через перевод строки.
+        """
+        quads, confidences, offsets = [], [], []
+        position = 0
+        for line in lines:
+            quads.append(line["bbox"])
+            confidences.append(line.get("confidence"))
+            line_text = line.get("text") or ""
+            start = text.find(line_text, position) if line_text else -1
+            if start < 0:
+                offsets.append((-1, -1))
+                continue
+            position = start + len(line_text)
+            offsets.append((start, position))
+        return cls.encode(quads, confidences, offsets, compress=compress)
+
+    @classmethod
+    def from_boxes(cls, boxes: Sequence, compress: bool = True) -> "PageGeometry":
+        """Геометрия из прежнего списка рамок (без уверенности и смещений)"""
+        return cls.encode(boxes, compress=compress)
+
+    # ==================== Ленивое чтение ====================
+
+    @cached_property
+    def _body(self) -> memoryview:
+        body = memoryview(self.raw)[_HEADER.size:]
+        if self.flags & _COMPRESSED:
+            body = memoryview(zlib.decompress(body))
+        return body
+
+    @cached_property
+    def quads(self) -> np.ndarray:
+        """Рамки строк, массив N x 4 x 2 (int16 или float32)"""
+        dtype = "<i2" if self.flags & _INT16 else "<f4"
+        return np.frombuffer(self._body, dtype=dtype, count=self.count * 8).reshape(self.count, 4, 2)
+
+    @cached_property
+    def confidences(self) -> np.ndarray:
+        """Уверенность по строкам, массив N float32"""
+        return np.frombuffer(self._body, dtype="<f4", count=self.count, offset=self.quads.nbytes)
+
+    @cached_property
+    def offsets(self) -> np.ndarray:
+        """(начало, конец) строк в тексте страницы, массив N x 2 int32"""
+        start = self.quads.nbytes + self.confidences.nbytes
+        return np.frombuffer(self._body, dtype="<i4", count=self.count * 2, offset=start).reshape(self.count, 2)
+
+    def lines(self, text: Optional[str] = None) -> List[Dict]:
+        """Строки в виде словарей для JSON (текст - если передан текст страницы)"""
+        result = []
+        rows = zip(self.quads.tolist(), self.confidences.tolist(), self.offsets.tolist())
+        for quad, confidence, (start, end) in rows:
+            line = {
+                "bbox": quad,
+                "confidence": None if math.isnan(confidence) else confidence,
+            }
+            if text is not None:
+                line["text"] = text[start:end] if start >= 0 else None
+            result.append(line)
+        return result
+
+    def to_boxes(self) -> List[List[List[float]]]:
+        """Рамки в прежнем формате JSON: [[[x, y], ...], ...]"""
+        return self.quads.tolist()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PageGeometry) and self.raw == other.raw
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # Между процессами передается только закодированное значение
+        return (PageGeometry, (self.raw,))
+
+    def __repr__(self) -> str:
+        return f"PageGeometry(lines={self.count}, bytes={len(self.raw)})"
@@ -0,0 +1,154 @@
+"""
+Хэширование файлов в пуле потоков с предфильтром дубликатов
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.file import File as FileModel
+from app.utils.hash_utils import hash_file, partial_hash
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Кандидат в дубликаты из БД: (file_id, filepath, file_hash)
+Candidate = Tuple[int, str, str]
+
+
+class HashingService:
+    """
+    Пул потоков для хэширования, чтобы не блокировать event loop
+
+    Предфильтр дубликатов: сначала размер (один запрос к БД на пачку),
+    затем хэш начала и конца файла против кандидатов того же размера.
+    Полный SHA-256 сравнивается с БД, только если частичный хэш совпал.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or settings.HASH_WORKERS or min(4, os.cpu_count() or 1)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="hash"
+        )
+        # Частичные хэши уже известных файлов (ключ - полный хэш, он не меняется)
+        self._partial_cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._partial_cache_size = 10000
+        # Кэш меняют потоки пула хэширования
+        self._partial_lock = threading.Lock()
+        self.stats = {"files": 0, "size_misses": 0, "partial_misses": 0, "full_compares": 0}
+
+    async def run(self, func: Callable[..., R], *args) -> R:
+        """Выполнить функцию в пуле хэширования"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def map(self, func: Callable[[T], R], items: Iterable[T]) -> List[R]:
+        """Параллельно применить функцию к элементам (порядок сохраняется)"""
+        return await asyncio.gather(*(self.run(func, item) for item in items))
+
+    async def sha256(self, filepath: str) -> str:
+        """Полный SHA-256 файла"""
+        return await self.run(hash_file, filepath)
+
+    # ==================== Предфильтр дубликатов ====================
+
+    @staticmethod
+    def load_candidates(sizes: Iterable[int]) -> Dict[int, List[Candidate]]:
+        """Файлы из БД с такими же размерами (один запрос на пачку)"""
+        sizes = list(set(sizes))
+        candidates: Dict[int, List[Candidate]] = {}
+        if not sizes:
+            return candidates
+
+        db = SessionLocal()
+        try:
+            for i in range(0, len(sizes), 500):
+                rows = db.query(
+                    FileModel.id, FileModel.filepath, FileModel.file_hash, FileModel.file_size
+                ).filter(FileModel.file_size.in_(sizes[i:i + 500]))
+                for file_id, filepath, file_hash, size in rows:
+                    candidates.setdefault(size, []).append((file_id, filepath, file_hash))
+        finally:
+            db.close()
+        return candidates
+
+    def _candidate_partial(self, candidate: Candidate, size: int) -> Optional[str]:
+        _, filepath, file_hash = candidate
+        with self._partial_lock:
+            if file_hash in self._partial_cache:
+                self._partial_cache.move_to_end(file_hash)
+                return self._partial_cache[file_hash]
+        # Чтение файла - вне блокировки, в худшем случае хэш посчитают дважды
+        try:
+            value = partial_hash(filepath, size)
+        except OSError:
+            # Оригинал недоступен - сравнивать придется по полному хэшу
+            value = None
+        with self._partial_lock:
+            self._partial_cache[file_hash] = value
+            self._partial_cache.move_to_end(file_hash)
+            if len(self._partial_cache) > self._partial_cache_size:
+                self._partial_cache.popitem(last=False)
+        return value
+
+    def check_duplicate(
+        self,
+        filepath: str,
+        size: int,
+        candidates: List[Candidate],
+    ) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Проверить файл на дубликат (синхронно, вызывать из пула)
+
+        Returns:
+            (ID найденного дубликата или None, полный хэш если он был посчитан)
+        """
+        self.stats["files"] += 1
+        if not candidates:
+            self.stats["size_misses"] += 1
+            return None, None
+
+        own_partial = partial_hash(filepath, size)
+        possible = [
+            c for c in candidates
+            if self._candidate_partial(c, size) in (own_partial, None)
+        ]
+        if not possible:
+            self.stats["partial_misses"] += 1
+            return None, None
+
+        self.stats["full_compares"] += 1
+        digest = hash_file(filepath)
+        for file_id, _, file_hash in possible:
+            if file_hash == digest:
+                return file_id, digest
+        return None, digest
+
+    async def find_duplicate(self, filepath: str, size: Optional[int] = None) -> Tuple[Optional[int], Optional[str]]:
+        """Асинхронная проверка одного файла на дубликат"""
+        if size is None:
+            size = (await self.run(os.stat, filepath)).st_size
+        candidates = await self.run(self.load_candidates, [size])
+        return await self.run(self.check_duplicate, filepath, size, candidates.get(size, []))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Глобальный экземпляр сервиса
+_hashing_service: Optional[HashingService] = None
+
+
+def get_hashing_service() -> HashingService:
+    """Получить сервис хэширования (singleton)"""
+    global _hashing_service
+    if _hashing_service is None:
+        _hashing_service = HashingService()
+    return _hashing_service
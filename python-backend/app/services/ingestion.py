@@ -0,0 +1,597 @@
+"""
+Регистрация новых файлов в БД и постановка их в очередь OCR
+"""
+import asyncio
+import logging
+import mimetypes
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.writer import get_db_writer
+from app.models.file import File as FileModel
+from app.models.file_alias import FileAlias
+from app.models.file_stat import FileStat
+from app.services.content_store import get_content_store
+from app.services.dead_letter_service import DeadLetterService
+from app.services.hashing import Candidate, HashingService, get_hashing_service
+from app.utils.hash_utils import hash_file
+from app.workers.queue_manager import get_queue_manager
+from app.workers.scheduling import LANE_BATCH
+from app.api.v1.endpoints.ws import notify_file_added
+
+logger = logging.getLogger(__name__)
+
+
+def probe_file(
+    filepath: str,
+    stat: Optional[os.stat_result] = None,
+    candidates: Optional[List[Candidate]] = None,
+) -> Optional[Dict]:
+    """
+    Собрать метаданные и хэш файла
+
+    Args:
+        filepath: Путь к файлу
+        stat: Уже известный результат os.stat
+        candidates: Файлы БД того же размера; если переданы, сначала
+            работает предфильтр дубликатов HashingService
+
+    Returns:
+        Словарь с полями файла и stat-сигнатурой или None,
+        если файл исчез или недоступен
+    """
+    try:
+        stat = stat or os.stat(filepath)
+        duplicate_of, digest = None, None
+        if candidates is not None:
+            duplicate_of, digest = get_hashing_service().check_duplicate(
+                filepath, stat.st_size, candidates
+            )
+        return {
+            "filepath": filepath,
+            "filename": Path(filepath).name,
+            "file_size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "inode": stat.st_ino,
+            "mime_type": mimetypes.guess_type(filepath)[0] or "application/octet-stream",
+            "file_hash": digest or hash_file(filepath),
+            "duplicate_of": duplicate_of,
+        }
+    except OSError as e:
+        logger.warning(f"Skip unreadable file {filepath}: {e}")
+        return None
+
+
+def _stat(filepath: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(filepath)
+    except OSError as e:
+        logger.warning(f"Skip unreadable file {filepath}: {e}")
+        return None
+
+
+async def probe_files(
+    items: List[Tuple[str, Optional[os.stat_result]]]
+) -> List[Dict]:
+    """
+    Параллельно собрать метаданные и хэши пачки файлов
+
+    Кандидаты в дубликаты по размеру загружаются одним запросом на пачку.
+    """
+    hashing = get_hashing_service()
+    stats = await hashing.map(
+        lambda item: item[1] or _stat(item[0]), items
+    )
+    items = [(path, stat) for (path, _), stat in zip(items, stats) if stat is not None]
+    candidates = await hashing.run(
+        HashingService.load_candidates, [stat.st_size for _, stat in items]
+    )
+    probes = await hashing.map(
+        lambda item: probe_file(item[0], item[1], candidates.get(item[1].st_size, [])),
+        items,
+    )
+    return [p for p in probes if p]
+
+
+def _upsert_stats(db, probes: List[Dict]):
+    """Обновить индекс stat-сигнатур (для сверки папки без перехэширования)"""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "path": p["filepath"],
+            "size": p["file_size"],
+            "mtime_ns": p["mtime_ns"],
+            "inode": p["inode"],
+            "file_hash": p["file_hash"],
+            "seen_at": now,
+        }
+        for p in probes
+    ]
+    stmt = sqlite_insert(FileStat)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[FileStat.path],
+            set_={
+                "size": stmt.excluded.size,
+                "mtime_ns": stmt.excluded.mtime_ns,
+                "inode": stmt.excluded.inode,
+                "file_hash": stmt.excluded.file_hash,
+                "seen_at": stmt.excluded.seen_at,
+            },
+        ),
+        rows,
+    )
+
+
+def _upsert_aliases(db, aliases: List[Tuple[Dict, int]]):
+    """Записать пути файлов как псевдонимы (путь уникален, последний файл побеждает)"""
+    if not aliases:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {
+            "file_id": file_id,
+            "path": probe["filepath"],
+            "filename": probe["filename"],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for probe, file_id in aliases
+    ]
+    stmt = sqlite_insert(FileAlias)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[FileAlias.path],
+            set_={
+                "file_id": stmt.excluded.file_id,
+                "filename": stmt.excluded.filename,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        ),
+        rows,
+    )
+
+
+def _record(file_id: int, probe: Dict) -> Dict:
+    return {
+        "id": file_id,
+        "filepath": probe["filepath"],
+        "filename": probe["filename"],
+        "file_size": probe["file_size"],
+    }
+
+
+def _place(probes: List[Dict]) -> Dict[str, str]:
+    """
+    Поместить файлы пачки в хранилище оригиналов до регистрации в БД
+
+    Копирование не держит блокировку записи писателя. Объект по хэшу
+    общий: для содержимого, уже лежащего в хранилище, put ничего не
+    копирует. Объекты, запись о которых не зафиксировалась, удаляет
+    очистка сирот.
+
+    Returns:
+        Исходный путь -> путь объекта (без файлов, которые не удалось прочитать)
+    """
+    store = get_content_store()
+    objects = {}
+    for probe in probes:
+        try:
+            objects[probe["filepath"]] = store.put(probe["filepath"], probe["file_hash"])
+        except OSError as e:
+            logger.warning(f"Skip unreadable file {probe['filepath']}: {e}")
+    return objects
+
+
+def _register_probes(
+    db: Session,
+    probes: List[Dict],
+    objects: Dict[str, str],
+) -> Tuple[List[Dict], List[Tuple[str, str]]]:
+    """
+    Зарегистрировать пачку файлов (намерение писателя БД)
+
+    Новые файлы (уже размещенные _place в хранилище оригиналов) добавляются
+    одним executemany, files.filepath указывает на объект хранилища, исходный
+    путь становится псевдонимом (file_aliases). Дубликаты по хэшу (в БД
+    и внутри пачки) не регистрируются и не распознаются повторно: их путь
+    записывается псевдонимом существующего файла. После фиксации исходники
+    заменяются ссылками на объект (или удаляются в режиме move).
+    Известный путь ищется и в files.filepath (записи до хранилища), и в
+    file_aliases. Если по нему изменилось содержимое, запись обновляется,
+    а старый документ удаляется (строки FTS удаляют триггеры); если на
+    прежнее содержимое ведут и другие пути, запись остается им, а путь
+    регистрируется заново как новое содержимое.
+
+    Args:
+        objects: Результат _place
+
+    Returns:
+        (записи для постановки в очередь, пары (исходный путь, объект
+        хранилища) для release после фиксации)
+    """
+    store = get_content_store()
+    paths = [p["filepath"] for p in probes]
+    hashes = [p["file_hash"] for p in probes]
+    known = {
+        rec.filepath: rec for rec in
+        db.query(FileModel).filter(FileModel.filepath.in_(paths))
+    }
+    # files.filepath указывает в хранилище - пути папки наблюдения в псевдонимах.
+    # В режиме move исходник удален после регистрации, и новый файл по тому
+    # же пути - новое содержимое, а не изменение прежнего
+    aliased = {} if store.mode == "move" else {
+        path: rec for path, rec in
+        db.query(FileAlias.path, FileModel)
+        .join(FileModel, FileModel.id == FileAlias.file_id)
+        .filter(FileAlias.path.in_(paths))
+    }
+    known.update(aliased)
+    alias_counts = dict(
+        db.query(FileAlias.file_id, func.count(FileAlias.id))
+        .filter(FileAlias.file_id.in_({rec.id for rec in known.values()}))
+        .group_by(FileAlias.file_id)
+    )
+
+    def other_paths(rec: FileModel, path: str) -> int:
+        """Сколько еще путей ведут к содержимому записи"""
+        count = alias_counts.get(rec.id, 0) - (path in aliased)
+        if rec.filepath != path and not store.contains(rec.filepath):
+            count += 1
+        return count
+
+    # Хэш -> (ID, путь объекта), куда ведут дубликаты
+    known_hashes = {
+        file_hash: (file_id, filepath)
+        for file_hash, file_id, filepath in
+        db.query(FileModel.file_hash, FileModel.id, FileModel.filepath)
+        .filter(FileModel.file_hash.in_(hashes))
+    }
+
+    records = []
+    new_probes = []
+    # (исходный путь, объект хранилища) - освобождаются после commit
+    placed = []
+    aliases = []
+    for probe in probes:
+        rec = known.get(probe["filepath"])
+        if rec is not None and rec.file_hash == probe["file_hash"]:
+            continue
+        if rec is not None and not other_paths(rec, probe["filepath"]):
+            # Файл перезаписан на месте - обрабатываем заново
+            logger.info(f"Content changed: {probe['filepath']}")
+            if rec.document is not None:
+                db.delete(rec.document)
+            rec.filepath = objects[probe["filepath"]]
+            rec.file_hash = probe["file_hash"]
+            rec.file_size = probe["file_size"]
+            rec.is_processed = False
+            known_hashes[probe["file_hash"]] = (rec.id, rec.filepath)
+            placed.append((probe["filepath"], rec.filepath))
+            if rec.filepath != probe["filepath"]:
+                aliases.append((probe, rec.id))
+            records.append(_record(rec.id, {**probe, "filepath": rec.filepath}))
+            continue
+
+        existing = known_hashes.get(probe["file_hash"])
+        if existing is not None:
+            file_id, stored = existing
+            logger.info(f"Duplicate of file {file_id}: {probe['filepath']}")
+            placed.append((probe["filepath"], stored))
+            if stored != probe["filepath"]:
+                aliases.append((probe, file_id))
+            continue
+        if probe.get("duplicate_of"):
+            # Дубликат найден предфильтром, но успел исчезнуть из БД
+            logger.info(f"Skip duplicate: {probe['filepath']}")
+            continue
+
+        stored = objects[probe["filepath"]]
+        known_hashes[probe["file_hash"]] = (None, stored)
+        placed.append((probe["filepath"], stored))
+        new_probes.append({**probe, "filepath": stored, "source": probe["filepath"]})
+
+    if new_probes:
+        db.execute(
+            insert(FileModel.__table__),
+            [
+                {
+                    "filename": p["filename"],
+                    "filepath": p["filepath"],
+                    "file_hash": p["file_hash"],
+                    "file_size": p["file_size"],
+                    "mime_type": p["mime_type"],
+                    "is_processed": False,
+                }
+                for p in new_probes
+            ],
+        )
+        ids = dict(
+            db.query(FileModel.filepath, FileModel.id)
+            .filter(FileModel.filepath.in_([p["filepath"] for p in new_probes]))
+        )
+        records.extend(_record(ids[p["filepath"]], p) for p in new_probes)
+        aliases.extend(
+            ({**p, "filepath": p["source"]}, ids[p["filepath"]])
+            for p in new_probes if p["source"] != p["filepath"]
+        )
+        # Дубликаты внутри пачки ссылаются на файл, получивший ID только сейчас
+        aliases = [
+            (probe, file_id if file_id is not None else ids[known_hashes[probe["file_hash"]][1]])
+            for probe, file_id in aliases
+        ]
+
+    _upsert_aliases(db, aliases)
+    _upsert_stats(db, probes)
+    return records, placed
+
+
+def _release(placed: List[Tuple[str, str]]):
+    store = get_content_store()
+    for source, stored in placed:
+        store.release(source, stored)
+
+
+async def ingest_probes(
+    probes: List[Dict],
+    lane: int = LANE_BATCH,
+    notify: bool = True,
+) -> List[int]:
+    """
+    Зарегистрировать уже прохэшированные файлы и добавить их в очередь
+
+    Args:
+        probes: Результаты probe_file
+        lane: Полоса очереди
+        notify: Отправлять file_added по каждому файлу (массовый импорт
+            сообщает о прогрессе сам)
+
+    Returns:
+        ID записей, поставленных в очередь
+    """
+    if not probes:
+        return []
+    # Копирование в хранилище - вне транзакции писателя
+    objects = await asyncio.to_thread(_place, probes)
+    probes = [p for p in probes if p["filepath"] in objects]
+
+    records: List[Dict] = []
+    placed: List[Tuple[str, str]] = []
+    for attempt in range(2):
+        try:
+            records, placed = await get_db_writer().execute(_register_probes, probes, objects)
+            break
+        except IntegrityError:
+            # Путь успели зарегистрировать параллельно (загрузка) - повторная
+            # попытка увидит его как известный
+            if attempt:
+                logger.exception(f"Failed to index {len(probes)} new file(s)")
+                return []
+        except Exception as e:
+            logger.exception(f"Failed to index {len(probes)} new file(s): {e}")
+            return []
+
+    # Исходники освобождаются только после фиксации
+    await asyncio.to_thread(_release, placed)
+
+    for rec in records:
+        logger.info(f"Indexed new file: {rec['filepath']} (id={rec['id']})")
+        if notify:
+            await notify_file_added(rec["id"], rec["filename"])
+
+    queue_manager = get_queue_manager()
+    if queue_manager:
+        await queue_manager.add_tasks(
+            [
+                {"file_id": rec["id"], "filepath": rec["filepath"], "file_size": rec["file_size"]}
+                for rec in records
+            ],
+            lane=lane,
+        )
+
+    return [rec["id"] for rec in records]
+
+
+def _pending_tasks() -> List[Dict]:
+    """Необработанные файлы, кроме отправленных в dead-letter"""
+    db = SessionLocal()
+    try:
+        rows = db.query(FileModel.id, FileModel.filepath, FileModel.file_size).filter(
+            FileModel.is_processed == False,
+            FileModel.id.not_in(DeadLetterService(db).dead_file_ids())
+        ).order_by(FileModel.id)
+        return [
+            {"file_id": file_id, "filepath": filepath, "file_size": file_size}
+            for file_id, filepath, file_size in rows
+        ]
+    finally:
+        db.close()
+
+
+async def requeue_pending(lane: int = LANE_BATCH) -> int:
+    """
+    Поставить в очередь файлы, не обработанные до остановки приложения
+
+    Очередь живет в памяти, поэтому после перезапуска задачи нужно
+    восстановить. Уже сохраненные страницы повторно не распознаются.
+
+    Returns:
+        Количество поставленных задач
+    """
+    queue_manager = get_queue_manager()
+    if queue_manager is None:
+        return 0
+    tasks = await asyncio.to_thread(_pending_tasks)
+    await queue_manager.add_tasks(tasks, lane=lane)
+    if tasks:
+        logger.info(f"Re-queued {len(tasks)} unfinished file(s)")
+    return len(tasks)
+
+
+async def ingest_files(filepaths: List[str], lane: int = LANE_BATCH) -> List[int]:
+    """
+    Зарегистрировать файлы и добавить их в очередь обработки
+
+    Хэширование идет в пуле HashingService, запись в БД - в отдельном
+    потоке, вся пачка сохраняется одной транзакцией.
+
+    Returns:
+        ID созданных записей (без дубликатов и ошибок)
+    """
+    probes = await probe_files([(path, None) for path in filepaths])
+    return await ingest_probes(probes, lane=lane)
+
+
+async def ingest_file(filepath: str, lane: int = LANE_BATCH) -> Optional[int]:
+    """
+    Зарегистрировать файл и добавить его в очередь обработки
+
+    Args:
+        filepath: Путь к файлу
+        lane: Полоса очереди (интерактивные загрузки идут вне общей очереди)
+
+    Returns:
+        ID созданной записи или None (дубликат/ошибка)
+    """
+    file_ids = await ingest_files([filepath], lane=lane)
+    return file_ids[0] if file_ids else None
+
+
+class IngestionBridge:
+    """
+    Мост между потоком watchdog и event loop
+
+    События файловой системы приходят из потока наблюдателя через
+    call_soon_threadsafe. Всплески created/modified/moved по одному пути
+    схлопываются: путь регистрируется, когда по нему не было событий
+    debounce_seconds. Готовые пути обрабатываются пачками до batch_size,
+    одна транзакция БД на пачку. Ошибка пачки не останавливает мост: пути
+    повторяются до MAX_ATTEMPTS раз, потом их подберет сверка папки.
+    """
+
+    MAX_ATTEMPTS = 3
+
+    def __init__(
+        self,
+        debounce_seconds: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        lane: int = LANE_BATCH,
+    ):
+        self.debounce_seconds = (
+            settings.INGEST_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        )
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.lane = lane
+        self._pending: Dict[str, float] = {}
+        self._attempts: Dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches_total = 0
+        self.events_total = 0
+
+    def start(self):
+        """Запустить обработку (вызывать из event loop)"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def submit(self, filepath: str):
+        """Передать событие по пути (потокобезопасно, из любого потока)"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._touch, filepath)
+        except RuntimeError:
+            # Loop уже закрывается
+            pass
+
+    def _touch(self, filepath: str):
+        self.events_total += 1
+        self._pending[filepath] = self._loop.time()
+        self._wakeup.set()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def _take_ready(self) -> List[str]:
+        deadline = self._loop.time() - self.debounce_seconds
+        ready = []
+        for path, last_event in self._pending.items():
+            if last_event <= deadline:
+                ready.append(path)
+                if len(ready) >= self.batch_size:
+                    break
+        for path in ready:
+            del self._pending[path]
+        return ready
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            ready = self._take_ready()
+            if not ready:
+                # Ждем, пока самый старый путь "успокоится", или нового события
+                next_due = min(self._pending.values()) + self.debounce_seconds
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), max(0.0, next_due - self._loop.time()))
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            self.batches_total += 1
+            await self._ingest(ready)
+
+    async def _ingest(self, paths: List[str]):
+        try:
+            await ingest_files(paths, lane=self.lane)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"Failed to ingest a batch of {len(paths)} file(s): {e}")
+            now = self._loop.time()
+            for path in paths:
+                attempts = self._attempts.get(path, 0) + 1
+                if attempts >= self.MAX_ATTEMPTS:
+                    self._attempts.pop(path, None)
+                    logger.error(f"Giving up on {path} after {attempts} attempt(s)")
+                elif path not in self._pending:
+                    self._attempts[path] = attempts
+                    self._pending[path] = now
+        else:
+            for path in paths:
+                self._attempts.pop(path, None)
+
+    async def stop(self, flush: bool = True):
+        """Остановить обработку, по умолчанию зарегистрировав оставшиеся пути"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if flush and self._pending:
+            pending = list(self._pending)
+            self._pending.clear()
+            for i in range(0, len(pending), self.batch_size):
+                try:
+                    await ingest_files(pending[i:i + self.batch_size], lane=self.lane)
+                except Exception as e:
+                    logger.error(f"Failed to ingest pending files on shutdown: {e}")
+
+        self._loop = None
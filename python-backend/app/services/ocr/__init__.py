@@ -1,7 +1,7 @@
 from app.services.ocr.base import BaseOCR
 from app.services.ocr.paddleocr_service import PaddleOCRService
 from app.services.ocr.easyocr_service import EasyOCRService
-from app.services.ocr.ocr_manager import OCRManager, get_ocr_manager
+from app.services.ocr.ocr_manager import OCRManager, get_ocr_manager, normalize_mode
 
 __all__ = [
     "BaseOCR",
@@ -9,4 +9,5 @@ __all__ = [
     "EasyOCRService",
     "OCRManager",
     "get_ocr_manager",
+    "normalize_mode",
 ]
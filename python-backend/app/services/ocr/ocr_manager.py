@@ -2,6 +2,7 @@
 Менеджер для управления несколькими OCR-движками
 """
 import logging
+import threading
 from typing import Dict, Optional
 
 from app.services.ocr.base import BaseOCR
@@ -11,6 +12,19 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+MODE_PRINTED = "printed"
+MODE_HANDWRITTEN = "handwritten"
+
+
+def normalize_mode(mode: Optional[str]) -> str:
+    """
+    Режим распознавания в том виде, в каком он сохраняется и сравнивается
+
+    "auto" и неизвестные значения распознаются как печатный текст,
+    поэтому и записываются как "printed".
+    """
+    return MODE_HANDWRITTEN if mode == MODE_HANDWRITTEN else MODE_PRINTED
+
 
 class OCRManager:
     """Ленивая загрузка и управление OCR-движками"""
@@ -20,6 +34,12 @@ class OCRManager:
             "paddleocr": None,
             "easyocr": None,
         }
+        # Страницы распознаются в отдельных потоках, а экземпляры
+        # движков не потокобезопасны
+        self._locks: Dict[str, threading.Lock] = {
+            name: threading.Lock() for name in self._engines
+        }
+        self._init_lock = threading.Lock()
     
     def _get_engine(self, engine_name: str) -> BaseOCR:
         """
@@ -35,22 +55,27 @@ class OCRManager:
             raise ValueError(f"Unknown OCR engine: {engine_name}")
         
         # Ленивая загрузка
-        if self._engines.get(engine_name) is None:
-            logger.info(f"Lazily loading OCR engine: {engine_name}")
-            
-            if engine_name == "paddleocr":
-                self._engines[engine_name] = PaddleOCRService(
-                    languages=settings.OCR_LANGUAGES,
-                    use_gpu=settings.OCR_GPU
-                )
-            elif engine_name == "easyocr":
-                self._engines[engine_name] = EasyOCRService(
-                    languages=settings.OCR_LANGUAGES,
-                    use_gpu=settings.OCR_GPU
-                )
+        with self._init_lock:
+            if self._engines.get(engine_name) is None:
+                self._load_engine(engine_name)
         
         return self._engines[engine_name]
     
+    def _load_engine(self, engine_name: str):
+        """Создать экземпляр OCR-движка"""
+        logger.info(f"Lazily loading OCR engine: {engine_name}")
+        
+        if engine_name == "paddleocr":
+            self._engines[engine_name] = PaddleOCRService(
+                languages=settings.OCR_LANGUAGES,
+                use_gpu=settings.OCR_GPU
+            )
+        elif engine_name == "easyocr":
+            self._engines[engine_name] = EasyOCRService(
+                languages=settings.OCR_LANGUAGES,
+                use_gpu=settings.OCR_GPU
+            )
+
     def recognize(self, image, engine_name: str, mode: str = "printed") -> Dict:
         """
         Распознать текст с помощью указанного движка
@@ -65,10 +90,11 @@ class OCRManager:
         """
         engine = self._get_engine(engine_name)
         
-        if mode == "handwritten":
-            return engine.recognize_handwritten(image)
-        else:
-            return engine.recognize_printed(image)
+        with self._locks[engine_name]:
+            if normalize_mode(mode) == MODE_HANDWRITTEN:
+                return engine.recognize_handwritten(image)
+            else:
+                return engine.recognize_printed(image)
 
 
 # Глобальный экземпляр менеджера
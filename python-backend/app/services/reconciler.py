@@ -0,0 +1,197 @@
+"""
+Сверка папки наблюдения с БД
+
+Файлы, появившиеся, пока приложение не работало, не порождают событий
+watchdog. Сверка обходит папку рекурсивно и сравнивает stat-сигнатуру
+(size, mtime_ns, inode) каждого файла с индексом file_stats: хэшируются
+только новые и измененные файлы.
+"""
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.writer import get_db_writer
+from app.models.file_alias import FileAlias
+from app.models.file_stat import FileStat
+from app.services.file_monitor import WATCHED_EXTENSIONS
+from app.services.ingestion import ingest_probes, probe_files
+
+logger = logging.getLogger(__name__)
+
+
+def _walk_key(root: str, path: str, is_dir: bool = False) -> Tuple[Tuple[int, str], ...]:
+    """
+    Ключ пути в порядке обхода walk_files(ordered=True)
+
+    В каждой папке сначала идут файлы, затем подпапки, те и другие по
+    имени - так же сравниваются компоненты (0, файл) и (1, папка).
+    """
+    parts = Path(os.path.relpath(path, root)).parts
+    if is_dir:
+        return tuple((1, name) for name in parts)
+    return tuple((1, name) for name in parts[:-1]) + ((0, parts[-1]),)
+
+
+def walk_files(
+    root: str,
+    exts: Set[str] = WATCHED_EXTENSIONS,
+    ordered: bool = False,
+    after: Optional[str] = None,
+) -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    Рекурсивно обойти папку через os.scandir
+
+    Симлинки на папки не раскрываются, скрытые файлы и папки пропускаются.
+    На большинстве платформ DirEntry.stat() не требует отдельного
+    системного вызова на каждый файл.
+
+    Args:
+        ordered: Обходить в порядке имен (повторяемый порядок нужен для
+            продолжения импорта с чекпоинта)
+        after: Начать с файла, следующего за этим путем в порядке имен
+            (сам путь может уже не существовать); пройденные папки не
+            сканируются. Только вместе с ordered
+    """
+    after_key = _walk_key(root, after) if after else None
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as scan:
+                entries = scan
+                if ordered:
+                    entries = sorted(scan, key=lambda e: e.name)
+                subdirs = []
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if after_key:
+                                key = _walk_key(root, entry.path, is_dir=True)
+                                if key < after_key[:len(key)]:
+                                    continue
+                            subdirs.append(entry.path)
+                        elif entry.is_file() and Path(entry.name).suffix.lower() in exts:
+                            if after_key and _walk_key(root, entry.path) <= after_key:
+                                continue
+                            yield entry.path, entry.stat()
+                    except OSError as e:
+                        logger.debug(f"Skip {entry.path}: {e}")
+                # Обратный порядок: первой со стека снимается первая по имени
+                stack.extend(reversed(subdirs))
+        except OSError as e:
+            logger.warning(f"Cannot scan {directory}: {e}")
+
+
+def _forget(db: Session, paths: List[str]):
+    """
+    Забыть исчезнувшие пути (намерение писателя БД)
+
+    В режиме move исходники удаляются после регистрации - их
+    псевдонимы остаются: это пути, по которым файлы были найдены.
+    """
+    forget_aliases = settings.STORE_MODE != "move"
+    for i in range(0, len(paths), 500):
+        chunk = paths[i:i + 500]
+        db.query(FileStat).filter(FileStat.path.in_(chunk)).delete(synchronize_session=False)
+        if forget_aliases:
+            db.query(FileAlias).filter(FileAlias.path.in_(chunk)).delete(synchronize_session=False)
+
+
+class WatchFolderReconciler:
+    """Сверка при старте и периодически (WATCH_RECONCILE_INTERVAL_SECONDS)"""
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+    ):
+        self.root = str(root or settings.WATCH_FOLDER)
+        self.interval = settings.WATCH_RECONCILE_INTERVAL_SECONDS if interval is None else interval
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.last_result: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def _diff(self) -> Tuple[List[Tuple[str, os.stat_result]], List[str], int]:
+        """
+        Сравнить содержимое папки с индексом
+
+        Returns:
+            (новые/измененные файлы со stat, исчезнувшие пути, число файлов на диске)
+        """
+        db = SessionLocal()
+        try:
+            index = {
+                path: (size, mtime_ns, inode)
+                for path, size, mtime_ns, inode in db.query(
+                    FileStat.path, FileStat.size, FileStat.mtime_ns, FileStat.inode
+                )
+            }
+        finally:
+            db.close()
+
+        changed = []
+        seen = 0
+        for path, stat in walk_files(self.root):
+            seen += 1
+            signature = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            if index.pop(path, None) != signature:
+                changed.append((path, stat))
+
+        # Все, что осталось в индексе, на диске больше нет
+        return changed, list(index), seen
+
+    async def reconcile(self) -> Dict:
+        """Выполнить одну сверку"""
+        async with self._lock:
+            started = time.monotonic()
+            changed, removed, seen = await asyncio.to_thread(self._diff)
+
+            queued = 0
+            for i in range(0, len(changed), self.batch_size):
+                probes = await probe_files(changed[i:i + self.batch_size])
+                queued += len(await ingest_probes(probes))
+
+            if removed:
+                await get_db_writer().execute(_forget, removed)
+
+            self.last_result = {
+                "scanned": seen,
+                "changed": len(changed),
+                "queued": queued,
+                "removed": len(removed),
+                "duration_seconds": round(time.monotonic() - started, 3),
+                "finished_at": time.time(),
+            }
+            logger.info(f"Watch folder reconciled: {self.last_result}")
+            return self.last_result
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.exception(f"Watch folder reconciliation failed: {e}")
+            if not self.interval:
+                return
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Сверка при старте и далее периодически"""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -1,31 +1,194 @@
 """
 Полнотекстовый поиск (FTS5)
+
+Индексы хранят только токены, без копии текста (external content):
+documents_fts - над страницами document_pages, files_fts - над именами
+файлов. files_fts синхронизируют триггеры на files.
+
+Текст страниц может быть сжат (CompressedText), а распаковать его
+может только приложение. Поэтому триггеры на document_pages не трогают
+индекс: они на чистом SQL записывают изменения в очередь fts_pending
+(id страницы и прежнее значение, если страница была в индексе), и
+писать страницы можно с любого соединения - из sqlite3, скриптов
+восстановления, миграций. Очередь разбирает приложение: писатель БД
+перед каждой фиксацией (изменения его намерений попадают в индекс той
+же транзакцией) и FtsIndexer - изменения, записанные мимо писателя.
+
+Функция decompress_text() нужна только для чтения текста через вид
+document_pages_fts_source: snippet()/highlight() и 'rebuild' /
+'integrity-check' индекса documents_fts. Она регистрируется на
+соединениях приложения и миграций (app.db.types), в sqlite3 ее нет.
+
+Переход с прежнего индекса (копия текста в documents_fts - строка на
+документ или на страницу) выполняется без простоя: прежняя таблица
+переименовывается в documents_fts_legacy и отвечает на поиск, пока
+все страницы, поставленные в очередь, не попадут в новый индекс.
 """
-from typing import List, Dict
-from sqlalchemy import text
-from app.db.session import SessionLocal
+import asyncio
 import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.types import CompressedText, decompress_text
+from app.db.writer import get_db_writer
+from app.models.document_page import DocumentPage
 
 logger = logging.getLogger(__name__)
 
+_TOKENIZE = "tokenize='unicode61 remove_diacritics 1'"
+
+_FTS_SCHEMA = [
+    """
+    CREATE VIEW IF NOT EXISTS document_pages_fts_source AS
+    SELECT id, decompress_text(text_content) AS text_content FROM document_pages
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts
+    USING fts5(
+        text_content,
+        content='document_pages_fts_source',
+        content_rowid='id',
+        {_TOKENIZE}
+    )
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS files_fts
+    USING fts5(filename, content='files', content_rowid='id', {_TOKENIZE})
+    """,
+    # Изменения страниц, еще не отраженные в documents_fts. indexed = 1:
+    # страница была в индексе с текстом old_text (как хранится, возможно сжат)
+    """
+    CREATE TABLE IF NOT EXISTS fts_pending (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        page_id INTEGER NOT NULL,
+        indexed INTEGER NOT NULL,
+        old_text
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_fts_pending_page_id ON fts_pending(page_id)",
+]
+
+_TRIGGERS = {
+    "document_pages_fts_insert": """
+        AFTER INSERT ON document_pages
+        BEGIN
+            INSERT INTO fts_pending(page_id, indexed) VALUES (new.id, 0);
+        END
+    """,
+    "document_pages_fts_delete": """
+        AFTER DELETE ON document_pages
+        BEGIN
+            INSERT INTO fts_pending(page_id, indexed, old_text)
+            VALUES (old.id, 1, old.text_content);
+        END
+    """,
+    "document_pages_fts_update": """
+        AFTER UPDATE OF text_content ON document_pages
+        WHEN old.text_content IS NOT new.text_content
+        BEGIN
+            INSERT INTO fts_pending(page_id, indexed, old_text)
+            VALUES (old.id, 1, old.text_content);
+        END
+    """,
+    "files_fts_insert": """
+        AFTER INSERT ON files
+        BEGIN
+            INSERT INTO files_fts(rowid, filename) VALUES (new.id, new.filename);
+        END
+    """,
+    "files_fts_delete": """
+        AFTER DELETE ON files
+        BEGIN
+            INSERT INTO files_fts(files_fts, rowid, filename) VALUES ('delete', old.id, old.filename);
+        END
+    """,
+    "files_fts_update": """
+        AFTER UPDATE OF filename ON files
+        WHEN old.filename IS NOT new.filename
+        BEGIN
+            INSERT INTO files_fts(files_fts, rowid, filename) VALUES ('delete', old.id, old.filename);
+            INSERT INTO files_fts(rowid, filename) VALUES (new.id, new.filename);
+        END
+    """,
+}
+
+_LEGACY_TABLE = "documents_fts_legacy"
+
+# Запрос к прежнему индексу, пока заполняется новый (None - его нет)
+_legacy_search = None
+
+# Последняя запись очереди на момент запуска: более ранние - работа
+# FtsIndexer, более поздние индексирует писатель перед фиксацией
+_pending_floor = 0
+
+
+def _table_sql(db, name: str) -> Optional[str]:
+    return db.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": name}
+    ).scalar()
+
 
 def ensure_fts_table():
     """
-    Создать FTS5 виртуальную таблицу если не существует
+    Создать индексы FTS5, вид содержимого, очередь и триггеры
+
+    Триггеры пересоздаются при каждом запуске. Прежний documents_fts с
+    копией текста (строка на документ или на страницу) переименовывается
+    в documents_fts_legacy и отвечает на поиск, пока все страницы, уже
+    записанные в БД, ждут индексации в очереди (FtsIndexer).
     """
+    global _legacy_search, _pending_floor
     db = SessionLocal()
     try:
-        db.execute(text("""
-            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts
-            USING fts5(
-                document_id UNINDEXED,
-                filename,
-                text_content,
-                tokenize='unicode61 remove_diacritics 1'
-            );
-        """))
+        existing = _table_sql(db, "documents_fts")
+        legacy = _table_sql(db, _LEGACY_TABLE)
+        files_indexed = _table_sql(db, "files_fts") is not None
+
+        migrate = existing is None
+        if existing and "content=" not in existing:
+            if legacy is None:
+                db.execute(text(f"ALTER TABLE documents_fts RENAME TO {_LEGACY_TABLE}"))
+                legacy = existing
+            else:
+                # Переход уже идет - прежний индекс у него есть
+                db.execute(text("DROP TABLE documents_fts"))
+            migrate = True
+        if _table_sql(db, "fts_backfill") is not None:
+            # Прежнее заполнение по диапазонам id - заново через очередь
+            db.execute(text("DROP TABLE fts_backfill"))
+            migrate = True
+
+        for statement in _FTS_SCHEMA:
+            db.execute(text(statement))
+        if migrate:
+            # Все существующие страницы ждут индексации с пустого индекса
+            db.execute(text("INSERT INTO documents_fts(documents_fts) VALUES('delete-all')"))
+            db.execute(text("DELETE FROM fts_pending"))
+            db.execute(text(
+                "INSERT INTO fts_pending(page_id, indexed) SELECT id, 0 FROM document_pages"
+            ))
+        for name, body in _TRIGGERS.items():
+            db.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            db.execute(text(f"CREATE TRIGGER {name} {body}"))
+        if not files_indexed:
+            db.execute(text("INSERT INTO files_fts(files_fts) VALUES('rebuild')"))
         db.commit()
-        logger.info("FTS table initialized")
+        _pending_floor = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM fts_pending")).scalar()
+
+        if legacy is None:
+            _legacy_search = None
+        elif "page_number" in legacy:
+            _legacy_search = _SEARCH_LEGACY_PAGES_SQL
+        else:
+            _legacy_search = _SEARCH_LEGACY_DOCUMENTS_SQL
+        get_db_writer().before_commit(index_recent_changes)
+        logger.info("FTS tables initialized")
     except Exception as e:
         logger.error(f"Failed to create FTS table: {e}")
         db.rollback()
@@ -33,91 +196,352 @@ def ensure_fts_table():
         db.close()
 
 
-def index_document(document_id: int, filename: str, text_content: str):
+# ==================== Индексация очереди ====================
+# Выполняется писателем БД
+
+_PENDING_PAGES_SQL = text("""
+    SELECT DISTINCT page_id FROM (
+        SELECT page_id FROM fts_pending WHERE id > :after ORDER BY id LIMIT :limit
+    )
+""")
+
+# Для каждой страницы важна только первая запись: было ли что удалять из индекса
+_FIRST_CHANGES_SQL = text("""
+    SELECT page_id, indexed, old_text FROM fts_pending
+    WHERE id IN (
+        SELECT MIN(id) FROM fts_pending WHERE page_id IN :page_ids GROUP BY page_id
+    )
+""").bindparams(bindparam("page_ids", expanding=True))
+
+_CURRENT_TEXT_SQL = text(
+    "SELECT id, text_content FROM document_pages WHERE id IN :page_ids"
+).bindparams(bindparam("page_ids", expanding=True)).columns(text_content=CompressedText)
+
+
+def _index_pending(db: Session, limit: int, after: int = 0) -> int:
     """
-    Добавить документ в FTS индекс
-    
+    Отразить в documents_fts изменения пачки страниц из очереди
+
+    Все записи очереди по выбранным страницам разбираются вместе: из
+    индекса удаляется то, что в нем было до первого изменения, и
+    добавляется текущий текст страницы, если она есть.
+
     Args:
-        document_id: ID документа
-        filename: Имя файла
-        text_content: Текст для индексации
+        after: Брать только записи очереди с большим id
+
+    Returns:
+        Сколько страниц обработано
+    """
+    page_ids = db.execute(_PENDING_PAGES_SQL, {"after": after, "limit": limit}).scalars().all()
+    if not page_ids:
+        return 0
+    params = {"page_ids": page_ids}
+    current = dict(db.execute(_CURRENT_TEXT_SQL, params).all())
+
+    deletes = []
+    inserts = []
+    for page_id, indexed, old_text in db.execute(_FIRST_CHANGES_SQL, params):
+        old = decompress_text(old_text) if indexed else None
+        if indexed and page_id in current and current[page_id] == old:
+            continue  # Текст не изменился (например, пересжатие)
+        if indexed:
+            deletes.append({"rowid": page_id, "text": old})
+        if page_id in current:
+            inserts.append({"rowid": page_id, "text": current[page_id]})
+
+    if deletes:
+        db.execute(text(
+            "INSERT INTO documents_fts(documents_fts, rowid, text_content) "
+            "VALUES ('delete', :rowid, :text)"
+        ), deletes)
+    if inserts:
+        db.execute(text(
+            "INSERT INTO documents_fts(rowid, text_content) VALUES (:rowid, :text)"
+        ), inserts)
+    db.execute(
+        text("DELETE FROM fts_pending WHERE page_id IN :page_ids")
+        .bindparams(bindparam("page_ids", expanding=True)),
+        params
+    )
+    return len(page_ids)
+
+
+def index_recent_changes(db: Session):
     """
+    Перед фиксацией писателя: проиндексировать изменения после запуска
+
+    Записи пачки видны поиску сразу после фиксации, в том числе во время
+    начальной индексации, которая в пачки писателя не попадает.
+    """
+    _index_pending(db, settings.FTS_INDEX_BATCH_SIZE, after=_pending_floor)
+
+
+def _add_missing_pages(db: Session, limit: int) -> int:
+    """Создать страницы документам, сохраненным без них (текст из PDF)"""
+    rows = db.execute(text("""
+        SELECT d.id, d.text_content, d.confidence_score
+        FROM documents d
+        WHERE NOT EXISTS (SELECT 1 FROM document_pages p WHERE p.document_id = d.id)
+        ORDER BY d.id
+        LIMIT :limit
+    """).columns(text_content=CompressedText), {"limit": limit}).all()
+    pages = [
+        {
+            "document_id": document_id,
+            "page_number": number,
+            "text_content": page_text,
+            "confidence_score": confidence,
+        }
+        for document_id, text_content, confidence in rows
+        for number, page_text in enumerate((text_content or "").split("\f"), start=1)
+    ]
+    if pages:
+        db.execute(insert(DocumentPage.__table__), pages)
+    return len(rows)
+
+
+def _has_pending() -> bool:
     db = SessionLocal()
     try:
-        db.execute(text("""
-            INSERT INTO documents_fts(document_id, filename, text_content)
-            VALUES(:doc_id, :fname, :text)
-        """), {
-            "doc_id": document_id,
-            "fname": filename,
-            "text": text_content or ""
-        })
-        db.commit()
-        logger.info(f"Indexed document {document_id} in FTS")
-    except Exception as e:
-        logger.error(f"Failed to index document {document_id}: {e}")
-        db.rollback()
+        return db.execute(text("SELECT EXISTS (SELECT 1 FROM fts_pending)")).scalar() == 1
     finally:
         db.close()
 
 
+def _drop_legacy(db: Session):
+    db.execute(text(f"DROP TABLE IF EXISTS {_LEGACY_TABLE}"))
+
+
+class FtsIndexer:
+    """
+    Разбор очереди fts_pending в фоне
+
+    При запуске индексирует все, что накопилось (после перехода на
+    внешнее содержимое - все страницы; продолжается после перезапуска),
+    и удаляет прежний индекс. Дальше раз в FTS_INDEX_INTERVAL_SECONDS
+    подбирает изменения, записанные мимо писателя БД.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, interval: Optional[float] = None):
+        self.batch_size = batch_size or settings.FTS_INDEX_BATCH_SIZE
+        self.interval = settings.FTS_INDEX_INTERVAL_SECONDS if interval is None else interval
+        self.last_result: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def drain(self) -> int:
+        """Проиндексировать всю очередь; возвращает число страниц"""
+        writer = get_db_writer()
+        indexed = 0
+        while True:
+            count = await writer.execute(_index_pending, self.batch_size)
+            indexed += count
+            if count < self.batch_size:
+                return indexed
+            logger.debug(f"FTS indexer: {indexed} page(s) indexed so far")
+
+    async def run(self) -> Dict:
+        """Начальная индексация (после перехода - с созданием страниц)"""
+        global _legacy_search
+        writer = get_db_writer()
+        created = 0
+        while True:
+            count = await writer.execute(_add_missing_pages, self.batch_size)
+            created += count
+            if count < self.batch_size:
+                break
+
+        indexed = await self.drain()
+        if _legacy_search is not None:
+            await writer.execute(_drop_legacy)
+            _legacy_search = None
+        self.last_result = {"pages_created_for": created, "pages_indexed": indexed}
+        logger.info(f"FTS index is up to date: {self.last_result}")
+        return self.last_result
+
+    async def _run(self):
+        try:
+            await self.run()
+        except Exception as e:
+            logger.exception(f"FTS indexing failed, will resume on restart: {e}")
+            return
+        while self.interval:
+            await asyncio.sleep(self.interval)
+            try:
+                if await asyncio.to_thread(_has_pending):
+                    await self.drain()
+            except Exception as e:
+                logger.exception(f"FTS indexing failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+_indexer: Optional[FtsIndexer] = None
+
+
+def get_fts_indexer() -> FtsIndexer:
+    global _indexer
+    if _indexer is None:
+        _indexer = FtsIndexer()
+    return _indexer
+
+
+# ==================== Поиск ====================
+
+# Лучшая по рангу страница каждого документа (snippet() нельзя вызвать
+# из подзапроса, поэтому отбор идет по rowid)
+_SEARCH_SQL = text("""
+    SELECT
+        p.document_id,
+        f.filename,
+        snippet(documents_fts, 0, '<mark>', '</mark>', '...', 32) as snippet,
+        p.page_number
+    FROM documents_fts
+    JOIN document_pages p ON p.id = documents_fts.rowid
+    JOIN documents d ON d.id = p.document_id
+    JOIN files f ON f.id = d.file_id
+    WHERE documents_fts MATCH :query
+      AND documents_fts.rowid IN (
+        SELECT id FROM (
+            SELECT
+                documents_fts.rowid AS id,
+                ROW_NUMBER() OVER (PARTITION BY pages.document_id ORDER BY documents_fts.rank) AS page_rank
+            FROM documents_fts
+            JOIN document_pages pages ON pages.id = documents_fts.rowid
+            WHERE documents_fts MATCH :query
+        )
+        WHERE page_rank = 1
+      )
+    ORDER BY documents_fts.rank
+    LIMIT :limit
+""")
+
+# Совпадения по имени файла (сниппет - подсвеченное имя)
+_SEARCH_FILES_SQL = text("""
+    SELECT
+        d.id,
+        f.filename,
+        highlight(files_fts, 0, '<mark>', '</mark>') as snippet,
+        1
+    FROM files_fts
+    JOIN files f ON f.id = files_fts.rowid
+    JOIN documents d ON d.file_id = f.id
+    WHERE files_fts MATCH :query
+    ORDER BY files_fts.rank
+    LIMIT :limit
+""")
+
+# Прежний индекс на время заполнения нового: строка на страницу
+_SEARCH_LEGACY_PAGES_SQL = text(f"""
+    SELECT
+        document_id,
+        filename,
+        snippet({_LEGACY_TABLE}, 3, '<mark>', '</mark>', '...', 32) as snippet,
+        page_number
+    FROM {_LEGACY_TABLE}
+    WHERE {_LEGACY_TABLE} MATCH :query
+      AND document_id IN (SELECT id FROM documents)
+      AND rowid IN (
+        SELECT rowid FROM (
+            SELECT
+                rowid,
+                ROW_NUMBER() OVER (PARTITION BY document_id ORDER BY rank) AS page_rank
+            FROM {_LEGACY_TABLE}
+            WHERE {_LEGACY_TABLE} MATCH :query
+        )
+        WHERE page_rank = 1
+      )
+    ORDER BY rank
+    LIMIT :limit
+""")
+
+
+# ... и строка на документ (номера страницы в нем нет)
+_SEARCH_LEGACY_DOCUMENTS_SQL = text(f"""
+    SELECT
+        document_id,
+        filename,
+        snippet({_LEGACY_TABLE}, 2, '<mark>', '</mark>', '...', 32) as snippet,
+        NULL
+    FROM {_LEGACY_TABLE}
+    WHERE {_LEGACY_TABLE} MATCH :query
+      AND document_id IN (SELECT id FROM documents)
+    ORDER BY rank
+    LIMIT :limit
+""")
+
+
+def _search_statements() -> List:
+    """Запросы по порядку приоритета: текст страниц, прежний индекс, имена файлов"""
+    statements = [_SEARCH_SQL]
+    legacy = _legacy_search
+    if legacy is not None:
+        statements.append(legacy)
+    statements.append(_SEARCH_FILES_SQL)
+    return statements
+
+
+def _search_results(row_sets, limit: int) -> List[Dict]:
+    """Объединить результаты запросов: документ - один раз, по первому совпадению"""
+    results = []
+    seen = set()
+    for rows in row_sets:
+        for row in rows:
+            if row[0] in seen:
+                continue
+            seen.add(row[0])
+            results.append({
+                "document_id": row[0],
+                "filename": row[1],
+                "snippet": row[2],
+                "page_number": row[3]
+            })
+            if len(results) >= limit:
+                return results
+    return results
+
+
 def search(query: str, limit: int = 10) -> List[Dict]:
     """
-    Поиск документов по тексту
-    
+    Поиск документов по тексту и именам файлов
+
     Args:
         query: Поисковый запрос
         limit: Максимальное количество результатов
-        
+
     Returns:
         Список документов с сниппетами
     """
     db = SessionLocal()
     try:
-        results = db.execute(text("""
-            SELECT 
-                document_id,
-                filename,
-                snippet(documents_fts, 2, '<mark>', '</mark>', '...', 32) AS snippet
-            FROM documents_fts
-            WHERE documents_fts MATCH :query
-            ORDER BY rank
-            LIMIT :limit
-        """), {
-            "query": query,
-            "limit": limit
-        }).fetchall()
-        
-        return [
-            {
-                "document_id": row[0],
-                "filename": row[1],
-                "snippet": row[2]
-            }
-            for row in results
-        ]
-    
+        params = {"query": query, "limit": limit}
+        row_sets = [db.execute(statement, params).fetchall() for statement in _search_statements()]
+        return _search_results(row_sets, limit)
+
     except Exception as e:
         logger.error(f"Search failed: {e}")
         return []
-    
+
     finally:
         db.close()
 
 
-def delete_from_index(document_id: int):
-    """Удалить документ из FTS индекса"""
-    db = SessionLocal()
+async def search_async(db: AsyncSession, query: str, limit: int = 10) -> List[Dict]:
+    """Поиск документов без блокировки event loop (см. search)"""
     try:
-        db.execute(text("""
-            DELETE FROM documents_fts
-            WHERE document_id = :doc_id
-        """), {"doc_id": document_id})
-        db.commit()
-        logger.info(f"Deleted document {document_id} from FTS index")
+        params = {"query": query, "limit": limit}
+        row_sets = [
+            (await db.execute(statement, params)).fetchall()
+            for statement in _search_statements()
+        ]
+        return _search_results(row_sets, limit)
     except Exception as e:
-        logger.error(f"Failed to delete from FTS: {e}")
-        db.rollback()
-    finally:
-        db.close()
-        
\ No newline at end of file
+        logger.error(f"Search failed: {e}")
+        return []
@@ -0,0 +1,192 @@
+"""
+Прозрачное сжатие больших текстовых колонок
+
+Текст страниц хранится и в documents, и в document_pages, и в FTS;
+у многостраничных документов это мегабайты. Значения не короче
+TEXT_COMPRESSION_MIN_BYTES сжимаются и хранятся BLOB с заголовком
+
+    "<2sBII": b"CT", кодек, ID словаря zstd (0 - без словаря), размер UTF-8
+
+короткие и плохо сжимаемые остаются обычным TEXT. По классу хранения
+SQLite (TEXT или BLOB) значения различаются при чтении, поэтому
+существующие строки читаются без миграции, а сжимаются при перезаписи.
+
+zstd (пакет zstandard) может использовать словарь, обученный на
+собственном корпусе: он заметно лучше сжимает короткие страницы.
+Словари лежат рядом с БД (TEXT_DICTIONARIES_FOLDER) и не удаляются:
+без словаря значения, сжатые с ним, не прочитать.
+"""
+import logging
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+from app.core.config import settings
+
+try:
+    import zstandard
+except ImportError:  # zstd необязателен, zlib есть всегда
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"CT"
+HEADER = struct.Struct("<2sBII")
+
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODECS = {"zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+# Сжатое значение должно быть хотя бы на 10% меньше исходного
+_MIN_RATIO = 0.9
+
+
+def raw_size(header: bytes) -> Optional[int]:
+    """Размер исходного текста по заголовку сжатого значения (None - не сжато)"""
+    if len(header) < HEADER.size or header[:2] != _MAGIC:
+        return None
+    return HEADER.unpack_from(header)[3]
+
+
+class TextCompressor:
+    """Сжатие и распаковка значений текстовых колонок"""
+
+    def __init__(
+        self,
+        codec: Optional[str] = None,
+        min_bytes: Optional[int] = None,
+        level: Optional[int] = None,
+        dictionaries_dir: Optional[Path] = None,
+    ):
+        codec = codec or settings.TEXT_COMPRESSION
+        if codec == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, compressing text with zlib")
+            codec = "zlib"
+        self.codec = codec
+        self.min_bytes = settings.TEXT_COMPRESSION_MIN_BYTES if min_bytes is None else min_bytes
+        self.level = settings.TEXT_COMPRESSION_LEVEL if level is None else level
+        self.dictionaries_dir = Path(dictionaries_dir or settings.TEXT_DICTIONARIES_FOLDER)
+        self._dictionaries: Dict[int, "zstandard.ZstdCompressionDict"] = {}
+        self._current: Optional[int] = None
+        self._lock = threading.Lock()
+        self._load_current()
+
+    @property
+    def current_dictionary(self) -> Optional[int]:
+        """ID словаря, с которым сжимаются новые значения (только zstd)"""
+        return self._current if self.codec == "zstd" else None
+
+    # ==================== Словари zstd ====================
+
+    def _path(self, dict_id: int) -> Path:
+        return self.dictionaries_dir / f"{dict_id}.zdict"
+
+    def _load_current(self):
+        """Текущий словарь - последний обученный"""
+        if zstandard is None or not self.dictionaries_dir.exists():
+            return
+        paths = sorted(self.dictionaries_dir.glob("*.zdict"), key=lambda p: p.stat().st_mtime)
+        if paths:
+            self._current = int(paths[-1].stem)
+
+    def _dictionary(self, dict_id: int) -> "zstandard.ZstdCompressionDict":
+        dictionary = self._dictionaries.get(dict_id)
+        if dictionary is None:
+            with self._lock:
+                dictionary = self._dictionaries.get(dict_id)
+                if dictionary is None:
+                    dictionary = zstandard.ZstdCompressionDict(self._path(dict_id).read_bytes())
+                    self._dictionaries[dict_id] = dictionary
+        return dictionary
+
+    def train_dictionary(self, samples: Iterable[str], size: Optional[int] = None) -> Dict:
+        """
+        Обучить словарь zstd на образцах текста и сделать его текущим
+
+        Ранее сжатые значения остаются со своим словарем; новые
+        значения сжимаются с новым.
+        """
+        if zstandard is None:
+            raise RuntimeError("Dictionary training requires the zstandard package")
+        data = [s.encode("utf-8") for s in samples if s]
+        if not data:
+            raise ValueError("No text samples to train a dictionary on")
+        size = size or settings.TEXT_DICTIONARY_SIZE_KB * 1024
+        try:
+            dictionary = zstandard.train_dictionary(size, data)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Dictionary training failed on {len(data)} samples: {e}")
+        dict_id = dictionary.dict_id()
+
+        self.dictionaries_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(dict_id)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(dictionary.as_bytes())
+        tmp.replace(path)
+
+        with self._lock:
+            self._dictionaries[dict_id] = dictionary
+            self._current = dict_id
+        logger.info(f"Trained zstd dictionary {dict_id} ({len(dictionary)} bytes) on {len(data)} samples")
+        return {"dict_id": dict_id, "size": len(dictionary), "samples": len(data)}
+
+    # ==================== Значения ====================
+
+    def compress(self, value: str) -> Union[str, bytes]:
+        """Сжать значение, если оно достаточно длинное и сжимается"""
+        if self.codec not in CODECS:
+            return value
+        data = value.encode("utf-8")
+        if len(data) < self.min_bytes:
+            return value
+
+        dict_id = 0
+        if self.codec == "zstd":
+            level = self.level or 3
+            if self._current is not None:
+                dict_id = self._current
+                compressor = zstandard.ZstdCompressor(level=level, dict_data=self._dictionary(dict_id))
+            else:
+                compressor = zstandard.ZstdCompressor(level=level)
+            packed = compressor.compress(data)
+        else:
+            packed = zlib.compress(data, self.level or 6)
+
+        if len(packed) + HEADER.size >= len(data) * _MIN_RATIO:
+            return value
+        return HEADER.pack(_MAGIC, CODECS[self.codec], dict_id, len(data)) + packed
+
+    def decompress(self, value: Union[str, bytes]) -> str:
+        """Распаковать значение (обычный текст возвращается как есть)"""
+        if isinstance(value, str):
+            return value
+        magic, codec, dict_id, size = HEADER.unpack_from(value)
+        if magic != _MAGIC:
+            raise ValueError("Not a compressed text value")
+        body = memoryview(value)[HEADER.size:]
+        if codec == CODEC_ZLIB:
+            data = zlib.decompress(body)
+        elif codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise RuntimeError("Text is compressed with zstd, install the zstandard package")
+            if dict_id:
+                decompressor = zstandard.ZstdDecompressor(dict_data=self._dictionary(dict_id))
+            else:
+                decompressor = zstandard.ZstdDecompressor()
+            data = decompressor.decompress(body, max_output_size=size)
+        else:
+            raise ValueError(f"Unknown text codec {codec}")
+        return data.decode("utf-8")
+
+
+# Глобальный экземпляр (ленивая инициализация)
+_compressor: Optional[TextCompressor] = None
+
+
+def get_text_compressor() -> TextCompressor:
+    global _compressor
+    if _compressor is None:
+        _compressor = TextCompressor()
+    return _compressor
@@ -0,0 +1,171 @@
+"""
+Потоковый прием загружаемых файлов
+
+Тело запроса читается один раз: каждый блок сразу пишется на диск и
+добавляется в SHA-256, по первым байтам проверяется формат, лимит
+размера контролируется по ходу чтения. Повторно файл не читается ни
+для хэша, ни для проверки формата.
+"""
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+from app.core.config import settings
+from app.core.exceptions import (
+    DuplicateFileError,
+    FileFormatError,
+    FileHashError,
+    FileSizeError,
+)
+from app.db.session import SessionLocal
+from app.services.content_store import get_content_store
+from app.models.file import File as FileModel
+
+logger = logging.getLogger(__name__)
+
+# Сигнатуры поддерживаемых форматов: расширение -> допустимые префиксы
+MAGIC_BYTES = {
+    "pdf": (b"%PDF-",),
+    "png": (b"\x89PNG\r\n\x1a\n",),
+    "jpg": (b"\xff\xd8\xff",),
+    "jpeg": (b"\xff\xd8\xff",),
+    "tiff": (b"II*\x00", b"MM\x00*"),
+    "bmp": (b"BM",),
+}
+SNIFF_BYTES = 16
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+    """Определить формат по первым байтам (None - неизвестный)"""
+    for fmt, signatures in MAGIC_BYTES.items():
+        if head.startswith(signatures):
+            return fmt
+    return None
+
+
+def _check_format(head: bytes, ext: str, filename: str) -> str:
+    """Сигнатура должна соответствовать расширению"""
+    sniffed = sniff_format(head)
+    if sniffed is None or MAGIC_BYTES[sniffed] != MAGIC_BYTES.get(ext):
+        raise FileFormatError(filename, sniffed or "unknown")
+    return sniffed
+
+
+async def iter_upload(file) -> AsyncIterator[bytes]:
+    """Читать UploadFile блоками UPLOAD_CHUNK_SIZE"""
+    while True:
+        chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+def find_by_hash(file_hash: str) -> Optional[int]:
+    """ID файла с таким хэшем или None"""
+    db = SessionLocal()
+    try:
+        row = db.query(FileModel.id).filter(FileModel.file_hash == file_hash).first()
+        return row[0] if row else None
+    finally:
+        db.close()
+
+
+async def store_upload(
+    chunks: AsyncIterator[bytes],
+    filename: str,
+    expected_hash: Optional[str] = None,
+) -> Dict:
+    """
+    Принять поток байт, сохранить файл в хранилище оригиналов
+
+    Args:
+        chunks: Асинхронный поток блоков тела запроса
+        filename: Исходное имя файла
+        expected_hash: SHA-256 от клиента (если есть, дубликат отклоняется
+            до чтения тела, а после чтения хэш сверяется)
+
+    Returns:
+        Метаданные файла в формате ingestion.probe_file
+
+    Raises:
+        DuplicateFileError: Файл уже зарегистрирован
+        FileFormatError: Формат не поддерживается или не совпадает с расширением
+        FileSizeError: Превышен MAX_FILE_SIZE_MB
+        FileHashError: Хэш не совпал с переданным клиентом
+    """
+    filename = Path(filename).name
+    ext = Path(filename).suffix.lower().lstrip(".")
+    if ext not in settings.SUPPORTED_FORMATS:
+        raise FileFormatError(filename, ext)
+
+    if expected_hash:
+        expected_hash = expected_hash.lower()
+        existing = await asyncio.to_thread(find_by_hash, expected_hash)
+        if existing is not None:
+            raise DuplicateFileError(filename, expected_hash, existing)
+
+    max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    store = get_content_store()
+    temp_path = store.temp_path()
+
+    hasher = hashlib.sha256()
+    size = 0
+    head = b""
+    sniffed = None
+
+    def _write(out, chunk: bytes):
+        out.write(chunk)
+        hasher.update(chunk)
+
+    try:
+        with open(temp_path, "wb") as out:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > max_bytes:
+                    raise FileSizeError(filename, round(size / 1024 / 1024, 1), settings.MAX_FILE_SIZE_MB)
+
+                if sniffed is None:
+                    head += chunk[:SNIFF_BYTES]
+                    if len(head) >= SNIFF_BYTES:
+                        sniffed = _check_format(head, ext, filename)
+
+                await asyncio.to_thread(_write, out, chunk)
+
+        if sniffed is None:
+            # Файл короче SNIFF_BYTES
+            sniffed = _check_format(head, ext, filename)
+
+        file_hash = hasher.hexdigest()
+        if expected_hash and file_hash != expected_hash:
+            raise FileHashError(filename, f"checksum mismatch: expected {expected_hash}, got {file_hash}")
+
+        existing = await asyncio.to_thread(find_by_hash, file_hash)
+        if existing is not None:
+            raise DuplicateFileError(filename, file_hash, existing)
+
+        final_path = store.object_path(file_hash, Path(filename).suffix)
+        final_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, final_path)
+
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+    stat = os.stat(final_path)
+    logger.info(f"File uploaded: {final_path} ({size} bytes)")
+    return {
+        "filepath": str(final_path),
+        "filename": filename,
+        "file_size": size,
+        "mtime_ns": stat.st_mtime_ns,
+        "inode": stat.st_ino,
+        "mime_type": mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        "file_hash": file_hash,
+        "duplicate_of": None,
+    }
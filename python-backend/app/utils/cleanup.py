@@ -4,12 +4,18 @@
 import logging
 from pathlib import Path
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from typing import Dict, List
+from sqlalchemy import func, text, update
+from sqlalchemy.exc import OperationalError
 
 from app.core.config import settings
 from app.db.session import SessionLocal
+from app.db.writer import get_db_writer
 from app.models.file import File as FileModel
 from app.models.document import Document
+from app.models.document_page import DocumentPage
+from app.services.content_store import get_content_store
+from app.services.text_compression import HEADER, get_text_compressor, raw_size
 
 logger = logging.getLogger(__name__)
 
@@ -77,7 +83,7 @@ def vacuum_database() -> dict:
         size_before = db_path.stat().st_size
         
         # VACUUM
-        db.execute("VACUUM")
+        db.execute(text("VACUUM"))
         db.commit()
         
         # Размер после
@@ -98,33 +104,68 @@ def vacuum_database() -> dict:
 
 def cleanup_orphaned_files() -> dict:
     """
-    Удалить файлы без записей в БД
+    Удалить объекты хранилища без записей в БД
+
+    Имя объекта - его хэш, поэтому сироты находятся разностью множеств
+    хэшей на диске и в БД, без запроса на каждый файл. Папка наблюдения
+    не трогается: там файлы пользователя.
     """
-    watch_folder = settings.WATCH_FOLDER
-    processed_folder = settings.PROCESSED_FOLDER
-    
+    store = get_content_store()
     db = SessionLocal()
     
     try:
-        # Получить все пути из БД
-        db_paths = {f.filepath for f in db.query(FileModel.filepath).all()}
-        
-        deleted_count = 0
-        
-        # Проверить watch folder
-        for file_path in watch_folder.glob("*"):
-            if file_path.is_file() and str(file_path) not in db_paths:
-                try:
-                    file_path.unlink()
-                    deleted_count += 1
-                    logger.info(f"Deleted orphaned file: {file_path}")
-                except Exception as e:
-                    logger.error(f"Failed to delete {file_path}: {e}")
-        
-        return {"deleted_orphaned": deleted_count}
-        
+        known_hashes = {row[0] for row in db.query(FileModel.file_hash)}
     finally:
         db.close()
+    
+    deleted_count = store.remove(list(store.orphans(known_hashes)))
+    stale_uploads = store.remove(list(store.stale_incoming()))
+    
+    result = {"deleted_orphaned": deleted_count, "deleted_incomplete_uploads": stale_uploads}
+    logger.info(f"Orphan cleanup completed: {result}")
+    return result
+
+
+# Колонки с текстом страниц: (таблица, колонка)
+TEXT_COLUMNS = [("documents", "text_content"), ("document_pages", "text_content")]
+
+
+def _text_column_stats(db, table: str, column: str) -> Dict:
+    """Сколько занимает колонка и сколько занимал бы несжатый текст"""
+    rows = db.execute(text(f"""
+        SELECT length(CAST({column} AS BLOB)),
+               CASE WHEN typeof({column}) = 'blob' THEN substr({column}, 1, {HEADER.size}) END
+        FROM {table} WHERE {column} IS NOT NULL
+    """))
+    count = compressed = stored = raw = 0
+    for size, header in rows:
+        count += 1
+        stored += size
+        original = raw_size(header) if header is not None else None
+        if original is None:
+            raw += size
+        else:
+            compressed += 1
+            raw += original
+    return {
+        "rows": count,
+        "compressed_rows": compressed,
+        "stored_mb": round(stored / (1024**2), 2),
+        "uncompressed_mb": round(raw / (1024**2), 2),
+        "saved_mb": round((raw - stored) / (1024**2), 2),
+        "ratio": round(stored / raw, 3) if raw else None,
+    }
+
+
+def _table_sizes(db) -> Dict[str, float]:
+    """Место на диске по таблицам и индексам (если SQLite собран с dbstat)"""
+    try:
+        rows = db.execute(text(
+            "SELECT name, SUM(pgsize) FROM dbstat GROUP BY name ORDER BY 2 DESC"
+        )).fetchall()
+    except OperationalError:
+        return {}
+    return {name: round(size / (1024**2), 2) for name, size in rows}
 
 
 def get_storage_stats() -> dict:
@@ -136,6 +177,7 @@ def get_storage_stats() -> dict:
         total_size = db.query(func.sum(FileModel.file_size)).scalar() or 0
         
         db_size = settings.DATABASE_PATH.stat().st_size if settings.DATABASE_PATH.exists() else 0
+        compressor = get_text_compressor()
         
         return {
             "files": {
@@ -144,15 +186,78 @@ def get_storage_stats() -> dict:
             },
             "database": {
                 "size_mb": round(db_size / (1024**2), 2),
-                "path": str(settings.DATABASE_PATH)
+                "path": str(settings.DATABASE_PATH),
+                "tables_mb": _table_sizes(db)
+            },
+            "text": {
+                "compression": compressor.codec,
+                "min_bytes": compressor.min_bytes,
+                "dictionary": compressor.current_dictionary,
+                "columns": {
+                    f"{table}.{column}": _text_column_stats(db, table, column)
+                    for table, column in TEXT_COLUMNS
+                }
             },
             "folders": {
                 "watch": str(settings.WATCH_FOLDER),
                 "processed": str(settings.PROCESSED_FOLDER),
+                "store": str(settings.STORE_FOLDER),
                 "cache": str(settings.CACHE_DIR)
             }
         }
         
     finally:
         db.close()
-        
\ No newline at end of file
+
+
+def train_text_dictionary(samples: int = 2000) -> dict:
+    """Обучить словарь zstd на случайных страницах"""
+    db = SessionLocal()
+    try:
+        texts = [
+            row[0] for row in db.query(DocumentPage.text_content)
+            .filter(DocumentPage.text_content.isnot(None))
+            .order_by(func.random())
+            .limit(samples)
+        ]
+    finally:
+        db.close()
+    return get_text_compressor().train_dictionary(texts)
+
+
+def _rewrite_pages(db, pages: List[Dict]):
+    # Значение проходит через CompressedText заново: сжимается текущим кодеком
+    db.execute(update(DocumentPage), pages)
+
+
+def recompress_text(batch_size: int = 500) -> dict:
+    """
+    Пересохранить текст страниц текущим кодеком и словарем
+
+    Страницы читаются пачками по id и перезаписываются через писателя БД,
+    поэтому обработка OCR не ждет одну длинную транзакцию.
+    """
+    writer = get_db_writer()
+    last_id = 0
+    rewritten = 0
+    while True:
+        db = SessionLocal()
+        try:
+            batch = [
+                {"id": page_id, "text_content": text_content}
+                for page_id, text_content in db.query(DocumentPage.id, DocumentPage.text_content)
+                .filter(DocumentPage.id > last_id, DocumentPage.text_content.isnot(None))
+                .order_by(DocumentPage.id)
+                .limit(batch_size)
+            ]
+        finally:
+            db.close()
+        if not batch:
+            break
+        writer.execute_sync(_rewrite_pages, batch)
+        rewritten += len(batch)
+        last_id = batch[-1]["id"]
+    
+    result = {"rewritten": rewritten, "codec": get_text_compressor().codec}
+    logger.info(f"Page text recompressed: {result}")
+    return result
@@ -2,20 +2,64 @@
 Утилиты для хэширования файлов
 """
 import hashlib
+import mmap
+import os
+
+# Буфер для потокового чтения (8 КБ давали ~десятки тысяч системных вызовов на файл)
+READ_BUFFER_SIZE = 1024 * 1024
+
+# Сколько байт с начала и с конца файла берет частичный хэш
+PARTIAL_HASH_CHUNK = 64 * 1024
 
 
 def hash_file(filepath: str) -> str:
     """
     Вычислить SHA256 хэш файла
-    
+
+    Использует hashlib.file_digest (Python 3.11+), иначе mmap для
+    больших файлов и чтение крупными блоками для остальных.
+    hashlib отпускает GIL на больших буферах, поэтому функцию
+    выгодно вызывать из пула потоков.
+
     Args:
         filepath: Путь к файлу
-        
+
     Returns:
         Хэш в hex формате
     """
-    h = hashlib.sha256()
+    with open(filepath, "rb", buffering=0) as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+        h = hashlib.sha256()
+        size = os.fstat(f.fileno()).st_size
+        if size >= READ_BUFFER_SIZE:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                h.update(mapped)
+        else:
+            buffer = bytearray(READ_BUFFER_SIZE)
+            view = memoryview(buffer)
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                h.update(view[:n])
+    return h.hexdigest()
+
+
+def partial_hash(filepath: str, size: int) -> str:
+    """
+    Быстрый хэш размера, начала и конца файла
+
+    Разные частичные хэши гарантируют разное содержимое, совпадение -
+    только повод посчитать полный хэш.
+    """
+    h = hashlib.sha256(str(size).encode())
     with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
+        h.update(f.read(PARTIAL_HASH_CHUNK))
+        if size > 2 * PARTIAL_HASH_CHUNK:
+            f.seek(-PARTIAL_HASH_CHUNK, os.SEEK_END)
+            h.update(f.read(PARTIAL_HASH_CHUNK))
+        elif size > PARTIAL_HASH_CHUNK:
+            h.update(f.read())
     return h.hexdigest()
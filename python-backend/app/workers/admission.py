@@ -0,0 +1,164 @@
+"""
+Контроль допуска OCR задач по бюджету памяти
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional, Tuple
+
+import psutil
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Байт на пиксель во время инференса (нормализованные float32 тензоры,
+# карты детекции и промежуточные буферы модели)
+ENGINE_BYTES_PER_PIXEL: Dict[str, float] = {
+    "paddleocr": 14.0,
+    "easyocr": 20.0,
+}
+DEFAULT_BYTES_PER_PIXEL = 20.0
+
+# Растр RGB + копия при конвертации в numpy
+RASTER_BYTES_PER_PIXEL = 3 * 2
+
+# Постоянные накладные расходы на одну страницу
+PAGE_OVERHEAD_BYTES = 32 * 1024 * 1024
+
+
+def estimate_page_memory(width_pt: float, height_pt: float, dpi: int, engine: str) -> int:
+    """
+    Оценить пиковое потребление памяти при обработке страницы
+
+    Args:
+        width_pt: Ширина страницы в пунктах
+        height_pt: Высота страницы в пунктах
+        dpi: Разрешение рендеринга
+        engine: OCR движок
+
+    Returns:
+        Оценка в байтах
+    """
+    scale = dpi / 72
+    pixels = (width_pt * scale) * (height_pt * scale)
+    per_pixel = RASTER_BYTES_PER_PIXEL + ENGINE_BYTES_PER_PIXEL.get(engine, DEFAULT_BYTES_PER_PIXEL)
+    return int(pixels * per_pixel) + PAGE_OVERHEAD_BYTES
+
+
+class MemoryAdmissionController:
+    """
+    Допуск страниц к обработке, пока суммарная оценка памяти в бюджете
+
+    Ожидающие обслуживаются строго по очереди, чтобы крупные страницы
+    не голодали за потоком мелких. Страница больше всего бюджета
+    допускается, только когда больше ничего не выполняется.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.in_use_bytes = 0
+        self.peak_bytes = 0
+        self.active = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+
+        # Метрики
+        self.admitted_total = 0
+        self.waited_total = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _fits(self, nbytes: int) -> bool:
+        return self.active == 0 or self.in_use_bytes + nbytes <= self.budget_bytes
+
+    def _admit(self, nbytes: int):
+        self.in_use_bytes += nbytes
+        self.active += 1
+        self.admitted_total += 1
+        self.peak_bytes = max(self.peak_bytes, self.in_use_bytes)
+
+    def _wake_waiters(self):
+        while self._waiters:
+            nbytes, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(nbytes):
+                break
+            self._waiters.popleft()
+            self._admit(nbytes)
+            future.set_result(None)
+
+    async def acquire(self, nbytes: int):
+        """Дождаться допуска для nbytes"""
+        if not self._waiters and self._fits(nbytes):
+            self._admit(nbytes)
+            return
+
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((nbytes, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Допуск уже выдан - вернуть его
+                self.release(nbytes)
+            raise
+        finally:
+            waited = time.monotonic() - started
+            self.waited_total += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def release(self, nbytes: int):
+        """Освободить ранее выданный допуск"""
+        self.in_use_bytes = max(0, self.in_use_bytes - nbytes)
+        self.active = max(0, self.active - 1)
+        self._wake_waiters()
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int):
+        """Контекстный менеджер: допуск на время обработки страницы"""
+        await self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            self.release(nbytes)
+
+    def metrics(self) -> Dict:
+        """Метрики использования бюджета и ожидания"""
+        mb = 1024 * 1024
+        return {
+            "budget_mb": round(self.budget_bytes / mb, 1),
+            "in_use_mb": round(self.in_use_bytes / mb, 1),
+            "peak_mb": round(self.peak_bytes / mb, 1),
+            "utilization": round(self.in_use_bytes / self.budget_bytes, 3) if self.budget_bytes else 0.0,
+            "active_pages": self.active,
+            "waiting_pages": sum(1 for _, f in self._waiters if not f.done()),
+            "admitted_total": self.admitted_total,
+            "waited_total": self.waited_total,
+            "wait_seconds_total": round(self.wait_seconds_total, 3),
+            "wait_seconds_avg": round(self.wait_seconds_total / self.waited_total, 3) if self.waited_total else 0.0,
+            "wait_seconds_max": round(self.wait_seconds_max, 3),
+        }
+
+
+# Глобальный экземпляр контроллера
+_admission_instance: Optional[MemoryAdmissionController] = None
+
+
+def get_admission_controller() -> MemoryAdmissionController:
+    """Получить контроллер допуска (singleton)"""
+    global _admission_instance
+    if _admission_instance is None:
+        if settings.OCR_MEMORY_BUDGET_MB:
+            budget = settings.OCR_MEMORY_BUDGET_MB * 1024 * 1024
+        else:
+            # По умолчанию - половина физической памяти
+            budget = psutil.virtual_memory().total // 2
+        _admission_instance = MemoryAdmissionController(budget)
+        logger.info(f"OCR memory budget: {budget / (1024 * 1024):.0f} MB")
+    return _admission_instance
@@ -0,0 +1,119 @@
+"""
+Автомасштабирование пула OCR воркеров по нагрузке рабочей станции
+"""
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+import psutil
+
+from app.core.config import settings
+from app.workers.queue_manager import QueueManager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolAutoscaler:
+    """
+    Периодически подбирает размер пула воркеров
+
+    Учитывается глубина очереди, загрузка CPU другими программами
+    (собственная нагрузка приложения вычитается) и свободная память.
+    Ночью, когда машина простаивает, пул растет до максимума; как только
+    пользователь начинает работать, пул сокращается до минимума.
+    Границы и включение читаются из settings на каждом шаге, поэтому
+    их можно менять через PATCH /settings без перезапуска.
+    """
+
+    def __init__(self, queue_manager: QueueManager):
+        self.queue_manager = queue_manager
+        self._task: Optional[asyncio.Task] = None
+        self._process = psutil.Process(os.getpid())
+        self._children: Dict[int, psutil.Process] = {}
+        self.last_decision: Dict = {}
+
+    def start(self):
+        """Запустить фоновый цикл"""
+        # Первый вызов cpu_percent только задает точку отсчета
+        psutil.cpu_percent(interval=None)
+        self._process.cpu_percent(interval=None)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановить фоновый цикл"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.sleep(settings.OCR_AUTOSCALE_INTERVAL_SECONDS)
+                if settings.OCR_AUTOSCALE_ENABLED:
+                    self.step()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.exception(f"Autoscaler step failed: {e}")
+
+    def _own_cpu_percent(self) -> float:
+        """Загрузка CPU процессом приложения и его дочерними процессами"""
+        total = self._process.cpu_percent(interval=None)
+
+        alive = set()
+        for child in self._process.children(recursive=True):
+            alive.add(child.pid)
+            proc = self._children.setdefault(child.pid, child)
+            try:
+                total += proc.cpu_percent(interval=None)
+            except psutil.Error:
+                pass
+
+        for pid in list(self._children):
+            if pid not in alive:
+                del self._children[pid]
+
+        # psutil считает процент от одного ядра, приводим к системному
+        return total / (psutil.cpu_count() or 1)
+
+    def step(self) -> int:
+        """Выполнить один шаг масштабирования, вернуть новый размер пула"""
+        min_workers = settings.OCR_AUTOSCALE_MIN_WORKERS
+        max_workers = max(min_workers, settings.OCR_AUTOSCALE_MAX_WORKERS)
+
+        stats = self.queue_manager.stats()
+        current = stats["workers"]
+        system_cpu = psutil.cpu_percent(interval=None)
+        foreign_cpu = max(0.0, system_cpu - self._own_cpu_percent())
+        free_mb = psutil.virtual_memory().available / (1024 * 1024)
+
+        target = current
+        if foreign_cpu > settings.OCR_AUTOSCALE_MAX_FOREIGN_CPU_PERCENT:
+            # Пользователь активно работает - уступаем ресурсы
+            target = current - 1
+        elif free_mb < settings.OCR_AUTOSCALE_MIN_FREE_MEMORY_MB:
+            target = current - 1
+        elif stats["pending"] > 0 and stats["busy"] >= current:
+            # Есть очередь и все воркеры заняты
+            target = current + 1
+        elif stats["pending"] == 0 and stats["busy"] < current:
+            target = max(stats["busy"], current - 1)
+
+        target = max(min_workers, min(max_workers, target))
+
+        self.last_decision = {
+            "workers": current,
+            "target": target,
+            "pending": stats["pending"],
+            "busy": stats["busy"],
+            "foreign_cpu_percent": round(foreign_cpu, 1),
+            "free_memory_mb": round(free_mb),
+        }
+
+        if target != current:
+            logger.info(f"Autoscaler: {self.last_decision}")
+            self.queue_manager.resize(target)
+
+        return target
@@ -0,0 +1,128 @@
+"""
+Состояние задач очереди и кооперативная отмена
+"""
+import time
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.core.exceptions import OCRCancelledError
+
+
+class JobState:
+    """Возможные состояния задачи"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    RETRY_WAIT = "retry_wait"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    TIMED_OUT = "timed_out"
+
+    FINISHED = (COMPLETED, FAILED, CANCELLED, TIMED_OUT)
+
+
+@dataclass
+class Job:
+    """Задача, отслеживаемая менеджером очереди"""
+    data: Any
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    state: str = JobState.QUEUED
+    lane: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    error_code: Optional[str] = None
+    attempts: int = 0
+    next_attempt_at: Optional[float] = None
+    cancel_requested: bool = False
+    group_id: Optional[str] = None
+
+    @property
+    def file_id(self) -> Optional[int]:
+        return self.data.get("file_id") if isinstance(self.data, dict) else None
+
+    def check_cancelled(self):
+        """Прервать обработку, если запрошена отмена"""
+        if self.cancel_requested:
+            raise OCRCancelledError(self.job_id)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "file_id": self.file_id,
+            "state": self.state,
+            "lane": self.lane,
+            "enqueued_at": self.enqueued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "error_code": self.error_code,
+            "attempts": self.attempts,
+            "next_attempt_at": self.next_attempt_at,
+            "cancel_requested": self.cancel_requested,
+            "group_id": self.group_id,
+        }
+
+
+@dataclass
+class Continuation:
+    """
+    Результат worker_func: задача выполнена частично
+
+    Задача возвращается в очередь с новыми данными, сохраняя ID, группу
+    и время первой постановки (отсчет старения).
+    """
+    data: Any
+
+
+@dataclass
+class JobGroup:
+    """
+    Группа задач, поставленных одним запросом (например, bulk reprocess)
+
+    Счетчики обновляются при завершении задач, поэтому прогресс группы
+    доступен и после того, как сами задачи вытеснены из истории.
+    """
+    total: int
+    group_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    job_ids: List[str] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def finished(self) -> int:
+        return sum(self.counts.values())
+
+    def record(self, state: str):
+        self.counts[state] = self.counts.get(state, 0) + 1
+        if self.finished >= self.total:
+            self.finished_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "group_id": self.group_id,
+            "total": self.total,
+            "finished": self.finished,
+            "pending": self.total - self.finished,
+            "completed": self.counts.get(JobState.COMPLETED, 0),
+            "failed": self.counts.get(JobState.FAILED, 0) + self.counts.get(JobState.TIMED_OUT, 0),
+            "cancelled": self.counts.get(JobState.CANCELLED, 0),
+            "progress": round(self.finished / self.total, 4) if self.total else 1.0,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# Задача, выполняемая в текущем asyncio контексте (устанавливает QueueManager)
+current_job: ContextVar[Optional[Job]] = ContextVar("current_job", default=None)
+
+
+def check_cancelled():
+    """Точка кооперативной отмены для кода, выполняемого воркером"""
+    job = current_job.get()
+    if job is not None:
+        job.check_cancelled()
@@ -0,0 +1,118 @@
+"""
+Изолированное выполнение OCR страниц в отдельных процессах
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+from app.core.exceptions import OCRTimeoutError, OCRResourceError
+from app.services.file_processor import FileProcessor
+from app.services.ocr import get_ocr_manager
+
+logger = logging.getLogger(__name__)
+
+
+def _ocr_page_in_process(filepath: str, page_index: int, engine: str, dpi: int, mode: str) -> Dict:
+    """Точка входа в дочернем процессе (движок загружается один раз на процесс)"""
+    return FileProcessor.ocr_page(filepath, page_index, get_ocr_manager(), engine, dpi, mode)
+
+
+class OCRProcessPool:
+    """
+    Пул однопроцессных исполнителей для OCR страниц
+
+    Каждый исполнитель - отдельный ProcessPoolExecutor на один процесс,
+    поэтому зависший на битой странице движок можно убить, не задевая
+    страницы, которые в это время распознаются другими воркерами.
+    """
+
+    def __init__(self, max_idle: int = 8):
+        self.max_idle = max_idle
+        self._idle: List[ProcessPoolExecutor] = []
+        self._context = multiprocessing.get_context("spawn")
+        self.killed_total = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=1, mp_context=self._context)
+
+    def _kill(self, executor: ProcessPoolExecutor):
+        """Принудительно завершить процесс исполнителя"""
+        # У ProcessPoolExecutor нет публичного API для kill процессов
+        processes = getattr(executor, "_processes", None) or {}
+        for process in list(processes.values()):
+            try:
+                process.kill()
+            except Exception as e:
+                logger.warning(f"Failed to kill OCR process {process.pid}: {e}")
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.killed_total += 1
+
+    def _release(self, executor: ProcessPoolExecutor):
+        if len(self._idle) < self.max_idle:
+            self._idle.append(executor)
+        else:
+            executor.shutdown(wait=False)
+
+    async def ocr_page(
+        self,
+        filepath: str,
+        page_index: int,
+        engine: str,
+        dpi: int,
+        mode: str = "printed",
+        timeout: Optional[float] = None,
+    ) -> Dict:
+        """
+        Распознать страницу в отдельном процессе
+
+        Raises:
+            OCRTimeoutError: Страница не уложилась в timeout (процесс убит)
+            OCRResourceError: Процесс OCR аварийно завершился
+        """
+        executor = self._idle.pop() if self._idle else self._new_executor()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            executor, _ocr_page_in_process, filepath, page_index, engine, dpi, mode
+        )
+
+        try:
+            result = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Page {page_index + 1} of {filepath} timed out after {timeout}s, killing OCR process")
+            self._kill(executor)
+            raise OCRTimeoutError(filepath, int(timeout))
+        except asyncio.CancelledError:
+            # Жесткая отмена задачи: не ждем окончания страницы
+            self._kill(executor)
+            raise
+        except BrokenProcessPool as e:
+            # Чаще всего процесс убит OOM killer'ом - ошибка временная
+            self._kill(executor)
+            raise OCRResourceError(f"OCR process crashed on page {page_index + 1} of {filepath}: {e}")
+        except Exception:
+            self._release(executor)
+            raise
+
+        self._release(executor)
+        return result
+
+    def shutdown(self):
+        """Завершить все простаивающие процессы"""
+        for executor in self._idle:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._idle.clear()
+
+
+# Глобальный экземпляр пула
+_pool_instance: Optional[OCRProcessPool] = None
+
+
+def get_ocr_process_pool() -> OCRProcessPool:
+    """Получить пул OCR процессов (singleton)"""
+    global _pool_instance
+    if _pool_instance is None:
+        _pool_instance = OCRProcessPool()
+    return _pool_instance
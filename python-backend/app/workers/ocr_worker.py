@@ -1,25 +1,267 @@
+import asyncio
 import logging
+import os
 import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 
 from app.db.session import SessionLocal
+from app.db.writer import get_db_writer
 from app.models.file import File as FileModel
+from app.models.document import Document
+from app.services.content_store import get_content_store
 from app.services.file_processor import FileProcessor
 from app.services.document_service import DocumentService
-from app.services.search_service import index_document
-from app.services.ocr import get_ocr_manager
+from app.services.dead_letter_service import DeadLetterService
+from app.services.ocr import get_ocr_manager, normalize_mode
+from app.workers.admission import get_admission_controller, estimate_page_memory
+from app.workers.jobs import (
+    Continuation, Job, JobGroup, JobState, current_job, check_cancelled
+)
+from app.workers.ocr_executor import get_ocr_process_pool
 from app.core.config import settings
-from app.api.v1.endpoints.ws import notify_processing_started, notify_processing_completed, notify_processing_failed
+from app.core.exceptions import (
+    AppException, FileNotFoundError, FileNotReadyError,
+    OCRCancelledError, OCRTimeoutError
+)
+from app.api.v1.endpoints.ws import (
+    notify_processing_started, notify_processing_completed, notify_page_completed,
+    notify_processing_failed, notify_processing_cancelled,
+    notify_processing_retry, notify_job_group_progress
+)
 
 logger = logging.getLogger(__name__)
 
 
+def _ensure_file_ready(filepath: str):
+    """
+    Не начинать обработку файла, который еще дописывается
+
+    Объекты хранилища попадают туда уже целиком (загрузка - атомарным
+    переименованием, файлы папки наблюдения - после закрытия записи),
+    поэтому свежий mtime у них не означает недописанный файл.
+    """
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        raise FileNotFoundError(filepath)
+    if get_content_store().contains(filepath):
+        return
+
+    age = time.time() - stat.st_mtime
+    if age < settings.OCR_FILE_SETTLE_SECONDS:
+        raise FileNotReadyError(filepath, f"modified {age:.1f}s ago")
+
+
+async def _recognize_pages(
+    filepath: str,
+    engine: str,
+    dpi: int,
+    mode: str = "printed",
+    page_indices: Optional[List[int]] = None,
+    on_page: Optional[Callable[[Dict], Awaitable[None]]] = None,
+) -> Dict:
+    """
+    Постраничное распознавание с допуском по бюджету памяти
+
+    Размер каждой страницы известен до рендеринга, поэтому память
+    резервируется заранее, а сам рендеринг и OCR идут вне event loop.
+    Между страницами проверяется запрос на отмену задачи.
+
+    Args:
+        page_indices: Какие страницы распознавать (с нуля); по умолчанию все
+        on_page: Вызывается с результатом каждой страницы сразу после
+            распознавания (чекпоинт, индексация, прогресс)
+    """
+    processor = FileProcessor()
+    admission = get_admission_controller()
+    page_timeout = settings.OCR_PAGE_TIMEOUT_SECONDS
+
+    page_sizes = await asyncio.to_thread(processor.get_page_sizes, filepath)
+    if page_indices is None:
+        page_indices = range(len(page_sizes))
+    pages: List[Dict] = []
+
+    for page_index in page_indices:
+        width, height = page_sizes[page_index]
+        check_cancelled()
+        required = estimate_page_memory(width, height, dpi, engine)
+        async with admission.reserve(required):
+            if settings.OCR_PROCESS_ISOLATION:
+                page = await get_ocr_process_pool().ocr_page(
+                    filepath, page_index, engine, dpi, mode, timeout=page_timeout
+                )
+            else:
+                # Без изоляции зависший поток убить нельзя - только перестать ждать
+                try:
+                    page = await asyncio.wait_for(
+                        asyncio.to_thread(
+                            processor.ocr_page, filepath, page_index,
+                            get_ocr_manager(), engine, dpi, mode
+                        ),
+                        page_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    raise OCRTimeoutError(filepath, int(page_timeout))
+        if on_page is not None:
+            await on_page(page)
+        pages.append(page)
+
+    confidence = sum(p["confidence"] for p in pages) / len(pages) if pages else 0.0
+    return {
+        "text": "\f".join(p["text"] for p in pages),
+        "pages": pages,
+        "confidence": confidence,
+        "page_count": len(pages),
+    }
+
+
+# ==================== Намерения записи ====================
+# Выполняются писателем БД (get_db_writer) и фиксируются группами
+
+def _store_page(db: Session, file_id: int, page: Dict) -> Tuple[int, int]:
+    """Сохранить распознанную страницу (в FTS ее добавляет триггер)"""
+    saved = DocumentService(db, autocommit=False).save_page(file_id, page)
+    return saved.document_id, saved.page_number
+
+
+def _store_finalized(
+    db: Session,
+    file_id: int,
+    page_count: int,
+    processing_time: float,
+    ocr_mode: Optional[str] = None,
+) -> Document:
+    """Собрать документ из сохраненных страниц"""
+    document = DocumentService(db, autocommit=False).finalize_pages(
+        file_id, page_count=page_count, processing_time=processing_time
+    )
+    if ocr_mode is not None:
+        db.get(FileModel, file_id).ocr_mode = ocr_mode
+    return document
+
+
+def store_extracted_text(
+    db: Session,
+    file_id: int,
+    text: str,
+    processing_time: float,
+    ocr_mode: str,
+) -> Document:
+    """Сохранить встроенный текст PDF документом (страницы - по \\f)"""
+    document = DocumentService(db, autocommit=False).create_document(
+        file_id=file_id,
+        text_content=text,
+        pages=None,
+        confidence_score=1.0,
+        processing_time=processing_time,
+    )
+    db.get(FileModel, file_id).ocr_mode = ocr_mode
+    return document
+
+
+async def recognize_document(
+    db: Session,
+    file_obj: FileModel,
+    engine: str,
+    dpi: int,
+    mode: str = "printed",
+    page_limit: Optional[int] = None,
+    ocr_mode: Optional[str] = None,
+) -> Optional[Document]:
+    """
+    Распознать файл, повторно обрабатывая только измененные страницы
+
+    Отпечатки страниц сравниваются с сохраненными: OCR запускается для
+    новых и измененных страниц и для страниц, распознанных другим
+    движком, с другим DPI или в другом режиме. Остальные страницы
+    документа не трогаются, текст документа и FTS обновляются на месте.
+
+    Каждая страница сохраняется и попадает в FTS сразу после
+    распознавания (событие page_completed), поэтому документ ищется по
+    готовым страницам, а прерванная задача продолжается с первой
+    недостающей страницы.
+
+    Args:
+        page_limit: Распознать не больше стольких страниц за вызов
+        ocr_mode: Записать в файл вместе с готовым документом
+
+    Returns:
+        Документ или None, если из-за page_limit остались нераспознанные страницы
+    """
+    start_time = time.time()
+    mode = normalize_mode(mode)
+    fingerprints = await asyncio.to_thread(
+        FileProcessor.get_page_fingerprints, file_obj.filepath
+    )
+    doc_service = DocumentService(db)
+    stored = doc_service.page_signatures(file_obj.id)
+    changed = [
+        index for index, fingerprint in enumerate(fingerprints)
+        if stored.get(index + 1) != (fingerprint, engine, dpi, mode)
+    ]
+    logger.info(
+        f"File {file_obj.id}: {len(changed)} of {len(fingerprints)} page(s) need recognition"
+    )
+    batch = changed if page_limit is None else changed[:page_limit]
+    recognized = 0
+    writer = get_db_writer()
+
+    async def _save_page(page: Dict):
+        nonlocal recognized
+        page["fingerprint"] = fingerprints[page["page_number"] - 1]
+        page["engine"] = engine
+        page["dpi"] = dpi
+        page["mode"] = mode
+        document_id, page_number = await writer.execute(
+            _store_page, file_obj.id, page
+        )
+
+        recognized += 1
+        remaining = len(changed) - recognized
+        eta = (time.time() - start_time) / recognized * remaining
+        await notify_page_completed(
+            file_obj.id,
+            document_id,
+            page_number=page_number,
+            pages_done=len(fingerprints) - remaining,
+            page_count=len(fingerprints),
+            eta_seconds=round(eta, 1),
+        )
+
+    await _recognize_pages(
+        file_obj.filepath, engine=engine, dpi=dpi, mode=mode,
+        page_indices=batch, on_page=_save_page,
+    )
+
+    check_cancelled()
+    if len(batch) < len(changed):
+        return None
+
+    # Страницы уже в индексе, остается убрать лишние (документ стал короче)
+    return await writer.execute(
+        _store_finalized,
+        file_obj.id,
+        page_count=len(fingerprints),
+        processing_time=time.time() - start_time,
+        ocr_mode=ocr_mode,
+    )
+
+
 async def process_ocr_task(data: dict):
     """
     Основная функция для обработки OCR задачи из очереди
     
     Args:
         data: Словарь с данными задачи, должен содержать "file_id"
+    
+    Returns:
+        Continuation, если распознаны только первые страницы нового
+        документа (OCR_FIRST_PAGES), а остаток нужно поставить в очередь
+    
+    Raises:
+        OCRCancelledError: Задача отменена между страницами
+        FileNotReadyError: Файл еще записывается (задача будет повторена)
     """
     file_id = data.get("file_id")
     if not file_id:
@@ -35,6 +277,8 @@ async def process_ocr_task(data: dict):
             logger.error(f"File with id={file_id} not found in DB")
             return
         
+        _ensure_file_ready(file_obj.filepath)
+        
         start_time = time.time()
         processor = FileProcessor()
         
@@ -44,48 +288,83 @@ async def process_ocr_task(data: dict):
         use_ocr = not has_text
         
         if use_ocr:
-            ocr_manager = get_ocr_manager()
             engine = settings.DEFAULT_OCR_ENGINE
             
             logger.info(f"Processing file {file_id} with OCR engine: {engine}")
             
-            ocr_result = processor.process_pdf_with_ocr(
-                file_obj.filepath, ocr_manager, engine=engine, dpi=300
+            # Первые страницы идут короткой задачей, остальные - продолжением
+            page_limit = None if data.get("continuation") else settings.OCR_FIRST_PAGES or None
+            document = await recognize_document(
+                db, file_obj, engine=engine, dpi=settings.PDF_DPI,
+                page_limit=page_limit, ocr_mode=f"{engine}:printed"
             )
-            text = ocr_result["text"]
-            confidence = ocr_result["confidence"]
-            pages = ocr_result["pages"]
-            used_engine = engine
+            if document is None:
+                logger.info(f"First page(s) of file {file_id} are ready, the rest is queued")
+                return Continuation({**data, "continuation": True})
         else:
-
             logger.info(f"Extracting embedded text from file {file_id}")
             text = processor.extract_pdf_text(file_obj.filepath)
-            confidence = 1.0
-            pages = None
-            used_engine = "text_extraction"
+            processing_time = time.time() - start_time
+            check_cancelled()
             
-        processing_time = time.time() - start_time
-        
-        doc_service = DocumentService(db)
-        document = doc_service.create_document(
-            file_id=file_id,
-            text_content=text,
-            pages=pages,
-            confidence_score=confidence,
-            processing_time=processing_time,
-        )
-        
-        index_document(document.id, file_obj.filename, text)
-        
-        file_obj.ocr_mode = used_engine
-        db.commit()
+            # Документ, страницы и режим файла - одной записью
+            document = await get_db_writer().execute(
+                store_extracted_text, file_id, text,
+                processing_time=processing_time, ocr_mode="text_extraction"
+            )
         
         await notify_processing_completed(file_id, document.id)
         logger.info(f"Successfully processed file {file_id}, created document {document.id}")
         
+    except OCRCancelledError as e:
+        db.rollback()
+        logger.info(f"Processing of file {file_id} cancelled")
+        await notify_processing_cancelled(file_id, e.details.get("job_id"))
+        raise
+    except asyncio.CancelledError:
+        # Жесткая отмена или таймаут задачи, выставленные QueueManager
+        db.rollback()
+        job = current_job.get()
+        if job is not None and job.state == JobState.TIMED_OUT:
+            # Об ошибке сообщит обработчик dead-letter
+            logger.error(f"Processing of file {file_id} timed out")
+        else:
+            logger.info(f"Processing of file {file_id} aborted")
+            await notify_processing_cancelled(file_id, job.job_id if job else None)
+        raise
     except Exception as e:
-        await notify_processing_failed(file_id, str(e))
-        logger.exception(f"Failed to process file {file_id} in worker: {e}")
+        # Повтор или dead-letter решает QueueManager
+        logger.warning(f"Failed to process file {file_id} in worker: {e}")
         db.rollback()
+        raise
     finally:
         db.close()
+
+
+async def on_task_retry(job: Job, error: AppException, delay: float):
+    """Колбэк QueueManager: задача будет повторена после временной ошибки"""
+    await notify_processing_retry(job.file_id, job.attempts, delay, error.message)
+
+
+async def on_task_dead_letter(job: Job, error: AppException):
+    """Колбэк QueueManager: задача окончательно провалена"""
+    def _record(db: Session) -> int:
+        return DeadLetterService(db, autocommit=False).record(
+            file_id=job.file_id,
+            job_id=job.job_id,
+            error=error,
+            attempts=job.attempts,
+            payload=job.data,
+        ).id
+
+    entry_id = await get_db_writer().execute(_record)
+    logger.error(
+        f"File {job.file_id} moved to dead letters (id={entry_id}) "
+        f"after {job.attempts} attempt(s): {error.message}"
+    )
+    await notify_processing_failed(job.file_id, error.message)
+
+
+async def on_job_group_progress(group: JobGroup):
+    """Колбэк QueueManager: завершилась очередная задача группы"""
+    await notify_job_group_progress(group.to_dict())
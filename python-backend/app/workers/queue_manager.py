@@ -1,62 +1,512 @@
 import asyncio
+import itertools
 import logging
+import time
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
-from typing import Callable, Any
+from typing import Awaitable, Callable, Any, Deque, Dict, Iterable, List, Optional, Set
+
+from app.core.exceptions import AppException, OCRCancelledError, OCRTimeoutError
+from app.workers.jobs import Continuation, Job, JobGroup, JobState, current_job
+from app.workers.retry import RetryPolicy, classify_exception
+from app.workers.scheduling import (
+    JobEstimate,
+    SchedulingPolicy,
+    get_scheduling_policy,
+    LANE_BATCH,
+)
 
 logger = logging.getLogger(__name__)
 
+# Служебная полоса для сигналов остановки воркеров (раньше любых задач)
+_LANE_CONTROL = -1
+_STOP = object()
+
+# Сколько завершенных задач хранить для GET /ocr/jobs
+_FINISHED_JOBS_LIMIT = 1000
+
+# Сколько групп задач хранить для GET /ocr/groups
+_GROUPS_LIMIT = 100
+
 
 @dataclass(order=True)
 class Task:
     """Задача для выполнения в очереди"""
-    priority: int
+    lane: int
+    priority: float
+    sequence: int
     data: Any = field(compare=False)
+    estimate: Optional[JobEstimate] = field(default=None, compare=False)
+    enqueued_at: float = field(default_factory=time.time, compare=False)
+    job: Optional[Job] = field(default=None, compare=False)
 
 
 class QueueManager:
     """Асинхронная очередь задач для обработки OCR"""
-    
-    def __init__(self, worker_func: Callable, num_workers: int = 1):
+
+    def __init__(
+        self,
+        worker_func: Callable,
+        num_workers: int = 1,
+        policy: Optional[SchedulingPolicy] = None,
+        task_timeout: Optional[float] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        on_retry: Optional[Callable[[Job, AppException, float], Awaitable[None]]] = None,
+        on_dead_letter: Optional[Callable[[Job, AppException], Awaitable[None]]] = None,
+        on_group_progress: Optional[Callable[[JobGroup], Awaitable[None]]] = None,
+    ):
         self.queue = asyncio.PriorityQueue()
         self.worker_func = worker_func
         self.num_workers = num_workers
-        self._tasks = []
-    
-    async def add_task(self, data: Any, priority: int = 10):
-        """Добавить задачу в очередь"""
-        task = Task(priority=priority, data=data)
-        await self.queue.put(task)
-        logger.info(f"Task added to queue: {data}")
-    
+        self.policy = policy or get_scheduling_policy()
+        self.task_timeout = task_timeout
+        self.retry_policy = retry_policy or RetryPolicy.from_settings()
+        self.on_retry = on_retry
+        self.on_dead_letter = on_dead_letter
+        self.on_group_progress = on_group_progress
+        self.jobs: Dict[str, Job] = {}
+        self.groups: "OrderedDict[str, JobGroup]" = OrderedDict()
+        self._notifications: Set[asyncio.Task] = set()
+        self._finished: Deque[str] = deque()
+        self._running: Dict[str, asyncio.Task] = {}
+        self._retry_timers: Dict[str, asyncio.Task] = {}
+        self._queued_count = 0
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._busy: Dict[str, Job] = {}
+        self._pending_stops = 0
+        self._queued_stop_signals = 0
+        self._worker_ids = itertools.count(1)
+        self._sequence = itertools.count()
+
+    async def add_task(
+        self,
+        data: Any,
+        priority: Optional[float] = None,
+        lane: int = LANE_BATCH,
+    ) -> str:
+        """
+        Добавить задачу в очередь
+
+        Args:
+            data: Данные задачи
+            priority: Явный приоритет (меньше - раньше); если не задан,
+                вычисляется политикой планирования по оценке стоимости
+            lane: Полоса очереди (LANE_INTERACTIVE обслуживается первой)
+
+        Returns:
+            ID задачи для отслеживания и отмены
+        """
+        job = Job(data=data, lane=lane, enqueued_at=time.time())
+        self.jobs[job.job_id] = job
+        estimate = await self._enqueue(job, priority)
+        logger.info(
+            f"Task added to queue: {data} (job={job.job_id}, lane={lane}, "
+            f"cost={estimate.cost if estimate else 'n/a'})"
+        )
+        return job.job_id
+
+    async def add_tasks(
+        self,
+        items: List[Any],
+        lane: int = LANE_BATCH,
+        priority: Optional[float] = None,
+        group: Optional[JobGroup] = None,
+    ) -> List[str]:
+        """
+        Добавить пачку задач в очередь
+
+        Оценки стоимости считаются одним вызовом в отдельном потоке,
+        а не по потоку на задачу.
+
+        Args:
+            group: Группа для суммарного прогресса (см. create_group)
+
+        Returns:
+            ID задач в порядке items
+        """
+        if not items:
+            return []
+
+        now = time.time()
+        group_id = group.group_id if group else None
+        jobs = [Job(data=data, lane=lane, enqueued_at=now, group_id=group_id) for data in items]
+        if group is not None:
+            group.job_ids.extend(job.job_id for job in jobs)
+        estimates: List[Optional[JobEstimate]] = [None] * len(jobs)
+        if priority is None:
+            estimates = await asyncio.to_thread(
+                lambda: [self.policy.estimate(job.data) for job in jobs]
+            )
+
+        for job, estimate in zip(jobs, estimates):
+            self.jobs[job.job_id] = job
+            await self._enqueue(job, priority, estimate)
+
+        logger.info(f"{len(jobs)} task(s) added to queue (lane={lane})")
+        return [job.job_id for job in jobs]
+
+    async def _enqueue(
+        self,
+        job: Job,
+        priority: Optional[float] = None,
+        estimate: Optional[JobEstimate] = None,
+    ) -> Optional[JobEstimate]:
+        """Поставить задачу в очередь (первый раз или повторно)"""
+        if estimate is None and priority is None:
+            estimate = await asyncio.to_thread(self.policy.estimate, job.data)
+        if priority is None:
+            # Повтор сохраняет исходное время постановки, чтобы не терять "возраст"
+            priority = self.policy.priority(estimate, job.enqueued_at)
+
+        job.state = JobState.QUEUED
+        job.next_attempt_at = None
+        self._queued_count += 1
+        await self.queue.put(Task(
+            lane=job.lane,
+            priority=priority,
+            sequence=next(self._sequence),
+            data=job.data,
+            estimate=estimate,
+            enqueued_at=job.enqueued_at,
+            job=job,
+        ))
+        return estimate
+
+    async def _invoke(self, job: Job):
+        """Выполнить worker_func в контексте задачи (для check_cancelled)"""
+        current_job.set(job)
+        return await self.worker_func(job.data)
+
+    def _finish(self, job: Job, state: str, error: Optional[AppException] = None):
+        job.state = state
+        if error is not None:
+            job.error = error.message
+            job.error_code = error.error_code
+        job.finished_at = time.time()
+        self._finished.append(job.job_id)
+        while len(self._finished) > _FINISHED_JOBS_LIMIT:
+            self.jobs.pop(self._finished.popleft(), None)
+
+        group = self.groups.get(job.group_id) if job.group_id else None
+        if group is not None:
+            group.record(state)
+            if self.on_group_progress:
+                # _finish вызывается и из синхронной отмены
+                notification = asyncio.get_running_loop().create_task(self.on_group_progress(group))
+                self._notifications.add(notification)
+                notification.add_done_callback(self._notifications.discard)
+
+    async def _run_job(self, name: str, job: Job):
+        """Выполнить задачу с ограничением по времени"""
+        job.state = JobState.RUNNING
+        job.started_at = time.time()
+        job.attempts += 1
+        job_task = asyncio.create_task(self._invoke(job))
+        self._running[job.job_id] = job_task
+
+        try:
+            done, _ = await asyncio.wait({job_task}, timeout=self.task_timeout)
+        except asyncio.CancelledError:
+            # Останавливается сам воркер
+            job_task.cancel()
+            await asyncio.gather(job_task, return_exceptions=True)
+            self._finish(job, JobState.CANCELLED)
+            job.error = "Worker stopped"
+            raise
+        finally:
+            self._running.pop(job.job_id, None)
+
+        if not done:
+            # Состояние выставляется до отмены, чтобы обработчик видел причину
+            job.state = JobState.TIMED_OUT
+            job_task.cancel()
+            await asyncio.gather(job_task, return_exceptions=True)
+            error = OCRTimeoutError(job.data.get("filepath", ""), int(self.task_timeout))
+            self._finish(job, JobState.TIMED_OUT, error)
+            logger.error(f"Worker '{name}' task timed out: {job.data}")
+            await self._dead_letter(job, error)
+        elif job_task.cancelled():
+            self._finish(job, JobState.CANCELLED)
+        elif isinstance(job_task.exception(), OCRCancelledError):
+            self._finish(job, JobState.CANCELLED)
+        elif job_task.exception() is not None:
+            await self._handle_failure(name, job, job_task.exception())
+        elif isinstance(job_task.result(), Continuation) and job.cancel_requested:
+            self._finish(job, JobState.CANCELLED)
+        elif isinstance(job_task.result(), Continuation):
+            # Готовая часть зафиксирована, остаток ждет своей очереди
+            job.data = job_task.result().data
+            job.error = job.error_code = None
+            job.attempts = 0
+            await self._enqueue(job)
+            logger.info(f"Job {job.job_id} continues later: {job.data}")
+        else:
+            job.error = job.error_code = None
+            self._finish(job, JobState.COMPLETED)
+
+    async def _handle_failure(self, name: str, job: Job, exc: BaseException):
+        """Повторить задачу после временной ошибки или отправить в dead-letter"""
+        error = classify_exception(exc)
+
+        if job.cancel_requested or not self.retry_policy.should_retry(error, job.attempts):
+            self._finish(job, JobState.FAILED, error)
+            logger.error(
+                f"Worker '{name}' failed {job.data} after {job.attempts} attempt(s): {exc}",
+                exc_info=exc,
+            )
+            await self._dead_letter(job, error)
+            return
+
+        delay = self.retry_policy.delay(job.attempts)
+        job.state = JobState.RETRY_WAIT
+        job.error = error.message
+        job.error_code = error.error_code
+        job.next_attempt_at = time.time() + delay
+        self._retry_timers[job.job_id] = asyncio.create_task(self._retry_later(job, delay))
+        logger.warning(
+            f"Worker '{name}' transient error on {job.data} "
+            f"(attempt {job.attempts}/{self.retry_policy.max_attempts}), retry in {delay:.1f}s: {exc}"
+        )
+
+        if self.on_retry:
+            try:
+                await self.on_retry(job, error, delay)
+            except Exception as e:
+                logger.exception(f"Retry callback failed for job {job.job_id}: {e}")
+
+    async def _retry_later(self, job: Job, delay: float):
+        try:
+            await asyncio.sleep(delay)
+            if job.state == JobState.RETRY_WAIT:
+                await self._enqueue(job)
+                logger.info(f"Job {job.job_id} re-queued (attempt {job.attempts + 1})")
+        finally:
+            self._retry_timers.pop(job.job_id, None)
+
+    async def _dead_letter(self, job: Job, error: AppException):
+        if self.on_dead_letter is None:
+            return
+        try:
+            await self.on_dead_letter(job, error)
+        except Exception as e:
+            logger.exception(f"Dead-letter callback failed for job {job.job_id}: {e}")
+
     async def _worker(self, name: str):
         """Воркер, который берет задачи из очереди и выполняет их"""
         logger.info(f"Worker '{name}' started")
         while True:
             try:
                 task = await self.queue.get()
-                logger.info(f"Worker '{name}' processing task: {task.data}")
-                await self.worker_func(task.data)
-                self.queue.task_done()
-                logger.info(f"Worker '{name}' finished task: {task.data}")
+
+                if task.data is _STOP:
+                    self._queued_stop_signals -= 1
+                    self.queue.task_done()
+                    # Сигнал мог устареть, если пул успели снова увеличить
+                    if self._pending_stops > 0:
+                        self._pending_stops -= 1
+                        logger.info(f"Worker '{name}' drained and retired.")
+                        break
+                    continue
+
+                job = task.job
+                if job.state == JobState.CANCELLED:
+                    # Отменена, пока ждала в очереди
+                    self.queue.task_done()
+                    continue
+                self._queued_count -= 1
+
+                wait_time = time.time() - task.enqueued_at
+                logger.info(
+                    f"Worker '{name}' processing task: {task.data} "
+                    f"(waited {wait_time:.1f}s)"
+                )
+                self._busy[name] = job
+                try:
+                    await self._run_job(name, job)
+                finally:
+                    self._busy.pop(name, None)
+                    self.queue.task_done()
+                logger.info(f"Worker '{name}' finished task: {task.data} ({job.state})")
             except asyncio.CancelledError:
                 logger.info(f"Worker '{name}' stopping.")
                 break
             except Exception as e:
                 logger.exception(f"Worker '{name}' error processing {task.data}: {e}")
-    
+
+        self._workers.pop(name, None)
+
+    def _spawn_worker(self):
+        """Запустить одного воркера"""
+        name = f"OCR-Worker-{next(self._worker_ids)}"
+        self._workers[name] = asyncio.create_task(self._worker(name))
+
+    @property
+    def worker_count(self) -> int:
+        """Текущее целевое число воркеров (без уходящих на остановку)"""
+        return len(self._workers) - self._pending_stops
+
+    @property
+    def busy_count(self) -> int:
+        """Количество воркеров, занятых задачей"""
+        return len(self._busy)
+
+    @property
+    def pending_count(self) -> int:
+        """Количество задач, ожидающих в очереди"""
+        return self._queued_count
+
+    def resize(self, num_workers: int):
+        """
+        Изменить количество воркеров без перезапуска
+
+        При уменьшении воркеры не прерываются: в очередь кладутся сигналы
+        остановки с наивысшим приоритетом, и воркер уходит только после
+        завершения текущей задачи. Задачи в очереди не теряются.
+        """
+        if num_workers < 1:
+            raise ValueError("num_workers must be >= 1")
+
+        current = self.worker_count
+        self.num_workers = num_workers
+
+        if num_workers > current:
+            delta = num_workers - current
+            # Сначала отменяем ещё не обработанные сигналы остановки
+            revoked = min(self._pending_stops, delta)
+            self._pending_stops -= revoked
+            for _ in range(delta - revoked):
+                self._spawn_worker()
+
+        elif num_workers < current:
+            for _ in range(current - num_workers):
+                self._pending_stops += 1
+                self._queued_stop_signals += 1
+                self.queue.put_nowait(
+                    Task(lane=_LANE_CONTROL, priority=0.0, sequence=next(self._sequence), data=_STOP)
+                )
+
+        if num_workers != current:
+            logger.info(f"Worker pool resized: {current} -> {num_workers}")
+
+    def stats(self) -> Dict[str, int]:
+        """Состояние пула воркеров и очереди"""
+        return {
+            "workers": self.worker_count,
+            "busy": self.busy_count,
+            "pending": self.pending_count,
+            "retrying": len(self._retry_timers),
+        }
+
+    # ==================== Группы задач ====================
+
+    def create_group(self, total: int) -> JobGroup:
+        """Создать группу для суммарного прогресса пачки задач"""
+        group = JobGroup(total=total)
+        self.groups[group.group_id] = group
+        while len(self.groups) > _GROUPS_LIMIT:
+            self.groups.popitem(last=False)
+        return group
+
+    def get_group(self, group_id: str) -> Optional[JobGroup]:
+        return self.groups.get(group_id)
+
+    # ==================== Задачи и отмена ====================
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """Получить задачу по ID"""
+        return self.jobs.get(job_id)
+
+    def list_jobs(self, states: Optional[Iterable[str]] = None) -> List[Job]:
+        """Список отслеживаемых задач (опционально по состояниям)"""
+        states = set(states) if states else None
+        return [j for j in self.jobs.values() if states is None or j.state in states]
+
+    def cancel(self, job_id: str, force: bool = False) -> bool:
+        """
+        Отменить задачу
+
+        Задача в очереди или в ожидании повтора снимается сразу. Выполняющаяся задача
+        останавливается перед следующей страницей; при force=True
+        прерывается немедленно (процесс OCR убивается).
+
+        Returns:
+            True если отмена принята
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.state in JobState.FINISHED:
+            return False
+
+        job.cancel_requested = True
+
+        if job.state == JobState.QUEUED:
+            self._queued_count -= 1
+            self._finish(job, JobState.CANCELLED)
+        elif job.state == JobState.RETRY_WAIT:
+            timer = self._retry_timers.pop(job_id, None)
+            if timer:
+                timer.cancel()
+            self._finish(job, JobState.CANCELLED)
+        elif force and job_id in self._running:
+            self._running[job_id].cancel()
+
+        logger.info(f"Cancel requested for job {job_id} (force={force})")
+        return True
+
+    def cancel_many(
+        self,
+        job_ids: Optional[Iterable[str]] = None,
+        file_ids: Optional[Iterable[int]] = None,
+        all_queued: bool = False,
+        force: bool = False,
+    ) -> List[Job]:
+        """Массовая отмена по ID задач, ID файлов или всей очереди"""
+        targets = set(job_ids or [])
+        file_ids = set(file_ids or [])
+
+        for job in self.jobs.values():
+            if job.state in JobState.FINISHED:
+                continue
+            waiting = job.state in (JobState.QUEUED, JobState.RETRY_WAIT)
+            if job.file_id in file_ids or (all_queued and waiting):
+                targets.add(job.job_id)
+
+        cancelled = []
+        for job_id in targets:
+            job = self.jobs.get(job_id)
+            if job is not None and self.cancel(job_id, force=force):
+                cancelled.append(job)
+        return cancelled
+
     async def start(self):
         """Запустить воркеров"""
-        self._tasks = [
-            asyncio.create_task(self._worker(f"OCR-Worker-{i+1}"))
-            for i in range(self.num_workers)
-        ]
+        for _ in range(self.num_workers):
+            self._spawn_worker()
         logger.info(f"{self.num_workers} workers started.")
-    
+
     async def stop(self):
         """Остановить воркеров"""
         logger.info("Stopping workers...")
-        for task in self._tasks:
+        tasks = list(self._workers.values()) + list(self._retry_timers.values())
+        for task in tasks:
             task.cancel()
-        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers.clear()
+        self._retry_timers.clear()
+        self._pending_stops = 0
+        self._queued_stop_signals = 0
         logger.info("All workers stopped.")
-        
\ No newline at end of file
+
+
+# Глобальный экземпляр (создается при старте приложения)
+_queue_manager_instance: Optional[QueueManager] = None
+
+
+def set_queue_manager(queue_manager: Optional[QueueManager]) -> None:
+    """Зарегистрировать активный менеджер очереди"""
+    global _queue_manager_instance
+    _queue_manager_instance = queue_manager
+
+
+def get_queue_manager() -> Optional[QueueManager]:
+    """Получить активный менеджер очереди (None до старта приложения)"""
+    return _queue_manager_instance
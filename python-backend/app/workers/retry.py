@@ -0,0 +1,94 @@
+"""
+Классификация ошибок OCR задач и политика повторных попыток
+"""
+import errno
+import random
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.core.exceptions import (
+    AppException,
+    DatabaseLockedError,
+    FileNotReadyError,
+    OCRResourceError,
+    OCRProcessError,
+)
+
+# errno, при которых файл обычно занят другим процессом (запись, антивирус)
+_BUSY_ERRNOS = {errno.EACCES, errno.EAGAIN, errno.EBUSY, errno.ETXTBSY}
+
+
+def _classify_single(exc: BaseException) -> Optional[AppException]:
+    if isinstance(exc, AppException):
+        return exc
+
+    if isinstance(exc, OperationalError):
+        reason = str(exc.orig) if exc.orig is not None else str(exc)
+        if "locked" in reason or "busy" in reason:
+            return DatabaseLockedError(reason)
+        return None
+
+    if isinstance(exc, MemoryError):
+        return OCRResourceError("out of memory")
+
+    if isinstance(exc, (PermissionError, BlockingIOError)) or (
+        isinstance(exc, OSError) and exc.errno in _BUSY_ERRNOS
+    ):
+        return FileNotReadyError(getattr(exc, "filename", None) or "", str(exc))
+
+    return None
+
+
+def classify_exception(exc: BaseException) -> AppException:
+    """
+    Привести исключение к иерархии AppException
+
+    Просматривается цепочка причин: FileProcessor оборачивает ошибки
+    в FileProcessError, а настоящая причина (MemoryError, блокировка)
+    остается в __cause__/__context__. Временная причина важнее обертки.
+    """
+    seen = set()
+    current: Optional[BaseException] = exc
+    first: Optional[AppException] = None
+
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        classified = _classify_single(current)
+        if classified is not None:
+            if classified.retryable:
+                return classified
+            first = first or classified
+        current = current.__cause__ or current.__context__
+
+    if first is not None:
+        return first
+    return OCRProcessError("", f"{type(exc).__name__}: {exc}")
+
+
+@dataclass
+class RetryPolicy:
+    """Экспоненциальная задержка с ограничением числа попыток"""
+    max_attempts: int = 4
+    base_delay: float = 5.0
+    max_delay: float = 300.0
+    jitter: float = 0.2
+
+    @classmethod
+    def from_settings(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=settings.OCR_RETRY_MAX_ATTEMPTS,
+            base_delay=settings.OCR_RETRY_BASE_DELAY_SECONDS,
+            max_delay=settings.OCR_RETRY_MAX_DELAY_SECONDS,
+        )
+
+    def should_retry(self, error: AppException, attempts: int) -> bool:
+        """attempts - сколько попыток уже сделано"""
+        return error.retryable and attempts < self.max_attempts
+
+    def delay(self, attempts: int) -> float:
+        """Задержка перед следующей попыткой (с разбросом, чтобы не бить в БД синхронно)"""
+        delay = min(self.base_delay * (2 ** (attempts - 1)), self.max_delay)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
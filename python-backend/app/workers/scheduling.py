@@ -0,0 +1,150 @@
+"""
+Политики планирования для очереди OCR задач
+"""
+import logging
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.file import File as FileModel
+from app.services.file_processor import FileProcessor
+
+logger = logging.getLogger(__name__)
+
+# Полосы очереди: интерактивные загрузки всегда обслуживаются раньше пакетных
+LANE_INTERACTIVE = 0
+LANE_BATCH = 1
+
+
+@dataclass
+class JobEstimate:
+    """Оценка стоимости задачи на момент постановки в очередь"""
+    page_count: int
+    file_size: int
+    cost: float
+
+
+class SchedulingPolicy(ABC):
+    """Базовый класс политики планирования"""
+
+    @abstractmethod
+    def estimate(self, data: Dict[str, Any]) -> JobEstimate:
+        """Оценить стоимость задачи"""
+        ...
+
+    @abstractmethod
+    def priority(self, estimate: JobEstimate, enqueued_at: float) -> float:
+        """Вычислить приоритет (меньше - раньше)"""
+        ...
+
+
+class FIFOPolicy(SchedulingPolicy):
+    """Обработка в порядке поступления"""
+
+    def estimate(self, data: Dict[str, Any]) -> JobEstimate:
+        return JobEstimate(page_count=0, file_size=0, cost=0.0)
+
+    def priority(self, estimate: JobEstimate, enqueued_at: float) -> float:
+        return enqueued_at
+
+
+class ShortestJobFirstPolicy(SchedulingPolicy):
+    """
+    Shortest-job-first со старением
+
+    Приоритет - это "виртуальный дедлайн": время постановки плюс штраф,
+    пропорциональный стоимости. Новые задачи получают всё большие ключи,
+    поэтому длинная задача пропускает вперёд только те короткие, которые
+    пришли не позже чем через max_delay секунд после неё, и не голодает.
+
+    First-page-first: первые first_pages страниц нового документа
+    оцениваются как короткая задача, поэтому начало большого PDF
+    распознается и попадает в поиск почти сразу. Остаток возвращается
+    в очередь с флагом continuation и оценивается по полной стоимости.
+    """
+
+    def __init__(
+        self,
+        aging_seconds_per_page: float = 20.0,
+        max_delay_seconds: float = 1800.0,
+        mb_per_page: float = 4.0,
+        first_pages: int = 0,
+    ):
+        """
+        Args:
+            aging_seconds_per_page: Штраф ожидания за одну страницу стоимости
+            max_delay_seconds: Верхняя граница штрафа
+            mb_per_page: Сколько МБ файла эквивалентно одной странице
+            first_pages: Сколько первых страниц нового документа
+                распознается отдельной короткой задачей (0 - отключено)
+        """
+        self.aging_seconds_per_page = aging_seconds_per_page
+        self.max_delay_seconds = max_delay_seconds
+        self.mb_per_page = mb_per_page
+        self.first_pages = first_pages
+
+    def estimate(self, data: Dict[str, Any]) -> JobEstimate:
+        filepath, file_size = _resolve_file(data)
+
+        page_count = data.get("page_count")
+        if page_count is None and filepath:
+            try:
+                page_count = FileProcessor.get_page_count(filepath)
+            except Exception as e:
+                logger.warning(f"Failed to estimate page count for {filepath}: {e}")
+        page_count = page_count or 1
+
+        size_mb = file_size / (1024 * 1024)
+        cost = max(float(page_count), size_mb / self.mb_per_page)
+        if self.first_pages and not data.get("continuation"):
+            cost = min(cost, float(self.first_pages))
+
+        return JobEstimate(page_count=page_count, file_size=file_size, cost=cost)
+
+    def priority(self, estimate: JobEstimate, enqueued_at: float) -> float:
+        delay = min(estimate.cost * self.aging_seconds_per_page, self.max_delay_seconds)
+        return enqueued_at + delay
+
+
+def _resolve_file(data: Dict[str, Any]) -> Tuple[Optional[str], int]:
+    """Получить путь и размер файла из данных задачи (при необходимости из БД)"""
+    filepath: Optional[str] = data.get("filepath")
+    file_size: Optional[int] = data.get("file_size")
+
+    if filepath is None and data.get("file_id"):
+        db = SessionLocal()
+        try:
+            file_obj = db.query(FileModel).filter(FileModel.id == data["file_id"]).first()
+            if file_obj:
+                filepath = file_obj.filepath
+                file_size = file_obj.file_size
+        finally:
+            db.close()
+
+    if file_size is None and filepath:
+        try:
+            file_size = os.stat(filepath).st_size
+        except OSError:
+            file_size = 0
+
+    return filepath, file_size or 0
+
+
+def get_scheduling_policy(name: Optional[str] = None) -> SchedulingPolicy:
+    """Создать политику планирования по имени из настроек"""
+    name = name or settings.OCR_SCHEDULER_POLICY
+
+    if name == "fifo":
+        return FIFOPolicy()
+    if name == "sjf":
+        return ShortestJobFirstPolicy(
+            aging_seconds_per_page=settings.OCR_SCHEDULER_AGING_SECONDS_PER_PAGE,
+            max_delay_seconds=settings.OCR_SCHEDULER_MAX_DELAY_SECONDS,
+            mb_per_page=settings.OCR_SCHEDULER_MB_PER_PAGE,
+            first_pages=settings.OCR_FIRST_PAGES,
+        )
+
+    raise ValueError(f"Unknown scheduling policy: {name}")
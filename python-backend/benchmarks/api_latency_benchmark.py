@@ -0,0 +1,257 @@
+"""
+Бенчмарк задержки endpoints под параллельной нагрузкой
+
+Сравнивает прежние синхронные реализации /search (поиск + запрос
+документа на каждый результат) и /bulk/pending (полные ORM-объекты)
+с асинхронными (AsyncSession поверх aiosqlite). Сервер uvicorn работает
+в отдельном потоке со своим event loop, N клиентов шлют запросы
+одновременно; печатаются p50/p99 задержки с точки зрения клиента и
+максимальная задержка event loop сервера (насколько блокируются
+остальные запросы и WebSocket).
+
+Запуск (из python-backend):
+    python -m benchmarks.api_latency_benchmark --concurrency 50
+    python -m benchmarks.api_latency_benchmark --documents 20000 --requests 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# БД бенчмарка - во временной папке, до импорта настроек
+_DATA_DIR = tempfile.mkdtemp(prefix="api-latency-bench-")
+os.environ["APP_DATA_DIR"] = _DATA_DIR
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from fastapi import APIRouter, FastAPI, Query  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+import app.models.dead_letter  # noqa: E402,F401
+import app.models.document_page  # noqa: E402,F401
+from app.api.v1.endpoints import bulk, search  # noqa: E402
+from app.db.async_session import async_read_engine  # noqa: E402
+from app.db.init_db import init_db  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.models.dead_letter import DeadLetter  # noqa: E402
+from app.models.document import Document  # noqa: E402
+from app.models.document_page import DocumentPage  # noqa: E402
+from app.models.file import File as FileModel  # noqa: E402
+from app.services.search_service import ensure_fts_table  # noqa: E402
+from app.services.search_service import search as fts_search  # noqa: E402
+
+WORDS = [f"word{i}" for i in range(2000)]
+
+# ==================== Прежние реализации ====================
+
+legacy = APIRouter()
+
+
+@legacy.get("/search")
+async def legacy_search(
+    q: str,
+    limit: int = 10,
+    min_confidence: Optional[float] = Query(None)
+) -> List[Dict]:
+    results = fts_search(q, limit)
+    if min_confidence is not None:
+        db = SessionLocal()
+        try:
+            filtered = []
+            for r in results:
+                doc = db.query(Document).get(r["document_id"])
+                if doc and (doc.confidence_score or 0) >= min_confidence:
+                    r["confidence"] = doc.confidence_score
+                    filtered.append(r)
+            return filtered
+        finally:
+            db.close()
+    return results
+
+
+@legacy.get("/bulk/pending")
+async def legacy_pending():
+    db = SessionLocal()
+    try:
+        dead = db.query(DeadLetter.file_id).filter(DeadLetter.replayed_at.is_(None))
+        pending = db.query(FileModel).filter(
+            FileModel.is_processed == False,  # noqa: E712
+            FileModel.id.not_in(dead)
+        ).all()
+        return {
+            "pending": [{"id": f.id, "filename": f.filename, "created_at": f.created_at} for f in pending],
+            "total": len(pending),
+        }
+    finally:
+        db.close()
+
+
+# Максимальная задержка event loop сервера с последнего сброса
+_server_lag = {"max": 0.0}
+
+
+async def _heartbeat():
+    # Насколько опаздывает event loop при тике в 10 мс
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        _server_lag["max"] = max(_server_lag["max"], time.perf_counter() - started - 0.01)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    heartbeat = asyncio.create_task(_heartbeat())
+    try:
+        yield
+    finally:
+        heartbeat.cancel()
+        await async_read_engine.dispose()
+
+
+def build_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(legacy, prefix="/legacy")
+    app.include_router(search.router, prefix="/async/search")
+    app.include_router(bulk.router, prefix="/async/bulk")
+    return app
+
+
+def start_server(app: FastAPI) -> Tuple[uvicorn.Server, threading.Thread]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+# ==================== Данные ====================
+
+def make_dataset(documents: int, pending: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    total = documents + pending
+    with engine.begin() as connection:
+        connection.execute(insert(FileModel.__table__), [
+            {
+                "filename": f"doc_{i:06d}.pdf",
+                "filepath": f"/bench/doc_{i:06d}.pdf",
+                "file_hash": f"{i:064d}",
+                "file_size": 1024,
+                "mime_type": "application/pdf",
+                "is_processed": i <= documents,
+            }
+            for i in range(1, total + 1)
+        ])
+    texts = {
+        i: "\f".join(" ".join(rng.choices(WORDS, k=200)) for _ in range(3))
+        for i in range(1, documents + 1)
+    }
+    with engine.begin() as connection:
+        connection.execute(insert(Document.__table__), [
+            {"file_id": i, "text_content": texts[i], "page_count": 3,
+             "confidence_score": rng.random(), "is_synced": False, "needs_sync": True}
+            for i in range(1, documents + 1)
+        ])
+        # Индекс FTS заполняют триггеры document_pages
+        connection.execute(insert(DocumentPage.__table__), [
+            {"document_id": i, "page_number": number, "text_content": page_text}
+            for i in range(1, documents + 1)
+            for number, page_text in enumerate(texts[i].split("\f"), start=1)
+        ])
+
+
+# ==================== Замер ====================
+
+async def measure(client: httpx.AsyncClient, urls: List[str], concurrency: int, requests: int):
+    latencies: List[float] = []
+
+    async def worker(n: int):
+        for i in range(requests):
+            url = urls[(n * requests + i) % len(urls)]
+            started = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    _server_lag["max"] = 0.0
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": p99 * 1000,
+        "lag": _server_lag["max"] * 1000,
+    }
+
+
+def report(name: str, result: Dict) -> None:
+    print(
+        f"{name:<24} {result['rps']:8.0f} req/s  p50 {result['p50']:8.1f} ms  "
+        f"p99 {result['p99']:8.1f} ms  loop lag {result['lag']:8.1f} ms"
+    )
+
+
+async def run(base_url: str, args) -> None:
+    rng = random.Random(1)
+    queries = [f"q={rng.choice(WORDS)}&limit=50&min_confidence=0.2" for _ in range(200)]
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+        for kind, path, params in (
+            ("search", "search", queries),
+            ("bulk/pending", "bulk/pending", [""]),
+        ):
+            for variant in ("legacy", "async"):
+                urls = [f"/{variant}/{path}?{p}" if p else f"/{variant}/{path}" for p in params]
+                # Прогрев кэшей и пулов
+                await measure(client, urls, 4, 2)
+                report(f"{variant} {kind}", await measure(client, urls, args.concurrency, args.requests))
+            print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--pending", type=int, default=5000, help="Необработанных файлов для /bulk/pending")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=10, help="Запросов на клиента")
+    args = parser.parse_args()
+
+    try:
+        init_db()
+        ensure_fts_table()
+        print(f"Creating {args.documents} documents and {args.pending} pending files in {_DATA_DIR}...")
+        make_dataset(args.documents, args.pending)
+        print(f"{args.concurrency} parallel clients x {args.requests} requests\n")
+        server, thread = start_server(build_app())
+        try:
+            asyncio.run(run(f"http://127.0.0.1:{server.config.port}", args))
+        finally:
+            server.should_exit = True
+            thread.join()
+    finally:
+        engine.dispose()
+        shutil.rmtree(_DATA_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
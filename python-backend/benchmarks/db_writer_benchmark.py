@@ -0,0 +1,144 @@
+"""
+Бенчмарк записи результатов в БД
+
+Сравнивает прежнюю схему (каждый этап открывает свою сессию и делает
+commit: регистрация файла, документ, FTS, режим OCR) и писателя БД
+с групповой фиксацией при 1 и 8 параллельных воркерах. Воркеры -
+потоки, которые только пишут: OCR не выполняется.
+
+Запуск (из python-backend):
+    python -m benchmarks.db_writer_benchmark --files 2000
+    python -m benchmarks.db_writer_benchmark --workers 1 8 16 --flush-ms 2
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# БД бенчмарка - во временной папке, до импорта настроек
+_DATA_DIR = tempfile.mkdtemp(prefix="db-writer-bench-")
+os.environ["APP_DATA_DIR"] = _DATA_DIR
+
+from sqlalchemy import text  # noqa: E402
+
+import app.models.file  # noqa: E402,F401
+import app.models.document  # noqa: E402,F401
+import app.models.document_page  # noqa: E402,F401
+from app.db.init_db import init_db  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.db.writer import DatabaseWriter  # noqa: E402
+from app.models.file import File as FileModel  # noqa: E402
+from app.services.document_service import DocumentService  # noqa: E402
+from app.services.search_service import ensure_fts_table  # noqa: E402
+from app.workers.ocr_worker import store_extracted_text  # noqa: E402
+
+PAGE_TEXT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 40
+
+
+def _file_row(name: str) -> FileModel:
+    return FileModel(
+        filename=f"{name}.pdf",
+        filepath=f"/bench/{name}.pdf",
+        file_hash=name.rjust(64, "0"),
+        file_size=1024,
+        mime_type="application/pdf",
+    )
+
+
+def legacy_pipeline(name: str, pages: int) -> None:
+    """Прежняя схема: commit на каждом этапе"""
+    db = SessionLocal()
+    try:
+        file_obj = _file_row(name)
+        db.add(file_obj)
+        db.commit()
+
+        content = "\f".join([PAGE_TEXT] * pages)
+        DocumentService(db).create_document(
+            file_id=file_obj.id, text_content=content, confidence_score=1.0
+        )
+
+        file_obj.ocr_mode = "text_extraction"
+        db.commit()
+    finally:
+        db.close()
+
+
+def _register(db, name: str) -> int:
+    file_obj = _file_row(name)
+    db.add(file_obj)
+    db.flush()
+    return file_obj.id
+
+
+def writer_pipeline(writer: DatabaseWriter, name: str, pages: int) -> None:
+    """Писатель БД: регистрация и результат - два намерения"""
+    file_id = writer.execute_sync(_register, name)
+    writer.execute_sync(
+        store_extracted_text, file_id, "\f".join([PAGE_TEXT] * pages),
+        processing_time=0.0, ocr_mode="text_extraction"
+    )
+
+
+def reset_db() -> None:
+    with engine.begin() as connection:
+        for table in ("document_pages", "documents", "files"):
+            connection.execute(text(f"DELETE FROM {table}"))
+
+
+def run(name: str, workers: int, files: int, job) -> None:
+    reset_db()
+    errors = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(job, f"{name}-{workers}-{i}") for i in range(files)]
+        for future in futures:
+            try:
+                future.result()
+            except Exception:
+                errors += 1
+    seconds = time.perf_counter() - started
+    print(
+        f"{name:<10} x{workers:<3} {seconds:8.2f}s  {files / seconds:10.0f} files/s"
+        f"  errors: {errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=3, help="Страниц текста на файл")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--flush-ms", type=float, default=None, help="DB_WRITER_FLUSH_INTERVAL_MS")
+    parser.add_argument("--batch-size", type=int, default=None, help="DB_WRITER_BATCH_SIZE")
+    args = parser.parse_args()
+
+    try:
+        init_db()
+        ensure_fts_table()
+        print(f"{args.files} files x {args.pages} pages, database in {_DATA_DIR}\n")
+
+        for workers in args.workers:
+            run("legacy", workers, args.files, lambda name: legacy_pipeline(name, args.pages))
+
+            writer = DatabaseWriter(
+                flush_interval=None if args.flush_ms is None else args.flush_ms / 1000,
+                batch_size=args.batch_size,
+            )
+            run("writer", workers, args.files, lambda name: writer_pipeline(writer, name, args.pages))
+            writer.stop()
+            print(f"{'':<15} {writer.writes} writes in {writer.commits} commits\n")
+
+    finally:
+        engine.dispose()
+        shutil.rmtree(_DATA_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
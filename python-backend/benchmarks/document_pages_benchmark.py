@@ -0,0 +1,160 @@
+"""
+Бенчмарк сохранения документа со страницами
+
+Сравнивает прежнюю запись страниц объектами ORM (DocumentPage на каждую
+страницу, flush, загрузка файла, commit и refresh) с текущим
+DocumentService.create_document: страницы одним executemany через Core,
+файл отмечается одним UPDATE. У каждой страницы - геометрия строк,
+как у результатов OCR.
+
+Запуск (из python-backend):
+    python -m benchmarks.document_pages_benchmark
+    python -m benchmarks.document_pages_benchmark --pages 500 --boxes 400
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# БД бенчмарка - во временной папке, до импорта настроек
+_DATA_DIR = tempfile.mkdtemp(prefix="document-pages-bench-")
+os.environ["APP_DATA_DIR"] = _DATA_DIR
+
+from sqlalchemy import insert, text  # noqa: E402
+
+import app.models.document_page  # noqa: E402,F401
+from app.db.init_db import init_db  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.models.document import Document  # noqa: E402
+from app.models.document_page import DocumentPage  # noqa: E402
+from app.models.file import File as FileModel  # noqa: E402
+from app.services.document_service import DocumentService  # noqa: E402
+from app.services.geometry import PageGeometry  # noqa: E402
+
+
+def make_pages(pages: int, boxes: int, seed: int = 42) -> List[Dict]:
+    rng = random.Random(seed)
+    result = []
+    for number in range(1, pages + 1):
+        lines = [
+            {
+                "text": f"word{rng.randrange(5000)}",
+                "bbox": [rng.randrange(2000), rng.randrange(3000), rng.randrange(2000), rng.randrange(3000)],
+                "confidence": round(rng.random(), 3),
+            }
+            for _ in range(boxes)
+        ]
+        text = "\n".join(line["text"] for line in lines)
+        result.append({
+            "page_number": number,
+            "text": text,
+            "confidence": rng.random(),
+            "geometry": PageGeometry.from_lines(lines, text),
+        })
+    return result
+
+
+def legacy_create(db, file_id: int, pages: List[Dict]) -> Document:
+    """Прежняя схема: объект ORM на каждую страницу"""
+    doc = Document(file_id=file_id)
+    db.add(doc)
+    doc.text_content = "\f".join(p["text"] for p in pages)
+    doc.page_count = len(pages)
+    doc.processed_at = datetime.utcnow()
+    doc.is_synced = False
+    doc.needs_sync = True
+    db.flush()
+
+    for page_data in pages:
+        db.add(DocumentPage(
+            document_id=doc.id,
+            page_number=page_data.get("page_number", 0),
+            text_content=page_data.get("text", ""),
+            confidence_score=page_data.get("confidence"),
+            geometry=page_data.get("geometry"),
+        ))
+
+    file_obj = db.query(FileModel).get(file_id)
+    if file_obj:
+        file_obj.is_processed = True
+        file_obj.updated_at = datetime.utcnow()
+
+    db.commit()
+    db.refresh(doc)
+    return doc
+
+
+def bulk_create(db, file_id: int, pages: List[Dict]) -> Document:
+    return DocumentService(db).create_document(
+        file_id=file_id,
+        text_content="\f".join(p["text"] for p in pages),
+        pages=pages,
+    )
+
+
+def reset_db(documents: int) -> None:
+    with engine.begin() as connection:
+        for table in ("document_pages", "documents", "files"):
+            connection.execute(text(f"DELETE FROM {table}"))
+        connection.execute(insert(FileModel.__table__), [
+            {
+                "id": i,
+                "filename": f"doc_{i:06d}.pdf",
+                "filepath": f"/bench/doc_{i:06d}.pdf",
+                "file_hash": f"{i:064d}",
+                "file_size": 1024,
+                "mime_type": "application/pdf",
+            }
+            for i in range(1, documents + 1)
+        ])
+
+
+def run(name: str, documents: int, pages: List[Dict], create) -> None:
+    reset_db(documents)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        for file_id in range(1, documents + 1):
+            create(db, file_id, pages)
+        seconds = time.perf_counter() - started
+    finally:
+        db.close()
+    total = documents * len(pages)
+    print(
+        f"{name:<8} {seconds:8.2f}s  {documents / seconds:8.1f} docs/s  "
+        f"{total / seconds:10.0f} pages/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=300, help="Страниц на документ")
+    parser.add_argument("--boxes", type=int, default=200, help="Строк с координатами на страницу")
+    args = parser.parse_args()
+
+    try:
+        init_db()
+        pages = make_pages(args.pages, args.boxes)
+        print(
+            f"{args.documents} documents x {args.pages} pages x {args.boxes} boxes, "
+            f"database in {_DATA_DIR}\n"
+        )
+        run("legacy", args.documents, pages, legacy_create)
+        run("bulk", args.documents, pages, bulk_create)
+
+    finally:
+        engine.dispose()
+        shutil.rmtree(_DATA_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Бенчмарк хэширования файлов
+
+Сравнивает старое хэширование (блоки по 8 КБ в одном потоке),
+новое hash_file в одном потоке, пул HashingService и предфильтр
+дубликатов (размер + начало/конец файла) против "БД" кандидатов.
+
+Запуск (из python-backend):
+    python -m benchmarks.hash_benchmark --files 10000
+    python -m benchmarks.hash_benchmark --dir /path/to/pdfs
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.hashing import HashingService  # noqa: E402
+from app.utils.hash_utils import hash_file  # noqa: E402
+
+
+def legacy_hash_file(filepath: str) -> str:
+    """Прежняя реализация из hash_utils/upload"""
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(8192), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def make_dataset(root: Path, count: int, min_kb: int, max_kb: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    for i in range(count):
+        subdir = root / f"{i // 1000:03d}"
+        subdir.mkdir(exist_ok=True)
+        size = rng.randint(min_kb, max_kb) * 1024
+        (subdir / f"doc_{i:06d}.pdf").write_bytes(os.urandom(size))
+
+
+def list_files(root: Path):
+    return [str(p) for p in root.rglob("*") if p.is_file()]
+
+
+def report(name: str, seconds: float, files: int, total_bytes: int) -> None:
+    mb = total_bytes / 1024 / 1024
+    print(f"{name:<28} {seconds:8.2f}s  {files / seconds:10.0f} files/s  {mb / seconds:8.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", type=Path, help="Готовая папка с файлами (иначе создается временная)")
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--min-kb", type=int, default=16)
+    parser.add_argument("--max-kb", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1,
+                        help="Доля файлов, которые уже есть в 'БД' для предфильтра")
+    args = parser.parse_args()
+
+    temp_dir = None
+    root = args.dir
+    if root is None:
+        temp_dir = tempfile.mkdtemp(prefix="hash-bench-")
+        root = Path(temp_dir)
+        print(f"Creating {args.files} files in {root}...")
+        make_dataset(root, args.files, args.min_kb, args.max_kb)
+
+    try:
+        paths = list_files(root)
+        sizes = {p: os.path.getsize(p) for p in paths}
+        total = sum(sizes.values())
+        print(f"{len(paths)} files, {total / 1024 / 1024:.0f} MB\n")
+
+        # Первый проход прогревает page cache, чтобы сравнение было честным
+        for p in paths:
+            legacy_hash_file(p)
+
+        started = time.perf_counter()
+        expected = {p: legacy_hash_file(p) for p in paths}
+        report("legacy 8KB, 1 thread", time.perf_counter() - started, len(paths), total)
+
+        started = time.perf_counter()
+        for p in paths:
+            assert hash_file(p) == expected[p]
+        report("hash_file, 1 thread", time.perf_counter() - started, len(paths), total)
+
+        service = HashingService(max_workers=args.workers)
+
+        async def run_pool():
+            return await service.map(hash_file, paths)
+
+        started = time.perf_counter()
+        digests = asyncio.run(run_pool())
+        report(f"HashingService x{service.max_workers}", time.perf_counter() - started, len(paths), total)
+        assert digests == [expected[p] for p in paths]
+
+        # Предфильтр: часть файлов "уже в БД", кандидаты подбираются по размеру
+        rng = random.Random(1)
+        known = rng.sample(paths, int(len(paths) * args.duplicate_ratio))
+        candidates = {}
+        for file_id, p in enumerate(known):
+            candidates.setdefault(sizes[p], []).append((file_id, p, expected[p]))
+
+        async def run_prefilter():
+            return await service.map(
+                lambda p: service.check_duplicate(p, sizes[p], candidates.get(sizes[p], [])),
+                paths,
+            )
+
+        started = time.perf_counter()
+        results = asyncio.run(run_prefilter())
+        report("prefilter (size+partial)", time.perf_counter() - started, len(paths), total)
+        duplicates = sum(1 for dup, _ in results if dup is not None)
+        print(f"\nduplicates found: {duplicates}/{len(known)}, prefilter stats: {service.stats}")
+        service.shutdown()
+
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
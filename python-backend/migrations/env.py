@@ -1,6 +1,7 @@
 from logging.config import fileConfig
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy import text
 from alembic import context
 import sys
 from pathlib import Path
@@ -10,12 +11,16 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 # Импортируем настройки и модели
 from app.core.config import settings
+from app.db.types import register_sqlite_functions
 from app.models.base import Base
 # ВАЖНО: Импортируем все модели чтобы Alembic их увидел
 from app.models.file import File
 from app.models.document import Document
 from app.models.document_page import DocumentPage
 from app.models.sync_log import SyncLog
+from app.models.dead_letter import DeadLetter
+from app.models.file_stat import FileStat
+from app.models.file_alias import FileAlias
 
 # this is the Alembic Config object
 config = context.config
@@ -67,6 +72,8 @@ def run_migrations_online() -> None:
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
+    # decompress_text() - для миграций данных, читающих текст через вид FTS
+    register_sqlite_functions(connectable)
 
     with connectable.connect() as connection:
         context.configure(
@@ -77,6 +84,10 @@ def run_migrations_online() -> None:
         )
 
         with context.begin_transaction():
+            # Вид, через который FTS читает текст страниц, ссылается на
+            # document_pages и не дает batch-миграциям пересоздать таблицу.
+            # Приложение создает его (и триггеры FTS) заново при запуске
+            connection.execute(text("DROP VIEW IF EXISTS document_pages_fts_source"))
             context.run_migrations()
 
 
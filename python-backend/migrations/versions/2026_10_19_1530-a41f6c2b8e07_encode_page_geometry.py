@@ -0,0 +1,80 @@
+"""Encode page geometry
+
+Revision ID: a41f6c2b8e07
+Revises: 7d4c1a9e2f58
+Create Date: 2026-10-19 15:30:00.000000
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.geometry import PageGeometry
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f6c2b8e07'
+down_revision: Union[str, None] = '7d4c1a9e2f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+
+def _convert(source: str, target: str, convert) -> None:
+    """Переложить значения колонки source в target пачками по id"""
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.text(
+                f"SELECT id, {source} FROM document_pages "
+                f"WHERE id > :last_id AND {source} IS NOT NULL ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            return
+        updates = []
+        for row_id, value in rows:
+            converted = convert(value)
+            if converted is not None:
+                updates.append({"id": row_id, "value": converted})
+        if updates:
+            connection.execute(
+                sa.text(f"UPDATE document_pages SET {target} = :value WHERE id = :id"), updates
+            )
+        last_id = rows[-1][0]
+
+
+def _encode(value):
+    try:
+        boxes = json.loads(value)
+    except (TypeError, ValueError):
+        return None
+    if boxes is None:
+        return None
+    try:
+        return PageGeometry.from_boxes(boxes).raw
+    except (TypeError, ValueError):
+        return None
+
+
+def _decode(value):
+    return json.dumps(PageGeometry(value).to_boxes())
+
+
+def upgrade() -> None:
+    op.add_column('document_pages', sa.Column('geometry', sa.LargeBinary(), nullable=True))
+    _convert('bounding_boxes', 'geometry', _encode)
+    with op.batch_alter_table('document_pages', schema=None) as batch_op:
+        batch_op.drop_column('bounding_boxes')
+
+
+def downgrade() -> None:
+    op.add_column('document_pages', sa.Column('bounding_boxes', sa.JSON(), nullable=True))
+    _convert('geometry', 'bounding_boxes', _decode)
+    with op.batch_alter_table('document_pages', schema=None) as batch_op:
+        batch_op.drop_column('geometry')
@@ -0,0 +1,37 @@
+"""Add page OCR mode
+
+Revision ID: c3e8d1f5a942
+Revises: a41f6c2b8e07
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8d1f5a942'
+down_revision: Union[str, None] = 'a41f6c2b8e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('document_pages', sa.Column('mode', sa.String(length=20), nullable=True))
+    # Режим уже распознанных страниц - из files.ocr_mode ("движок:режим").
+    # Фоновая обработка режим не записывала, она распознает в printed;
+    # "auto" распознается так же (app.services.ocr.normalize_mode)
+    op.execute(sa.text("""
+        UPDATE document_pages
+        SET mode = CASE WHEN EXISTS (
+            SELECT 1 FROM documents d JOIN files f ON f.id = d.file_id
+            WHERE d.id = document_pages.document_id AND f.ocr_mode LIKE :handwritten
+        ) THEN 'handwritten' ELSE 'printed' END
+        WHERE fingerprint IS NOT NULL
+    """).bindparams(handwritten="%:handwritten"))
+
+def downgrade() -> None:
+    with op.batch_alter_table('document_pages', schema=None) as batch_op:
+        batch_op.drop_column('mode')